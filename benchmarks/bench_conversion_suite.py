@@ -0,0 +1,221 @@
+"""
+Набор бенчмарков конвертации на образце стоп-листа из репозитория.
+
+Из "lista 29 07 2025.xlsx" строятся книги нужного размера (строки образца
+повторяются с новыми серийными номерами и ID), и для каждой книги замеряются:
+- FileProcessingService.save_and_convert (режимы конвертации thread/process);
+- каждый доступный движок конвертации напрямую (streaming с автоматическим
+  выбором бэкенда чтения и с каждым бэкендом xlsx_readers отдельно, pandas).
+
+Каждый замер идет в отдельном процессе, чтобы пиковый RSS относился только
+к нему: время (wall), процессорное время (user+sys, включая дочерние
+процессы пула) и пиковый RSS. Результат - JSON для отслеживания динамики.
+
+Запуск:
+    python -m benchmarks.bench_conversion_suite --rows 10000 100000 1000000 --output bench.json
+"""
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+
+SAMPLE_XLSX = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lista 29 07 2025.xlsx")
+
+# Над таблицей в образце: название отчета, пустая строка, заголовок
+_PREAMBLE_ROWS = 3
+
+# =====================================
+# 2. Книги заданного размера
+# =====================================
+
+def scaled_workbook(rows: int, directory: str, sample_path: str = SAMPLE_XLSX) -> str:
+    """
+    Возвращает (и при первом вызове строит) книгу с `rows` строками данных.
+
+    Строки образца повторяются по кругу; в каждом повторе серийный номер и ID
+    сдвигаются, чтобы ключи оставались уникальными. Типы ячеек те же, что в образце.
+    """
+    path = os.path.join(directory, f"stoplist_{rows}.xlsx")
+    if os.path.exists(path):
+        return path
+
+    from openpyxl import Workbook, load_workbook
+
+    source = load_workbook(sample_path, read_only=True)
+    try:
+        sheet_rows = list(source.worksheets[0].iter_rows(values_only=True))
+    finally:
+        source.close()
+    preamble, template = sheet_rows[:_PREAMBLE_ROWS], [row for row in sheet_rows[_PREAMBLE_ROWS:] if any(row)]
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in preamble:
+        sheet.append(row)
+    for number in range(rows):
+        cycle, row = divmod(number, len(template))
+        values = list(template[row])
+        values[1] = number + 1
+        if cycle:
+            values[2] = str(int(values[2]) + cycle * 10 ** 11)
+            values[3] = str(int(values[3]) + cycle * 10 ** 9)
+        sheet.append(values)
+
+    tmp_path = f"{path}.part"
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+# =====================================
+# 3. Замеряемые операции (выполняются в дочернем процессе)
+# =====================================
+
+def _run_engine(engine: str) -> Callable[[str, str], object]:
+    def run(xlsx_path: str, workdir: str) -> object:
+        from src.infrastructure.storage import xlsx_converter
+
+        convert = ENGINES[engine](xlsx_converter)
+        return convert(xlsx_path, os.path.join(workdir, "out.csv"))
+    return run
+
+def _run_service(mode: str) -> Callable[[str, str], object]:
+    def run(xlsx_path: str, workdir: str) -> object:
+        from src.config import ConversionConfig
+        from src.domain.services import EmailAttachment, RawEmail
+        from src.infrastructure.storage.file_processor import FileProcessingService, shutdown_conversion_pool
+
+        # Вложение, как его оставляет сервис чтения почты: файл на диске и его SHA256
+        attachment_path = os.path.join(workdir, "attachment.xlsx")
+        shutil.copyfile(xlsx_path, attachment_path)
+        with open(attachment_path, "rb") as xlsx_file:
+            sha256 = hashlib.sha256(xlsx_file.read()).hexdigest()
+        email = RawEmail(
+            message_id="bench", sender="bench@example.com", date=datetime(2025, 7, 29),
+            attachments=[EmailAttachment(
+                filename="lista.xlsx", path=attachment_path, size=os.path.getsize(attachment_path), sha256=sha256,
+            )],
+        )
+        service = FileProcessingService(base_storage_path=workdir, conversion_config=ConversionConfig(mode=mode))
+        try:
+            return asyncio.run(service.save_and_convert(email))
+        finally:
+            shutdown_conversion_pool()
+    return run
+
+def _streaming(reader: str) -> Callable:
+    return lambda module: functools.partial(module.stream_xlsx_to_csv, reader=reader)
+
+# Движки конвертации: имя -> функция модуля xlsx_converter
+ENGINES: dict[str, Callable] = {
+    "streaming": _streaming("auto"),
+    **{f"streaming:{reader}": _streaming(reader) for reader in ("calamine", "xml", "openpyxl")},
+    "pandas": lambda module: module.pandas_xlsx_to_csv,
+}
+
+TARGETS: dict[str, Callable[[str, str], object]] = {
+    **{f"service:{mode}": _run_service(mode) for mode in ("thread", "process")},
+    **{f"engine:{engine}": _run_engine(engine) for engine in ENGINES},
+}
+
+def _cpu_seconds() -> float:
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+def measure(target: str, xlsx_path: str) -> dict:
+    """Выполняется в дочернем процессе; импорты пакета src учитываются в RSS до замера."""
+    import src.infrastructure.storage.file_processor  # noqa: F401
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as workdir:
+        cpu_started, started = _cpu_seconds(), time.perf_counter()
+        TARGETS[target](xlsx_path, workdir)
+        wall, cpu = time.perf_counter() - started, _cpu_seconds() - cpu_started
+
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        "target": target,
+        "wall_time_s": round(wall, 3),
+        "cpu_time_s": round(cpu, 3),
+        "peak_rss_mb": round(max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, children_rss) / 1024, 1),
+        "rss_before_mb": round(rss_before / 1024, 1),
+    }
+
+def run_in_subprocess(target: str, xlsx_path: str, timeout: float) -> dict:
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_conversion_suite", "--child", target, xlsx_path],
+            check=True, capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {"target": target, "error": f"timeout after {timeout:.0f}s"}
+    except subprocess.CalledProcessError as e:
+        return {"target": target, "error": (e.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+# =====================================
+# 4. Запуск
+# =====================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000], help="Размеры книг (строк)")
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=list(TARGETS), help="Что замерять")
+    parser.add_argument("--workbooks-dir", default=os.path.join(tempfile.gettempdir(), "stoplist_bench"),
+                        help="Где хранить сгенерированные книги между запусками")
+    parser.add_argument("--timeout", type=float, default=1800, help="Предел времени одного замера, секунд")
+    parser.add_argument("--output", help="Записать JSON в файл (по умолчанию - только stdout)")
+    parser.add_argument("--child", nargs=2, metavar=("TARGET", "XLSX"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child)))
+        return
+
+    os.makedirs(args.workbooks_dir, exist_ok=True)
+    results: list[dict] = []
+    for rows in args.rows:
+        started = time.perf_counter()
+        xlsx_path = scaled_workbook(rows, args.workbooks_dir)
+        print(f"{rows} rows: workbook ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        for target in args.targets:
+            measurement = run_in_subprocess(target, xlsx_path, args.timeout)
+            measurement.update(rows=rows, xlsx_size_mb=round(os.path.getsize(xlsx_path) / 1024 ** 2, 2))
+            if "wall_time_s" in measurement:
+                measurement["rows_per_s"] = round(rows / measurement["wall_time_s"])
+            print(f"  {target}: {measurement.get('wall_time_s', measurement.get('error'))}", file=sys.stderr)
+            results.append(measurement)
+
+    report = {
+        "benchmark": "conversion_suite",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            report_file.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Бенчмарк инкрементальной синхронизации IMAP (UID high-water mark) против
+полного поиска непрочитанных писем.
+
+Запускает настоящий EmailReaderService против симулированного почтового ящика.
+Симулятор моделирует стоимость на стороне сервера: поиск по флагам/отправителю
+просматривает всю папку, поиск по диапазону UID просматривает только диапазон,
+а скачивание каждого письма стоит фиксированную задержку.
+
+Сценарий: в ящике N уже обработанных писем, часть из них кто-то снова пометил
+непрочитанными в почтовом клиенте, а несколько новых писем уже прочитаны.
+
+Запуск:
+    python -m benchmarks.bench_imap_sync --messages 10000
+"""
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import argparse
+import asyncio
+import json
+import re
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from src.config import EmailConfig
+from src.domain.models import MailboxSyncState
+from src.infrastructure.email.email_reader import EmailReaderService
+
+# =====================================
+# 2. Симулированный почтовый сервер
+# =====================================
+
+SCAN_COST_SECONDS = 2e-6       # Проверка одного письма при поиске на сервере
+DOWNLOAD_COST_SECONDS = 2e-4   # Передача одного письма клиенту
+
+class SimulatedMessage(SimpleNamespace):
+    pass
+
+class SimulatedMailBox:
+    def __init__(self, messages: list[SimulatedMessage], uid_validity: int = 1):
+        self.messages = messages
+        self.uid_validity = uid_validity
+        self.folder = SimpleNamespace(status=self._status)
+        self.scanned = 0
+        self.downloaded = 0
+
+    def _status(self, folder=None, options=None):
+        return {'UIDVALIDITY': self.uid_validity, 'UIDNEXT': int(self.messages[-1].uid) + 1}
+
+    def login(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def uids(self, criteria='ALL', charset='US-ASCII', sort=None):
+        criteria = str(criteria)
+        uid_range = re.search(r"UID (\d+):\*", criteria)
+
+        if uid_range:
+            start = int(uid_range.group(1))
+            candidates = [m for m in self.messages if int(m.uid) >= start] or self.messages[-1:]
+        else:
+            candidates = [m for m in self.messages if not m.seen]
+
+        # Поиск по флагам просматривает всю папку, по диапазону UID - только диапазон
+        scanned = len(candidates) if uid_range else len(self.messages)
+        self.scanned += scanned
+        time.sleep(scanned * SCAN_COST_SECONDS)
+        return [m.uid for m in candidates]
+
+    def fetch(self, criteria='ALL', mark_seen=True, uid_list=None, **kwargs):
+        by_uid = {m.uid: m for m in self.messages}
+        for uid in uid_list:
+            msg = by_uid[uid]
+            self.downloaded += 1
+            time.sleep(DOWNLOAD_COST_SECONDS)
+            if mark_seen:
+                msg.seen = True
+            yield msg
+
+    @property
+    def client(self):
+        return SimpleNamespace(uid=self._uid_command)
+
+    def _uid_command(self, command, uid_set, items):
+        """Ответы на двухфазный FETCH: BODYSTRUCTURE с одной .xlsx частью, затем сама часть."""
+        data = []
+        for seq, uid in enumerate(uid_set.split(','), start=1):
+            if 'BODYSTRUCTURE' in items:
+                data.append(
+                    b'%d (UID %s BODYSTRUCTURE ("application" "octet-stream" ("name" "lista.xlsx") NIL NIL "base64" 4 NIL NIL NIL NIL)'
+                    b' BODY[HEADER.FIELDS (FROM DATE SUBJECT)] "From: sender@domain.com")' % (seq, uid.encode())
+                )
+            else:
+                self.downloaded += 1
+                time.sleep(DOWNLOAD_COST_SECONDS)
+                data.append(b'%d (UID %s BODY[1]<0> "eA==")' % (seq, uid.encode()))
+        return 'OK', data
+
+    def flag(self, uid_list, flag_set, value, chunks=None):
+        by_uid = {m.uid: m for m in self.messages}
+        for uid in uid_list:
+            by_uid[uid].seen = value
+
+class InMemoryProcessedRepo:
+    def __init__(self, processed: set[str]):
+        self.processed = processed
+        self.lookups = 0
+
+    async def find_existing_message_ids(self, message_ids):
+        self.lookups += 1
+        return {message_id for message_id in message_ids if message_id in self.processed}
+
+class InMemorySyncRepo:
+    def __init__(self, state: MailboxSyncState | None):
+        self.state = state
+
+    async def get_by_folder(self, folder: str):
+        return self.state
+
+    async def save(self, state: MailboxSyncState):
+        self.state = state
+        return state
+
+# =====================================
+# 3. Сценарий
+# =====================================
+
+def build_mailbox(total: int, new: int, reopened: int, read_new: int) -> SimulatedMailBox:
+    messages = []
+    for uid in range(1, total + new + 1):
+        is_new = uid > total
+        messages.append(SimulatedMessage(
+            uid=str(uid),
+            from_="sender@domain.com",
+            subject=f"Stoplist {uid}",
+            date=datetime(2025, 7, 29),
+            attachments=[SimpleNamespace(filename="lista.xlsx", payload=b"x")],
+            # Обработанные письма прочитаны, кроме "переоткрытых" в клиенте
+            seen=(not is_new and uid > reopened) or (is_new and uid <= total + read_new),
+        ))
+    return SimulatedMailBox(messages)
+
+async def run_mode(mode: str, total: int, new: int, reopened: int, read_new: int) -> dict:
+    config = EmailConfig(
+        server="imap.simulated", port=993, username="u", password="p",
+        allowed_senders=["sender@domain.com"],
+    )
+    mailbox = build_mailbox(total, new, reopened, read_new)
+    processed_repo = InMemoryProcessedRepo({str(uid) for uid in range(1, total + 1)})
+
+    sync_repo = None
+    if mode == "incremental":
+        sync_repo = InMemorySyncRepo(MailboxSyncState(folder="INBOX", uid_validity=1, last_uid=total))
+
+    with tempfile.TemporaryDirectory() as storage_path:
+        service = EmailReaderService(config, processed_repo, sync_state_repo=sync_repo, storage_path=storage_path)
+
+        started = time.perf_counter()
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=mailbox):
+            emails = [email async for email in service.fetch_new_emails()]
+        duration = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "wall_time_s": round(duration, 3),
+        "server_messages_scanned": mailbox.scanned,
+        "messages_downloaded": mailbox.downloaded,
+        "db_round_trips": processed_repo.lookups,
+        "new_emails_yielded": len(emails),
+        "new_emails_missed": new - len(emails),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000, help="Уже обработанных писем в ящике")
+    parser.add_argument("--new", type=int, default=50, help="Новых писем с момента прошлого цикла")
+    parser.add_argument("--reopened", type=int, default=2000, help="Обработанных писем, снова помеченных непрочитанными")
+    parser.add_argument("--read-new", type=int, default=5, help="Новых писем, уже прочитанных в клиенте")
+    args = parser.parse_args()
+
+    results = [
+        asyncio.run(run_mode(mode, args.messages, args.new, args.reopened, args.read_new))
+        for mode in ("full_unseen", "incremental")
+    ]
+    print(json.dumps({"benchmark": "imap_sync", "parameters": vars(args), "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
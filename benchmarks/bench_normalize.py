@@ -0,0 +1,122 @@
+"""
+Бенчмарк нормализации листа стоп-листа (stoplist_normalizer).
+
+Книга один раз конвертируется в исходный CSV (без замера), затем замеряются
+стадии нормализации: чтение CSV, векторная нормализация и запись результата.
+Для сравнения те же правила выполняются построчно на чистом Python, а весь
+путь от книги до CSV и Parquet - из spool конвертера (как в обработчике) и
+через промежуточный CSV конвертера.
+
+Запуск:
+    python -m benchmarks.bench_normalize "lista 29 07 2025.xlsx" --repeat 5
+"""
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import argparse
+import csv
+import json
+import os
+import re
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+
+from src.config import NormalizationRules
+from src.infrastructure.storage.stoplist_normalizer import (
+    normalize_csv,
+    normalize_stoplist,
+    normalize_xlsx,
+    read_raw_csv,
+)
+from src.infrastructure.storage.xlsx_converter import convert_xlsx_to_csv
+
+_FLOAT_CODE_RE = re.compile(r"^(\d+)\.0+$")
+
+# =====================================
+# 2. Построчная реализация для сравнения
+# =====================================
+
+def normalize_rows(csv_path: str, rules: NormalizationRules) -> list[list[str]]:
+    """Те же правила, что и normalize_stoplist, но циклом по строкам."""
+    with open(csv_path, encoding="utf-8-sig", newline="") as csv_file:
+        rows = list(csv.reader(csv_file))
+
+    wanted = set(rules.header_columns)
+    header_row = next(index for index, row in enumerate(rows) if wanted <= set(row))
+    header = [name.strip() for name in rows[header_row]]
+    data = [row for row in rows[header_row + 1:] if any(row)]
+
+    keep = [
+        index for index, name in enumerate(header)
+        if (name or any(row[index] for row in data)) and name not in rules.drop_columns
+    ]
+    plates = {index for index in keep if header[index] in rules.plate_columns}
+    codes = {index for index in keep if header[index] in rules.id_columns}
+
+    result = [[header[index] for index in keep]]
+    for row in data:
+        values = []
+        for index in keep:
+            value = row[index]
+            if index in plates:
+                value = value.strip().upper()
+            elif index in codes:
+                value = _FLOAT_CODE_RE.sub(r"\1", value.strip())
+            values.append(value)
+        result.append(values)
+    return result
+
+# =====================================
+# 3. Замеры
+# =====================================
+
+def timed(function: Callable[[], object], repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return round(statistics.median(durations) * 1000, 1)
+
+def run(xlsx_path: str, repeat: int) -> dict:
+    rules = NormalizationRules()
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, "raw.csv")
+        convert_xlsx_to_csv(xlsx_path, raw_path)
+        frame = read_raw_csv(raw_path)
+        out_path = os.path.join(tmp, "out.csv")
+        parquet_path = os.path.join(tmp, "out.parquet")
+
+        def via_raw_csv() -> None:
+            convert_xlsx_to_csv(xlsx_path, raw_path)
+            normalize_csv(raw_path, out_path, rules, parquet_path)
+
+        return {
+            "file": os.path.basename(xlsx_path),
+            "raw_rows": len(frame),
+            "rows": len(normalize_stoplist(frame, rules)),
+            "read_csv_ms": timed(lambda: read_raw_csv(raw_path), repeat),
+            "normalize_ms": timed(lambda: normalize_stoplist(frame, rules), repeat),
+            "end_to_end_ms": timed(lambda: normalize_csv(raw_path, os.path.join(tmp, "out.csv"), rules), repeat),
+            "per_row_python_ms": timed(lambda: normalize_rows(raw_path, rules), repeat),
+            "xlsx_via_raw_csv_ms": timed(via_raw_csv, repeat),
+            "xlsx_from_spool_ms": timed(lambda: normalize_xlsx(xlsx_path, out_path, rules, parquet_path), repeat),
+        }
+
+# =====================================
+# 4. Запуск
+# =====================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("xlsx", nargs="+", help="Файлы .xlsx для замера")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого замера (берется медиана)")
+    args = parser.parse_args()
+
+    results = [run(xlsx_path, args.repeat) for xlsx_path in args.xlsx]
+    print(json.dumps({"benchmark": "normalize", "results": results}, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Бенчмарк загрузки на SFTP: последовательно и пакетом, с разным конвейером записи.
+
+Поднимается локальный SFTP сервер asyncssh, а клиент подключается к нему
+через TCP прокси с искусственной задержкой (половина RTT в каждую сторону,
+запросы в полете не ждут друг друга - как в реальной сети). Сервер выполняет
+`sha256sum`, так что проверка идет без скачивания файла, как на обычном сервере.
+
+Замеряются (SftpUploadService с SHA256 проверкой и атомарным переименованием):
+- sequential:reconnect - файлы по одному, новое SSH соединение для каждого
+  (как до пула сессий);
+- sequential - файлы по одному через сессию из пула;
+- batch - upload_files_with_validation, `--concurrency` файлов одновременно;
+- batch:tuned - то же с `--block-size` и `--max-requests`.
+
+Запуск:
+    python -m benchmarks.bench_sftp_upload --files 8 --size-mb 2 --rtt-ms 50 --repeat 3
+"""
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shlex
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+
+import asyncssh  # type: ignore
+
+from src.config import SftpConfig
+from src.domain.services import UploadRequest
+from src.infrastructure.sftp.sftp_pool import SftpSessionPool
+from src.infrastructure.sftp.sftp_uploader import SftpUploadService
+
+# =====================================
+# 2. SFTP сервер и сеть с задержкой
+# =====================================
+
+async def _pump(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float) -> None:
+    """Передает данные с задержкой `delay`, не ограничивая число байт в пути."""
+    loop = asyncio.get_running_loop()
+    in_flight: asyncio.Queue = asyncio.Queue()
+
+    async def deliver() -> None:
+        while True:
+            deliver_at, data = await in_flight.get()
+            if not data:
+                break
+            await asyncio.sleep(max(deliver_at - loop.time(), 0))
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+
+    delivery = asyncio.create_task(deliver())
+    try:
+        while True:
+            data = await reader.read(256 * 1024)
+            in_flight.put_nowait((loop.time() + delay, data))
+            if not data:
+                break
+        await delivery
+    except (ConnectionError, asyncio.CancelledError):
+        delivery.cancel()
+
+async def start_latency_proxy(target_port: int, rtt: float) -> asyncio.AbstractServer:
+    async def handle(client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", target_port)
+        try:
+            await asyncio.gather(
+                _pump(client_reader, server_writer, rtt / 2),
+                _pump(server_reader, client_writer, rtt / 2),
+                return_exceptions=True,
+            )
+        except asyncio.CancelledError:
+            # Прокси остановлен вместе с сервером
+            server_writer.close()
+            client_writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+def _sha256sum_process(root: str) -> Callable[[asyncssh.SSHServerProcess], Awaitable[None]]:
+    """Сервер выполняет только `sha256sum -- <путь>` (пути относительно корня SFTP)."""
+    async def process(proc: asyncssh.SSHServerProcess) -> None:
+        command = shlex.split(proc.command or "")
+        if command[:2] != ["sha256sum", "--"] or len(command) != 3:
+            proc.exit(127)
+            return
+        with open(os.path.join(root, command[2].lstrip("/")), "rb") as remote_file:
+            digest = hashlib.sha256(remote_file.read()).hexdigest()
+        proc.stdout.write(f"{digest}  {command[2]}\n")
+        proc.exit(0)
+    return process
+
+async def start_sftp_server(root: str, workdir: str) -> tuple[asyncssh.SSHAcceptor, str]:
+    """Запускает SFTP сервер; возвращает его и путь к ключу клиента."""
+    host_key = asyncssh.generate_private_key("ssh-ed25519")
+    client_key = asyncssh.generate_private_key("ssh-ed25519")
+    key_path = os.path.join(workdir, "client_key")
+    client_key.write_private_key(key_path)
+
+    server = await asyncssh.listen(
+        "127.0.0.1", 0,
+        server_host_keys=[host_key],
+        authorized_client_keys=asyncssh.import_authorized_keys(client_key.export_public_key().decode()),
+        sftp_factory=lambda chan: asyncssh.SFTPServer(chan, chroot=root.encode()),
+        process_factory=_sha256sum_process(root),
+    )
+    return server, key_path
+
+# =====================================
+# 3. Замеры
+# =====================================
+
+def make_files(directory: str, count: int, size: int) -> list[UploadRequest]:
+    files = []
+    for index in range(count):
+        path = os.path.join(directory, f"stoplist_{index}.csv")
+        content = os.urandom(size)
+        with open(path, "wb") as local_file:
+            local_file.write(content)
+        files.append(UploadRequest(path, f"/upload/stoplist_{index}.csv", hashlib.sha256(content).hexdigest()))
+    return files
+
+def make_service(config: SftpConfig) -> SftpUploadService:
+    pool = SftpSessionPool(config)
+    pool.connection_options["known_hosts"] = None  # Ключ сервера сгенерирован только что
+    return SftpUploadService(config, pool=pool)
+
+async def sequential(service: SftpUploadService, files: list[UploadRequest], reconnect: bool) -> list[bool]:
+    results = []
+    for file in files:
+        results.append(await service.upload_file_with_validation(*file))
+        if reconnect:
+            await service.pool.close()
+    return results
+
+async def run(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        root, local = os.path.join(workdir, "remote"), os.path.join(workdir, "local")
+        os.makedirs(os.path.join(root, "upload"))
+        os.makedirs(local)
+        files = make_files(local, args.files, int(args.size_mb * 1024 ** 2))
+
+        server, key_path = await start_sftp_server(root, workdir)
+        proxy = await start_latency_proxy(server.get_port(), args.rtt_ms / 1000)
+        base = SftpConfig(
+            host="127.0.0.1", port=proxy.sockets[0].getsockname()[1], username="bench", key_path=key_path,
+            remote_path="/upload", verification="sha256sum", upload_concurrency=args.concurrency,
+        )
+        tuned = base.model_copy(update={"block_size": args.block_size, "max_requests": args.max_requests})
+
+        targets: dict[str, tuple[SftpConfig, Callable]] = {
+            "sequential:reconnect": (base, lambda service: sequential(service, files, reconnect=True)),
+            "sequential": (base, lambda service: sequential(service, files, reconnect=False)),
+            "batch": (base, lambda service: service.upload_files_with_validation(files)),
+            "batch:tuned": (tuned, lambda service: service.upload_files_with_validation(files)),
+        }
+
+        results = []
+        try:
+            for name, (config, upload) in targets.items():
+                service = make_service(config)
+                if name != "sequential:reconnect":
+                    # Первое подключение (рукопожатие) в замер не входит
+                    async with service.pool.session():
+                        pass
+                durations = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    assert all(await upload(service)), f"{name}: upload failed"
+                    durations.append(time.perf_counter() - started)
+                await service.pool.close()
+
+                seconds = statistics.median(durations)
+                results.append({
+                    "target": name,
+                    "wall_time_s": round(seconds, 3),
+                    "throughput_mb_s": round(args.files * args.size_mb / seconds, 2),
+                })
+                print(f"  {name}: {seconds:.2f}s", file=sys.stderr)
+        finally:
+            proxy.close()
+            server.close()
+
+    return {
+        "benchmark": "sftp_upload",
+        "files": args.files,
+        "size_mb": args.size_mb,
+        "rtt_ms": args.rtt_ms,
+        "concurrency": args.concurrency,
+        "block_size": args.block_size,
+        "max_requests": args.max_requests,
+        "results": results,
+    }
+
+# =====================================
+# 4. Запуск
+# =====================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=8, help="Число файлов")
+    parser.add_argument("--size-mb", type=float, default=2, help="Размер каждого файла, МБ")
+    parser.add_argument("--rtt-ms", type=float, default=50, help="Задержка сети туда и обратно, мс")
+    parser.add_argument("--concurrency", type=int, default=4, help="Файлов одновременно в пакете")
+    parser.add_argument("--block-size", type=int, default=256 * 1024, help="Байт в запросе записи (batch:tuned)")
+    parser.add_argument("--max-requests", type=int, default=64, help="Запросов записи в полете (batch:tuned)")
+    parser.add_argument("--repeat", type=int, default=3, help="Повторов каждого замера (берется медиана)")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
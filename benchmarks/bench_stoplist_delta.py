@@ -0,0 +1,106 @@
+"""
+Бенчмарк дельты между двумя стоп-листами (stoplist_delta.compute_delta).
+
+Строит синтетический предыдущий стоп-лист в формате конвертера (N строк) и
+текущий, в котором несколько сотен строк добавлены, удалены и изменены,
+как в ежедневных списках. Замеряется полный compute_delta (чтение обоих CSV
+и сравнение по ключу) и отдельно чтение одного списка (read_stoplist).
+
+Запуск:
+    python -m benchmarks.bench_stoplist_delta --rows 100000 --changes 300 --repeat 5
+"""
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import argparse
+import csv
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+
+from src.infrastructure.storage.stoplist_delta import compute_delta, read_stoplist
+
+HEADER = ["", "Row Number", "SERIJSKI BROJ", "ID", "KUPAC", "", "KATEGORIJA VOZILA", "REGISTARSKI BROJ VOZILA", "STATUS"]
+STATUSES = ["Bela lista", "Crna lista", "Siva lista"]
+CUSTOMERS = [f"{21187798 + i} - Kupac {i} d.o.o." for i in range(50)]
+KEY_COLUMNS = ["SERIJSKI BROJ"]
+IGNORE_COLUMNS = ["Row Number"]
+
+# =====================================
+# 2. Тестовые данные
+# =====================================
+
+def _row(number: int, status: str) -> list[str]:
+    plate = f"{'BG NS NI KG VA'.split()[number % 5]}{number % 1000:03d}{chr(65 + number % 26)}{chr(65 + number // 26 % 26)}"
+    return [
+        "", "", str(364000000 + number), str(1000000 + number),
+        CUSTOMERS[number % len(CUSTOMERS)], "", "3", plate, status,
+    ]
+
+def write_stoplist(path: str, numbers: range, changed: frozenset[int] = frozenset()) -> None:
+    """Стоп-лист из строк `numbers`; у строк из `changed` другой STATUS."""
+    with open(path, "w", encoding="utf-8-sig", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Unnamed: 0", "PREGLED ENP UREĐAJA UGOVORA O SARADNJI"] + [f"Unnamed: {i}" for i in range(2, 9)])
+        writer.writerow([""] * 9)
+        writer.writerow(HEADER)
+        for row_number, number in enumerate(numbers, start=1):
+            status = STATUSES[(number + (number in changed)) % len(STATUSES)]
+            row = _row(number, status)
+            row[1] = str(row_number)  # Номера строк сдвигаются и не считаются изменением
+            writer.writerow(row)
+
+# =====================================
+# 3. Замеры
+# =====================================
+
+def timed(function: Callable[[], object], repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+def run(rows: int, changes: int, repeat: int) -> dict:
+    # Треть изменений - удаленные строки в начале, треть - добавленные в конце, треть - измененные
+    step = max(1, changes // 3)
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_csv = os.path.join(tmp, "previous.csv")
+        current_csv = os.path.join(tmp, "current.csv")
+        write_stoplist(previous_csv, range(rows))
+        write_stoplist(current_csv, range(step, rows + step), changed=frozenset(range(rows // 2, rows // 2 + step)))
+
+        delta = compute_delta(previous_csv, current_csv, KEY_COLUMNS, IGNORE_COLUMNS)
+        read_time = timed(lambda: read_stoplist(current_csv, KEY_COLUMNS), repeat)
+        delta_time = timed(lambda: compute_delta(previous_csv, current_csv, KEY_COLUMNS, IGNORE_COLUMNS), repeat)
+
+    return {
+        "rows": rows,
+        "added": len(delta.added),
+        "removed": len(delta.removed),
+        "changed": len(delta.changed),
+        "unchanged": delta.unchanged,
+        "read_stoplist_ms": round(read_time * 1000, 1),
+        "compute_delta_ms": round(delta_time * 1000, 1),
+    }
+
+# =====================================
+# 4. Запуск
+# =====================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Строк в стоп-листе")
+    parser.add_argument("--changes", type=int, default=300, help="Добавленных, удаленных и измененных строк всего")
+    parser.add_argument("--repeat", type=int, default=5, help="Число повторов (берется медиана)")
+    args = parser.parse_args()
+
+    result = run(args.rows, args.changes, args.repeat)
+    print(json.dumps({"benchmark": "stoplist_delta", "results": [result]}, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Бенчмарк поиска по индексу стоп-листа в памяти (StoplistIndex.lookup).
+
+Строит синтетический стоп-лист в формате конвертера (N строк), загружает его
+в индекс и замеряет задержку каждого поиска по номеру, серийному номеру и ID:
+половина запросов попадает в список, половина - нет. Отдельно замеряются
+время построения индекса и пакетный поиск (как в POST /stoplist/lookup).
+
+Запуск:
+    python -m benchmarks.bench_stoplist_lookup --rows 100000 --queries 200000
+"""
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from src.infrastructure.storage.stoplist_index import StoplistIndex
+
+HEADER = ["", "Row Number", "SERIJSKI BROJ", "ID", "KUPAC", "", "KATEGORIJA VOZILA", "REGISTARSKI BROJ VOZILA", "STATUS"]
+STATUSES = ["Bela lista", "Crna lista", "Siva lista"]
+CUSTOMERS = [f"{21187798 + i} - Kupac {i} d.o.o." for i in range(50)]
+
+# =====================================
+# 2. Тестовые данные
+# =====================================
+
+def _plate(number: int) -> str:
+    return f"{'BG NS NI KG VA'.split()[number % 5]}{number % 1000:03d}{chr(65 + number % 26)}{chr(65 + number // 26 % 26)}"
+
+def write_stoplist(path: str, rows: int) -> None:
+    with open(path, "w", encoding="utf-8-sig", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Unnamed: 0", "PREGLED ENP UREĐAJA UGOVORA O SARADNJI"] + [f"Unnamed: {i}" for i in range(2, 9)])
+        writer.writerow([""] * 9)
+        writer.writerow(HEADER)
+        for number in range(rows):
+            writer.writerow([
+                "", str(number + 1), str(364000000 + number), str(1000000 + number),
+                CUSTOMERS[number % len(CUSTOMERS)], "", "3", _plate(number), STATUSES[number % len(STATUSES)],
+            ])
+
+def make_queries(rows: int, count: int, seed: int = 42) -> list[dict]:
+    """Запросы в том виде, в каком их присылают шлагбаумы: номер с пробелами и в нижнем регистре."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        number = rng.randrange(rows * 2)  # Половина запросов - мимо списка
+        kind = rng.choice(("plate", "serial", "id"))
+        if kind == "plate":
+            plate = _plate(number) if number < rows else f"ZZ{number}"
+            queries.append({"plate": f"{plate[:2].lower()} {plate[2:5]}-{plate[5:]}"})
+        elif kind == "serial":
+            queries.append({"serial": str(364000000 + number)})
+        else:
+            queries.append({"id": str(1000000 + number)})
+    return queries
+
+# =====================================
+# 3. Замеры
+# =====================================
+
+def percentile(samples: list[float], p: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def run(rows: int, queries_count: int, batch_size: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "stoplist.csv")
+        write_stoplist(csv_path, rows)
+
+        started = time.perf_counter()
+        index = StoplistIndex.from_csv(csv_path)
+        build_time = time.perf_counter() - started
+
+    queries = make_queries(rows, queries_count)
+    for query in queries[:1000]:  # Прогрев
+        index.lookup(**query)
+
+    latencies = []
+    found = 0
+    for query in queries:
+        started = time.perf_counter_ns()
+        matches = index.lookup(**query)
+        latencies.append((time.perf_counter_ns() - started) / 1000)
+        found += bool(matches)
+    latencies.sort()
+
+    started = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        [index.lookup(**query) for query in queries[offset:offset + batch_size]]
+    batch_time = time.perf_counter() - started
+
+    return {
+        "rows": index.rows,
+        "build_time_s": round(build_time, 2),
+        "queries": len(queries),
+        "found": found,
+        "p50_us": round(statistics.median(latencies), 2),
+        "p99_us": round(percentile(latencies, 0.99), 2),
+        "p999_us": round(percentile(latencies, 0.999), 2),
+        "max_us": round(latencies[-1], 2),
+        "batch_size": batch_size,
+        "batch_lookups_per_s": round(len(queries) / batch_time),
+    }
+
+# =====================================
+# 4. Запуск
+# =====================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Строк в стоп-листе")
+    parser.add_argument("--queries", type=int, default=200000, help="Число поисков")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Размер пакета для пакетного поиска")
+    args = parser.parse_args()
+
+    result = run(args.rows, args.queries, args.batch_size)
+    print(json.dumps({"benchmark": "stoplist_lookup", "results": [result]}, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
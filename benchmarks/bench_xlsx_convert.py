@@ -0,0 +1,87 @@
+"""
+Бенчмарк конвертации .xlsx -> CSV: потоковый движок против pandas.
+
+Каждый движок запускается в отдельном процессе, чтобы пиковый RSS
+(ru_maxrss) относился только к нему. Также проверяется, что CSV совпадают побайтно.
+
+Запуск:
+    python -m benchmarks.bench_xlsx_convert "lista 29 07 2025.xlsx"
+"""
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# =====================================
+# 2. Замер одного движка
+# =====================================
+
+def measure(engine: str, xlsx_path: str, csv_path: str) -> dict:
+    """Выполняется в дочернем процессе."""
+    from src.infrastructure.storage import xlsx_converter
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    convert = {
+        "streaming": xlsx_converter.stream_xlsx_to_csv,
+        "pandas": xlsx_converter.pandas_xlsx_to_csv,
+    }[engine]
+
+    started = time.perf_counter()
+    result = convert(xlsx_path, csv_path)
+    duration = time.perf_counter() - started
+
+    return {
+        "engine": engine,
+        "rows": result.rows,
+        "wall_time_s": round(duration, 2),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+        "rss_before_conversion_mb": rss_before // 1024,
+    }
+
+def run_in_subprocess(engine: str, xlsx_path: str, csv_path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_xlsx_convert", "--child", engine, xlsx_path, csv_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+# =====================================
+# 3. Запуск
+# =====================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("xlsx", nargs="*", help="Файлы .xlsx для замера")
+    parser.add_argument("--child", nargs=3, metavar=("ENGINE", "XLSX", "CSV"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        engine, xlsx_path, csv_path = args.child
+        # Пакет src импортируется внутри measure(), чтобы учесть RSS после импортов
+        print(json.dumps(measure(engine, xlsx_path, csv_path)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for xlsx_path in args.xlsx:
+            outputs = {}
+            for engine in ("pandas", "streaming"):
+                outputs[engine] = os.path.join(tmp, f"{engine}.csv")
+                measurement = run_in_subprocess(engine, xlsx_path, outputs[engine])
+                measurement["file"] = os.path.basename(xlsx_path)
+                results.append(measurement)
+
+            with open(outputs["pandas"], "rb") as expected, open(outputs["streaming"], "rb") as actual:
+                results[-1]["identical_to_pandas"] = expected.read() == actual.read()
+
+    print(json.dumps({"benchmark": "xlsx_convert", "results": results}, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
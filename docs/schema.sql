@@ -12,11 +12,16 @@ CREATE TABLE IF NOT EXISTS processed_files (
   sftp_uploaded BOOLEAN DEFAULT FALSE,
   file_hash VARCHAR(64),
   -- SHA256
+  parquet_path VARCHAR(500),
+  parquet_hash VARCHAR(64),
   processed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
   email_date TIMESTAMP WITH TIME ZONE NOT NULL
 );
 -- Индекс для ускорения поиска по message_id
 CREATE INDEX IF NOT EXISTS idx_message_id ON processed_files (message_id);
+-- Parquet рядом с CSV (conversion.parquet_enabled) для существующих баз
+ALTER TABLE processed_files ADD COLUMN IF NOT EXISTS parquet_path VARCHAR(500);
+ALTER TABLE processed_files ADD COLUMN IF NOT EXISTS parquet_hash VARCHAR(64);
 -- =====================================
 -- 2. Таблица логов операций
 -- =====================================
@@ -32,3 +37,34 @@ CREATE TABLE IF NOT EXISTS operation_logs (
 );
 -- Индекс для быстрой фильтрации по типу и статусу операции
 CREATE INDEX IF NOT EXISTS idx_operation_type_status ON operation_logs (operation_type, status);
+-- =====================================
+-- 3. Таблица состояния синхронизации почты
+-- =====================================
+-- Хранит UIDVALIDITY и последний просмотренный UID для каждой папки,
+-- чтобы каждый цикл запрашивал только диапазон `UID last+1:*`.
+CREATE TABLE IF NOT EXISTS mailbox_sync_state (
+  id SERIAL PRIMARY KEY,
+  folder VARCHAR(255) UNIQUE NOT NULL,
+  uid_validity BIGINT NOT NULL,
+  last_uid BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+-- =====================================
+-- 4. Кеш конвертации .xlsx -> CSV
+-- =====================================
+-- Повторно присланная книга (пересылка, несколько адресов) не конвертируется
+-- заново: по SHA256 исходного .xlsx берется готовый CSV из директории кеша.
+CREATE TABLE IF NOT EXISTS conversion_cache (
+  id SERIAL PRIMARY KEY,
+  xlsx_hash VARCHAR(64) UNIQUE NOT NULL,
+  artifact_path VARCHAR(500) NOT NULL,
+  csv_hash VARCHAR(64) NOT NULL,
+  csv_size BIGINT NOT NULL,
+  rows BIGINT NOT NULL,
+  columns INTEGER NOT NULL,
+  hits BIGINT NOT NULL DEFAULT 0,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  last_used_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+-- Индекс для вытеснения давно не использовавшихся записей (LRU)
+CREATE INDEX IF NOT EXISTS idx_conversion_cache_last_used ON conversion_cache (last_used_at);
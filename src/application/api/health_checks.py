@@ -2,15 +2,15 @@
 # 1. Импорт библиотек
 # =====================================
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
 
-import asyncssh  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 from src.config import AppConfig
 from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.sftp.sftp_pool import SftpSessionPool, get_sftp_pool
 
 
 # =====================================
@@ -25,11 +25,15 @@ class HealthCheckService:
     - Подключение к базе данных
     - Доступность SFTP сервера
     - Общее состояние системы
+
+    SFTP проверяется через сессию из того же пула, что и загрузки
+    (`sftp_pool`, по умолчанию общий пул приложения).
     """
 
-    def __init__(self, config: AppConfig, session_factory):
+    def __init__(self, config: AppConfig, session_factory, sftp_pool: Optional[SftpSessionPool] = None):
         self.config = config
         self.session_factory = session_factory
+        self.sftp_pool = sftp_pool or get_sftp_pool(config.sftp)
         self.logger = get_logger(__name__)
 
     async def check_database(self) -> Dict[str, Any]:
@@ -85,38 +89,22 @@ class HealthCheckService:
         start_time = datetime.utcnow()
 
         try:
-            connection_options = {
-                "host": self.config.sftp.host,
-                "username": self.config.sftp.username,
-                "client_keys": [self.config.sftp.key_path],
-                "connect_timeout": 10  # Таймаут для health check
-            }
+            # Сессия из пула (или новое подключение, если свободных нет)
+            async with self.sftp_pool.session() as session:
+                # Проверяем доступ к удаленной директории
+                await session.sftp.listdir(self.config.sftp.remote_path)
 
-            # Попытка подключения к SFTP серверу
-            conn = await asyncssh.connect(**connection_options)
-            try:
-                # Пытаемся создать SFTP клиент
-                sftp = await conn.start_sftp_client()
-                try:
-                    # Проверяем доступ к удаленной директории
-                    await sftp.listdir(self.config.sftp.remote_path)
-
-                    duration = (datetime.utcnow() - start_time).total_seconds()
+            duration = (datetime.utcnow() - start_time).total_seconds()
 
-                    self.logger.debug(f"SFTP health check passed in {duration:.3f}s")
+            self.logger.debug(f"SFTP health check passed in {duration:.3f}s")
 
-                    return {
-                        "status": "healthy",
-                        "response_time_ms": round(duration * 1000, 2),
-                        "sftp_host": self.config.sftp.host,
-                        "remote_path": self.config.sftp.remote_path,
-                        "checked_at": start_time.isoformat()
-                    }
-                finally:
-                    sftp.exit()
-            finally:
-                conn.close()
-                await conn.wait_closed()
+            return {
+                "status": "healthy",
+                "response_time_ms": round(duration * 1000, 2),
+                "sftp_host": self.config.sftp.host,
+                "remote_path": self.config.sftp.remote_path,
+                "checked_at": start_time.isoformat()
+            }
 
         except Exception as e:
             duration = (datetime.utcnow() - start_time).total_seconds()
@@ -1,11 +1,18 @@
 import os
 from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
 from fastapi import FastAPI, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 
 from src.application.container import Container
 from src.application.schedulers.main_scheduler import setup_scheduler, shutdown_scheduler
 from src.infrastructure.logging.logger import setup_logging, get_logger
+from src.infrastructure.storage.file_processor import shutdown_conversion_pool
+from src.infrastructure.sftp.sftp_pool import close_sftp_pools
+from src.infrastructure.storage.storage_io import shutdown_storage_pool
 
 container = Container()
 
@@ -20,6 +27,13 @@ async def lifespan(app: FastAPI):
     logger = get_logger(__name__)
     logger.info("Application startup...")
 
+    # Загружаем последний стоп-лист в индекс поиска
+    if config.lookup.enabled:
+        await load_latest_stoplist()
+
+    # Удаляем временные файлы прерванных загрузок на SFTP
+    await cleanup_stale_uploads()
+
     # Запускаем планировщик
     setup_scheduler()
     logger.info("Scheduler started")
@@ -29,6 +43,31 @@ async def lifespan(app: FastAPI):
     logger.info("Application shutdown...")
     shutdown_scheduler()
     logger.info("Scheduler stopped")
+    shutdown_conversion_pool()
+    shutdown_storage_pool()
+    await close_sftp_pools()
+
+async def load_latest_stoplist() -> None:
+    """Загружает в индекс поиска последний сконвертированный стоп-лист из БД."""
+    logger = get_logger(__name__)
+    try:
+        latest = await container.processed_file_repo().find_latest_with_csv()
+        if latest is None or latest.csv_path is None or not os.path.exists(latest.csv_path):
+            logger.info("No converted stoplist available, lookup index is empty")
+            return
+        await container.stoplist_index().load(latest.csv_path, latest.email_date)
+    except Exception as e:
+        # Индекс загрузится при обработке следующего файла
+        logger.warning(f"Failed to load stoplist index on startup: {e}")
+
+async def cleanup_stale_uploads() -> None:
+    """Удаляет на SFTP временные файлы загрузок, прерванных до переименования."""
+    logger = get_logger(__name__)
+    try:
+        await container.sftp_service().cleanup_stale_uploads()
+    except Exception as e:
+        # Недоступный при запуске SFTP не должен мешать старту; файлы удалятся при следующем запуске
+        logger.warning(f"Failed to clean up stale SFTP uploads on startup: {e}")
 
 app = FastAPI(
     title="Email & SFTP Processor",
@@ -135,3 +174,52 @@ async def metrics():
             content=f"Error generating metrics: {str(e)}",
             media_type="text/plain"
         )
+
+# =====================================
+# Поиск по стоп-листу
+# =====================================
+
+class StoplistQuery(BaseModel):
+    """Запрос поиска: регистрационный номер, серийный номер и/или ID."""
+    plate: Optional[str] = None
+    serial: Optional[str] = None
+    id: Optional[str] = None
+
+class StoplistBatchRequest(BaseModel):
+    queries: List[StoplistQuery] = Field(..., max_length=1000)
+
+def _stoplist_unavailable() -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Stoplist index is not loaded yet"},
+    )
+
+@app.get("/stoplist/lookup", tags=["Stoplist"], response_model=None)
+async def stoplist_lookup(
+    plate: Optional[str] = None, serial: Optional[str] = None, id: Optional[str] = None
+) -> Union[JSONResponse, Dict[str, Any]]:
+    """Проверяет, есть ли автомобиль в текущем стоп-листе и с каким статусом."""
+    index = container.stoplist_index().current
+    if index is None:
+        return _stoplist_unavailable()
+    if not (plate or serial or id):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "One of plate, serial or id is required"},
+        )
+
+    matches = index.lookup(plate=plate, serial=serial, id=id)
+    return {"found": bool(matches), "matches": matches, "stoplist": index.info()}
+
+@app.post("/stoplist/lookup", tags=["Stoplist"], response_model=None)
+async def stoplist_lookup_batch(request: StoplistBatchRequest) -> Union[JSONResponse, Dict[str, Any]]:
+    """Пакетный поиск: все запросы выполняются по одной версии стоп-листа."""
+    index = container.stoplist_index().current
+    if index is None:
+        return _stoplist_unavailable()
+
+    results = []
+    for query in request.queries:
+        matches = index.lookup(plate=query.plate, serial=query.serial, id=query.id)
+        results.append({"query": query.model_dump(exclude_none=True), "found": bool(matches), "matches": matches})
+    return {"results": results, "stoplist": index.info()}
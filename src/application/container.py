@@ -8,11 +8,26 @@ from sqlalchemy.orm import sessionmaker
 from src.config import get_config
 from src.infrastructure.email.email_reader import EmailReaderService
 from src.infrastructure.storage.file_processor import FileProcessingService
+from src.infrastructure.storage.conversion_cache import ConversionCache
+from src.infrastructure.storage.stoplist_delta import StoplistDeltaService
+from src.infrastructure.storage.stoplist_index import get_stoplist_index
+from src.infrastructure.storage.storage_io import StorageIO
+from src.infrastructure.sftp.sftp_pool import get_sftp_pool
 from src.infrastructure.sftp.sftp_uploader import SftpUploadService
-from src.infrastructure.storage.repositories import ProcessedFileRepository, OperationLogRepository
+from src.infrastructure.storage.repositories import (
+    ProcessedFileRepository,
+    OperationLogRepository,
+    MailboxSyncStateRepository,
+    ConversionCacheRepository,
+)
 from src.infrastructure.notifications.email_sender import EmailSender
 from src.infrastructure.notifications.telegram_sender import TelegramSender
-from src.domain.repositories import IProcessedFileRepository, IOperationLogRepository
+from src.domain.repositories import (
+    IProcessedFileRepository,
+    IOperationLogRepository,
+    IMailboxSyncStateRepository,
+    IConversionCacheRepository,
+)
 from src.domain.services import IEmailReaderService, IFileProcessingService, ISftpUploadService
 from src.domain.services.notifications import INotificationService
 from src.application.handlers.main_handler import MainHandler
@@ -52,12 +67,22 @@ class Container(containers.DeclarativeContainer):
     # --- Репозитории ---
     processed_file_repo: providers.Factory[IProcessedFileRepository] = providers.Factory(
         ProcessedFileRepository,
-        session=db_session_factory, # Исправлено с session_factory на session
+        session_factory=db_session_factory,
     )
 
     operation_log_repo: providers.Factory[IOperationLogRepository] = providers.Factory(
         OperationLogRepository,
-        session=db_session_factory, # Исправлено с session_factory на session
+        session_factory=db_session_factory,
+    )
+
+    mailbox_sync_repo: providers.Factory[IMailboxSyncStateRepository] = providers.Factory(
+        MailboxSyncStateRepository,
+        session_factory=db_session_factory,
+    )
+
+    conversion_cache_repo: providers.Factory[IConversionCacheRepository] = providers.Factory(
+        ConversionCacheRepository,
+        session_factory=db_session_factory,
     )
 
     # --- Сервисы уведомлений (условная регистрация) ---
@@ -84,15 +109,54 @@ class Container(containers.DeclarativeContainer):
     email_service: providers.Factory[IEmailReaderService] = providers.Factory(
         EmailReaderService,
         config=config.provided.email,
+        processed_file_repo=processed_file_repo,
+        sync_state_repo=mailbox_sync_repo,
+    )
+
+    # Файловые операции хранилища (пул потоков общий для всех сервисов)
+    storage_io = providers.Singleton(
+        StorageIO,
+        config=config.provided.storage,
+    )
+
+    conversion_cache = providers.Factory(
+        ConversionCache,
+        repo=conversion_cache_repo,
+        directory=config.provided.conversion.cache_dir,
+        max_bytes=config.provided.conversion.cache_max_bytes,
+        storage_io=storage_io,
     )
 
     file_service: providers.Factory[IFileProcessingService] = providers.Factory(
         FileProcessingService,
+        conversion_config=config.provided.conversion,
+        normalization_config=config.provided.normalization,
+        conversion_cache=conversion_cache,
+        storage_io=storage_io,
+    )
+
+    delta_service = providers.Factory(
+        StoplistDeltaService,
+        file_repo=processed_file_repo,
+        config=config.provided.delta,
+    )
+
+    # Индекс текущего стоп-листа: один на процесс, общий для API и контейнеров циклов планировщика
+    stoplist_index = providers.Callable(
+        get_stoplist_index,
+        config=config.provided.lookup,
+    )
+
+    # Постоянные SFTP сессии: пул общий для всех циклов (модульный, как пулы конвертации)
+    sftp_pool = providers.Callable(
+        get_sftp_pool,
+        config=config.provided.sftp,
     )
 
     sftp_service: providers.Factory[ISftpUploadService] = providers.Factory(
         SftpUploadService,
         config=config.provided.sftp,
+        pool=sftp_pool,
     )
 
     # --- Главный обработчик ---
@@ -119,6 +183,10 @@ class Container(containers.DeclarativeContainer):
             file_repo=self.processed_file_repo(),
             log_repo=self.operation_log_repo(),
             notification_service=notification_services,
+            pipeline_config=config_instance.pipeline,
+            delta_service=self.delta_service(),
+            stoplist_index=self.stoplist_index() if config_instance.lookup.enabled else None,
+            upload_parquet=config_instance.conversion.parquet_enabled and config_instance.conversion.parquet_upload,
         )
 
     # --- Health Check Service ---
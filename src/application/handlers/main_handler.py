@@ -1,17 +1,39 @@
 # =====================================
 # 1. Импорт библиотек
 # =====================================
-from typing import List
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
 
+from src.config import PipelineConfig
 from src.domain.repositories import IProcessedFileRepository, IOperationLogRepository
-from src.domain.services import IEmailReaderService, IFileProcessingService, ISftpUploadService
+from src.domain.services import IEmailReaderService, IFileProcessingService, ISftpUploadService, RawEmail, UploadRequest
 from src.domain.models import ProcessedFile, OperationLog
 from src.domain.services.notifications import INotificationService, AlertMessage
 from src.infrastructure.logging.logger import get_logger
 from src.infrastructure.monitoring.metrics import metrics
+from src.infrastructure.storage.stoplist_delta import DeltaFile, StoplistDeltaService
+from src.infrastructure.storage.stoplist_index import StoplistIndexHolder
 
 # =====================================
-# 2. Главный обработчик
+# 2. Элементы конвейера
+# =====================================
+
+# Маркер завершения работы стадии конвейера
+_STAGE_DONE = object()
+
+class _PersistItem(NamedTuple):
+    """Файл после конвертации, ожидающий записи в БД."""
+    email: RawEmail
+    file_meta: dict
+
+class _UploadItem(NamedTuple):
+    """Файл, записанный в БД и ожидающий загрузки на SFTP."""
+    email: RawEmail
+    file: ProcessedFile
+    delta: Optional[DeltaFile] = None
+
+# =====================================
+# 3. Главный обработчик
 # =====================================
 
 class MainHandler:
@@ -20,6 +42,19 @@ class MainHandler:
 
     Объединяет работу сервисов email, обработки файлов, SFTP и уведомлений
     для реализации полного бизнес-процесса.
+
+    Обработка построена как конвейер стадий fetch -> convert -> persist -> upload,
+    связанных ограниченными asyncio.Queue. У каждой стадии свое число
+    воркеров (PipelineConfig), а заполненная очередь притормаживает
+    предыдущую стадию. Поэтому загрузка на SFTP файла N идет параллельно
+    с конвертацией файла N+1.
+
+    Если задан `delta_service`, на стадии persist для каждого CSV строится
+    дельта относительно предыдущего списка отправителя; ее сводка пишется
+    в журнал операций, а в режиме upload_delta_only на SFTP уходит только она.
+    Если задан `stoplist_index`, новый CSV заменяет индекс для API поиска.
+    С `upload_parquet` вместе с CSV на SFTP загружается и Parquet-файл, если он был записан:
+    оба одним пакетом по одной SFTP сессии, результат каждого проверяется отдельно.
     """
 
     def __init__(
@@ -30,6 +65,10 @@ class MainHandler:
         file_repo: IProcessedFileRepository,
         log_repo: IOperationLogRepository,
         notification_service: List[INotificationService],
+        pipeline_config: Optional[PipelineConfig] = None,
+        delta_service: Optional[StoplistDeltaService] = None,
+        stoplist_index: Optional[StoplistIndexHolder] = None,
+        upload_parquet: bool = False,
     ):
         self.email_service = email_service
         self.file_service = file_service
@@ -37,6 +76,10 @@ class MainHandler:
         self.file_repo = file_repo
         self.log_repo = log_repo
         self.notification_service = notification_service
+        self.pipeline_config = pipeline_config or PipelineConfig()
+        self.delta_service = delta_service
+        self.stoplist_index = stoplist_index
+        self.upload_parquet = upload_parquet
         self.logger = get_logger(__name__)
         self.logger.info("MainHandler initialized with all required services")
 
@@ -60,129 +103,315 @@ class MainHandler:
         """
         self.logger.info("Starting email processing cycle")
 
-        processed_count = 0
-        error_count = 0
+        # Письмо считается обработанным, когда все его файлы загружены на SFTP
+        self.processed_count = 0
+        self.error_count = 0
+        self._pending_uploads: Dict[str, int] = {}
+
+        cfg = self.pipeline_config
+        convert_queue: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+        persist_queue: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+        upload_queue: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+
+        stages = [
+            (convert_queue, self._start_workers(cfg.convert_workers, convert_queue, self._convert_email, persist_queue)),
+            (persist_queue, self._start_workers(cfg.persist_workers, persist_queue, self._persist_file, upload_queue)),
+            (upload_queue, self._start_workers(cfg.upload_workers, upload_queue, self._upload_file, None)),
+        ]
+        self.logger.debug(
+            f"Pipeline started: convert={cfg.convert_workers}, persist={cfg.persist_workers}, "
+            f"upload={cfg.upload_workers}, queue_size={cfg.queue_size}"
+        )
 
         try:
-            async for email in self.email_service.fetch_new_emails():
-                try:
+            try:
+                # Стадия fetch: письма поступают в конвейер по мере чтения ящика
+                async for email in self.email_service.fetch_new_emails():
                     self.logger.info(f"Processing email from {email.sender} with {len(email.attachments)} attachments")
+                    await convert_queue.put(email)
 
-                    # Шаг 1: Обработка и сохранение файлов
-                    processed_files = await self.file_service.save_and_convert(email)
-
-                    if not processed_files:
-                        self.logger.warning(f"No files were processed from email {email.message_id}")
-                        continue
-
-                    # Шаг 2: Сохранение метаданных в БД и загрузка на SFTP
-                    for file_meta in processed_files:
-                        self.logger.debug(f"Processing file metadata: {file_meta['file_name']}")
-
-                        try:
-                            # Сохранение в БД
-                            db_entry = ProcessedFile(**file_meta)
-                            created_file = await self.file_repo.add(db_entry)
-                            self.logger.debug(f"File metadata saved to database with ID: {created_file.id}")
-
-                            # Загрузка на SFTP с валидацией хеш-суммы
-                            remote_filename = created_file.file_name.replace('.xlsx', '.csv')
-                            remote_path = f"/upload/{remote_filename}"
-
-                            self.logger.debug(f"Uploading {created_file.csv_path} to SFTP with hash validation")
-                            upload_success = await self.sftp_service.upload_file_with_validation(
-                                local_path=created_file.csv_path,
-                                remote_path=remote_path,
-                                expected_hash=created_file.file_hash
-                            )
-
-                            if upload_success:
-                                # Обновляем статус загрузки в БД
-                                created_file.sftp_uploaded = True
-                                self.logger.info(f"File {created_file.file_name} successfully processed, uploaded and validated")
-
-                                # Логгируем успешную операцию с валидацией
-                                await self.log_repo.add(OperationLog(
-                                    operation_type="FILE_UPLOAD_VALIDATED",
-                                    status="SUCCESS",
-                                    message=f"File {created_file.file_name} uploaded to SFTP and hash validated",
-                                    context={
-                                        "file_id": created_file.id,
-                                        "remote_path": remote_path,
-                                        "file_hash": created_file.file_hash
-                                    }
-                                ))
-                            else:
-                                self.logger.error(f"Failed to upload or validate {created_file.file_name} on SFTP")
-
-                                # Отправляем уведомление о проблеме с SFTP/валидацией
-                                alert = AlertMessage(
-                                    level="ERROR",
-                                    error_type="SftpUploadValidationError",
-                                    service_name="MainHandler",
-                                    message=f"Failed to upload or validate file {created_file.file_name} on SFTP after all retries",
-                                    context={
-                                        "file_name": created_file.file_name,
-                                        "email_id": email.message_id,
-                                        "expected_hash": created_file.file_hash
-                                    }
-                                )
-                                await self._send_alert(alert)
-
-                        except Exception as file_error:
-                            self.logger.error(f"Error processing file {file_meta['file_name']}: {file_error}", exc_info=True)
-                            error_count += 1
-
-                            # Логгируем ошибку обработки файла
-                            await self.log_repo.add(OperationLog(
-                                operation_type="FILE_PROCESSING",
-                                status="ERROR",
-                                message=f"Error processing file {file_meta['file_name']}: {file_error}",
-                                context={"file_name": file_meta['file_name'], "email_id": email.message_id}
-                            ))
-
-                    processed_count += 1
-                    self.logger.info(f"Email {email.message_id} processing completed successfully")
-
-                except Exception as email_error:
-                    self.logger.error(f"Error processing email {email.message_id}: {email_error}", exc_info=True)
-                    error_count += 1
-
-                    # Отправляем критическое уведомление
-                    alert = AlertMessage(
-                        level="CRITICAL",
-                        error_type=email_error.__class__.__name__,
-                        service_name="MainHandler",
-                        message=f"Failed to process email {email.message_id}: {email_error}",
-                        context={"message_id": email.message_id, "sender": email.sender}
-                    )
-                    await self._send_alert(alert)
+            except Exception as general_error:
+                self.logger.critical(f"Critical error in email processing cycle: {general_error}", exc_info=True)
+
+                # Отправляем критическое системное уведомление
+                alert = AlertMessage(
+                    level="CRITICAL",
+                    error_type=general_error.__class__.__name__,
+                    service_name="MainHandler",
+                    message=f"Email processing cycle failed: {general_error}",
+                    context={"processed_count": self.processed_count, "error_count": self.error_count}
+                )
+                await self._send_alert(alert)
+
+            # Уже полученные письма дорабатываются до конца, стадии останавливаются по очереди
+            for queue, workers in stages:
+                for _ in workers:
+                    await queue.put(_STAGE_DONE)
+                await asyncio.gather(*workers)
+
+        finally:
+            for _, workers in stages:
+                for worker in workers:
+                    worker.cancel()
 
-                    # Логгируем критическую ошибку
-                    await self.log_repo.add(OperationLog(
-                        operation_type="EMAIL_PROCESSING",
-                        status="ERROR",
-                        message=f"Failed to process email {email.message_id}: {email_error}",
-                        context={"message_id": email.message_id, "sender": email.sender}
-                    ))
+            # Обновляем метрики в конце цикла
+            metrics.set_active_jobs(0)
+            if self.processed_count > 0:
+                metrics.update_last_successful_processing()
+
+            self.logger.info(f"Email processing cycle completed. Processed: {self.processed_count}, Errors: {self.error_count}")
+
+    # =====================================
+    # 4. Стадии конвейера
+    # =====================================
+
+    def _start_workers(
+        self,
+        count: int,
+        queue: asyncio.Queue,
+        handler: Callable[[Any, Any], Awaitable[None]],
+        next_queue: Optional[asyncio.Queue],
+    ) -> List[asyncio.Task]:
+        return [
+            asyncio.create_task(self._stage_worker(queue, handler, next_queue))
+            for _ in range(max(1, count))
+        ]
+
+    async def _stage_worker(
+        self,
+        queue: asyncio.Queue,
+        handler: Callable[[Any, Any], Awaitable[None]],
+        next_queue: Optional[asyncio.Queue],
+    ) -> None:
+        """Забирает элементы из очереди стадии до маркера завершения."""
+        while True:
+            item = await queue.get()
+            if item is _STAGE_DONE:
+                return
+            try:
+                await handler(item, next_queue)
+            except Exception as e:
+                # Воркер не должен завершаться: иначе очередь стадии переполнится и конвейер встанет
+                self.logger.error(f"Unexpected error in pipeline stage {handler.__name__}: {e}", exc_info=True)
+                self.error_count += 1
+
+    async def _convert_email(self, email: RawEmail, persist_queue: asyncio.Queue) -> None:
+        """Стадия convert: сохранение и конвертация вложений письма."""
+        try:
+            # Шаг 1: Обработка и сохранение файлов
+            processed_files = await self.file_service.save_and_convert(email)
+
+            if not processed_files:
+                self.logger.warning(f"No files were processed from email {email.message_id}")
+                return
 
-        except Exception as general_error:
-            self.logger.critical(f"Critical error in email processing cycle: {general_error}", exc_info=True)
+            self._pending_uploads[email.message_id] = len(processed_files)
+            self.logger.info(f"Email {email.message_id} converted, {len(processed_files)} file(s) queued for upload")
 
-            # Отправляем критическое системное уведомление
+        except Exception as email_error:
+            self.logger.error(f"Error processing email {email.message_id}: {email_error}", exc_info=True)
+            self.error_count += 1
+
+            # Отправляем критическое уведомление
             alert = AlertMessage(
                 level="CRITICAL",
-                error_type=general_error.__class__.__name__,
+                error_type=email_error.__class__.__name__,
                 service_name="MainHandler",
-                message=f"Email processing cycle failed: {general_error}",
-                context={"processed_count": processed_count, "error_count": error_count}
+                message=f"Failed to process email {email.message_id}: {email_error}",
+                context={"message_id": email.message_id, "sender": email.sender}
             )
             await self._send_alert(alert)
 
-        finally:
-            # Обновляем метрики в конце цикла
-            metrics.set_active_jobs(0)
-            if processed_count > 0:
-                metrics.update_last_successful_processing()
+            # Логгируем критическую ошибку
+            await self._log_safely(OperationLog(
+                operation_type="EMAIL_PROCESSING",
+                status="ERROR",
+                message=f"Failed to process email {email.message_id}: {email_error}",
+                context={"message_id": email.message_id, "sender": email.sender}
+            ))
+            return
+
+        # Шаг 2: Передача файлов на запись в БД и загрузку на SFTP
+        for file_meta in processed_files:
+            await persist_queue.put(_PersistItem(email, file_meta))
+
+    async def _persist_file(self, item: _PersistItem, upload_queue: asyncio.Queue) -> None:
+        """Стадия persist: сохранение метаданных файла в БД."""
+        self.logger.debug(f"Processing file metadata: {item.file_meta['file_name']}")
+
+        try:
+            db_entry = ProcessedFile(**item.file_meta)
+            created_file = await self.file_repo.add(db_entry)
+            self.logger.debug(f"File metadata saved to database with ID: {created_file.id}")
+        except Exception as file_error:
+            await self._handle_file_error(item.file_meta['file_name'], item.email, file_error)
+            return
+
+        delta = await self._build_delta(created_file, item.email)
+        await self._refresh_index(created_file)
+        await upload_queue.put(_UploadItem(item.email, created_file, delta))
+
+    async def _refresh_index(self, created_file: ProcessedFile) -> None:
+        """Делает новый стоп-лист текущим для API поиска; ошибка не мешает загрузке файла."""
+        if self.stoplist_index is None or not created_file.csv_path:
+            return
+
+        try:
+            await self.stoplist_index.load(created_file.csv_path, created_file.email_date)
+        except Exception as e:
+            self.logger.error(f"Failed to load stoplist index from {created_file.csv_path}: {e}", exc_info=True)
+
+    async def _build_delta(self, created_file: ProcessedFile, email: RawEmail) -> Optional[DeltaFile]:
+        """Строит дельту стоп-листа; ошибка дельты не мешает загрузке полного файла."""
+        if self.delta_service is None:
+            return None
+
+        try:
+            delta = await self.delta_service.build_delta(created_file)
+        except Exception as e:
+            self.logger.error(f"Failed to build stoplist delta for {created_file.file_name}: {e}", exc_info=True)
+            return None
+
+        if delta is not None:
+            await self._log_safely(OperationLog(
+                operation_type="STOPLIST_DELTA",
+                status="SUCCESS",
+                message=f"Stoplist delta built for {created_file.file_name}",
+                context={"file_id": created_file.id, "email_id": email.message_id, **delta.summary},
+            ))
+        return delta
+
+    async def _upload_file(self, item: _UploadItem, _: Optional[asyncio.Queue] = None) -> None:
+        """Стадия upload: загрузка CSV на SFTP с валидацией хеш-суммы."""
+        email, created_file, delta = item
 
-            self.logger.info(f"Email processing cycle completed. Processed: {processed_count}, Errors: {error_count}")
+        try:
+            local_path, expected_hash = created_file.csv_path, created_file.file_hash
+            remote_filename = created_file.file_name.replace('.xlsx', '.csv')
+            if delta is not None and self.delta_service is not None and self.delta_service.upload_delta_only:
+                # На SFTP уходят только изменения относительно предыдущего списка
+                local_path, expected_hash = delta.path, delta.sha256
+                remote_filename = created_file.file_name.replace('.xlsx', '_delta.csv')
+            remote_path = f"/upload/{remote_filename}"
+            if local_path is None or expected_hash is None:
+                raise ValueError(f"File {created_file.file_name} has no CSV path or SHA256 to upload")
+
+            parquet: Optional[UploadRequest] = None
+            if self.upload_parquet and created_file.parquet_path:
+                if created_file.parquet_hash is None:
+                    # Без хеша загрузку нечем проверить; CSV при этом загружается как обычно
+                    self.logger.warning(f"Parquet for {created_file.file_name} has no SHA256, skipping its upload")
+                else:
+                    parquet = UploadRequest(
+                        local_path=created_file.parquet_path,
+                        remote_path=f"/upload/{created_file.file_name.replace('.xlsx', '.parquet')}",
+                        expected_hash=created_file.parquet_hash,
+                    )
+
+            self.logger.debug(f"Uploading {local_path} to SFTP with hash validation")
+            if parquet is not None:
+                # CSV и Parquet передаются одновременно по одной сессии
+                upload_success, parquet_success = await self.sftp_service.upload_files_with_validation(
+                    [UploadRequest(local_path, remote_path, expected_hash), parquet]
+                )
+            else:
+                upload_success = await self.sftp_service.upload_file_with_validation(
+                    local_path=local_path,
+                    remote_path=remote_path,
+                    expected_hash=expected_hash
+                )
+
+            if upload_success:
+                # Обновляем статус загрузки в БД
+                created_file.sftp_uploaded = True
+                self.logger.info(f"File {created_file.file_name} successfully processed, uploaded and validated")
+                self._file_uploaded(email)
+
+                # Логгируем успешную операцию с валидацией
+                await self.log_repo.add(OperationLog(
+                    operation_type="FILE_UPLOAD_VALIDATED",
+                    status="SUCCESS",
+                    message=f"File {created_file.file_name} uploaded to SFTP and hash validated",
+                    context={
+                        "file_id": created_file.id,
+                        "remote_path": remote_path,
+                        "file_hash": expected_hash
+                    }
+                ))
+            else:
+                self.logger.error(f"Failed to upload or validate {created_file.file_name} on SFTP")
+
+                # Отправляем уведомление о проблеме с SFTP/валидацией
+                alert = AlertMessage(
+                    level="ERROR",
+                    error_type="SftpUploadValidationError",
+                    service_name="MainHandler",
+                    message=f"Failed to upload or validate file {created_file.file_name} on SFTP after all retries",
+                    context={
+                        "file_name": created_file.file_name,
+                        "email_id": email.message_id,
+                        "expected_hash": expected_hash
+                    }
+                )
+                await self._send_alert(alert)
+
+            if parquet is not None:
+                await self._report_parquet_upload(created_file, email, parquet, parquet_success)
+
+        except Exception as file_error:
+            await self._handle_file_error(created_file.file_name, email, file_error)
+
+    def _file_uploaded(self, email: RawEmail) -> None:
+        """Учитывает загруженный файл; последний файл письма засчитывает письмо в processed_count."""
+        remaining = self._pending_uploads.get(email.message_id, 0) - 1
+        if remaining > 0:
+            self._pending_uploads[email.message_id] = remaining
+            return
+        self._pending_uploads.pop(email.message_id, None)
+        self.processed_count += 1
+        self.logger.info(f"Email {email.message_id} processing completed successfully")
+
+    async def _report_parquet_upload(
+        self, created_file: ProcessedFile, email: RawEmail, parquet: UploadRequest, upload_success: bool
+    ) -> None:
+        """Журнал или уведомление по Parquet-файлу; его ошибка не отменяет загруженный CSV."""
+        if upload_success:
+            await self._log_safely(OperationLog(
+                operation_type="FILE_UPLOAD_VALIDATED",
+                status="SUCCESS",
+                message=f"Parquet for {created_file.file_name} uploaded to SFTP and hash validated",
+                context={"file_id": created_file.id, "remote_path": parquet.remote_path, "file_hash": parquet.expected_hash},
+            ))
+            return
+
+        self.logger.error(f"Failed to upload or validate Parquet for {created_file.file_name} on SFTP")
+        await self._send_alert(AlertMessage(
+            level="ERROR",
+            error_type="SftpUploadValidationError",
+            service_name="MainHandler",
+            message=f"Failed to upload or validate Parquet for {created_file.file_name} on SFTP after all retries",
+            context={
+                "file_name": created_file.file_name,
+                "email_id": email.message_id,
+                "expected_hash": parquet.expected_hash,
+            },
+        ))
+
+    async def _handle_file_error(self, file_name: str, email: RawEmail, file_error: Exception) -> None:
+        self.logger.error(f"Error processing file {file_name}: {file_error}", exc_info=True)
+        self.error_count += 1
+
+        # Логгируем ошибку обработки файла
+        await self._log_safely(OperationLog(
+            operation_type="FILE_PROCESSING",
+            status="ERROR",
+            message=f"Error processing file {file_name}: {file_error}",
+            context={"file_name": file_name, "email_id": email.message_id}
+        ))
+
+    async def _log_safely(self, log: OperationLog) -> None:
+        """Пишет журнал операций; сбой записи не должен останавливать воркер стадии."""
+        try:
+            await self.log_repo.add(log)
+        except Exception as e:
+            self.logger.error(f"Failed to write operation log: {e}")
@@ -1,10 +1,15 @@
 # =====================================
 # 1. Импорт библиотек
 # =====================================
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from src.application.container import Container
 from src.application.handlers.main_handler import MainHandler
+from src.infrastructure.email.idle_watcher import ImapIdleWatcher
 from src.infrastructure.logging.logger import get_logger
 
 # =====================================
@@ -14,30 +19,80 @@ from src.infrastructure.logging.logger import get_logger
 scheduler = AsyncIOScheduler()
 logger = get_logger(__name__)
 
+# Наблюдатель IMAP IDLE (создается, только если push-режим включен)
+idle_watcher: Optional[ImapIdleWatcher] = None
+
+# Не допускает параллельных циклов обработки от интервальной задачи и push-уведомлений
+_processing_lock = asyncio.Lock()
+# Запуск запрошен, пока шел цикл: после цикла обработка выполняется еще раз
+_rerun_requested = False
+
 async def trigger_email_processing():
     """
     Задача планировщика для запуска обработки email.
 
     Создает новый экземпляр контейнера и обработчика для каждого запуска,
     обеспечивая изоляцию между выполнениями.
+
+    Если цикл уже выполняется, запуск не ждет и не пропускается, а отмечается:
+    по окончании текущего цикла обработка повторяется (несколько таких
+    запросов объединяются в один повтор), так что письмо, пришедшее во время
+    цикла, не ждет следующего IDLE уведомления или интервальной проверки.
     """
-    logger.info("Scheduler triggered: Starting email processing task")
+    global _rerun_requested
 
-    try:
-        container = Container()
-        handler: MainHandler = await container.main_handler()
+    if _processing_lock.locked():
+        logger.info("Email processing is already running, another run will follow it")
+        _rerun_requested = True
+        return
 
-        await handler.process_emails()
-        logger.info("Email processing task completed successfully")
+    while True:
+        _rerun_requested = False
+        async with _processing_lock:
+            logger.info("Scheduler triggered: Starting email processing task")
 
-    except Exception as e:
-        logger.error(f"Email processing task failed: {e}", exc_info=True)
-        # В реальном приложении здесь может быть отправка критического уведомления
+            try:
+                container = Container()
+                handler: MainHandler = await container.main_handler()
+
+                await handler.process_emails()
+                logger.info("Email processing task completed successfully")
+
+            except Exception as e:
+                logger.error(f"Email processing task failed: {e}", exc_info=True)
+                # В реальном приложении здесь может быть отправка критического уведомления
+
+        # Между освобождением блокировки и проверкой нет await: запрос не потеряется
+        if not _rerun_requested:
+            break
+
+def request_immediate_processing(delay_seconds: float = 0.0) -> None:
+    """
+    Планирует внеочередной запуск обработки (используется push-режимом IMAP IDLE).
+
+    Повторные запросы в пределах задержки объединяются в один запуск.
+    Если цикл уже выполняется, новый запуск начнется сразу после него
+    (см. trigger_email_processing). Безопасно вызывать из стороннего потока.
+    """
+    scheduler.add_job(
+        trigger_email_processing,
+        'date',
+        run_date=datetime.now(scheduler.timezone) + timedelta(seconds=delay_seconds),
+        id='email_processing_push',
+        replace_existing=True,
+        misfire_grace_time=None,
+        # Запуск, пришедший во время предыдущего push-цикла, не должен отбрасываться
+        # планировщиком ("maximum number of running instances"): он сразу
+        # завершается, отметив повтор
+        max_instances=2,
+    )
 
 def setup_scheduler():
     """
     Настраивает и запускает планировщик задач.
     """
+    global idle_watcher
+
     try:
         container = Container()
         config = container.config()
@@ -61,6 +116,16 @@ def setup_scheduler():
         else:
             logger.warning("Scheduler was already running")
 
+        # Push-режим: интервальная задача остается страховочной проверкой
+        if config.email.idle_enabled and idle_watcher is None:
+            debounce = config.email.idle_debounce_seconds
+            idle_watcher = ImapIdleWatcher(
+                config=config.email,
+                on_new_mail=lambda: request_immediate_processing(debounce),
+            )
+            idle_watcher.start()
+            logger.info("IMAP IDLE push mode enabled")
+
     except Exception as e:
         logger.error(f"Failed to setup scheduler: {e}", exc_info=True)
         raise
@@ -69,7 +134,13 @@ def shutdown_scheduler():
     """
     Корректно останавливает планировщик.
     """
+    global idle_watcher
+
     try:
+        if idle_watcher is not None:
+            idle_watcher.stop()
+            idle_watcher = None
+
         if scheduler.running:
             scheduler.shutdown(wait=True)
             logger.info("Scheduler shut down successfully")
@@ -3,7 +3,7 @@
 # =====================================
 import os
 from functools import lru_cache
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 import yaml
 from pydantic_settings import BaseSettings
@@ -18,6 +18,14 @@ class EmailConfig(BaseSettings):
     username: str
     password: str
     allowed_senders: List[str]
+    fetch_queue_size: int = 16  # Сколько писем поток IMAP может опережать обработку
+    spool_chunk_size: int = 1024 * 1024  # Размер куска (байт) при потоковой загрузке вложений
+    in_memory_attachment_limit: int = 8 * 1024 * 1024  # Вложения до этого размера конвертируются из памяти (0 - всегда через диск)
+    # --- Push-режим (IMAP IDLE) ---
+    idle_enabled: bool = False
+    idle_timeout_seconds: int = 300  # Перезапуск IDLE (RFC 2177 требует < 29 минут)
+    idle_reconnect_max_delay: int = 300  # Максимальная пауза между переподключениями
+    idle_debounce_seconds: float = 2.0  # Группировка нескольких уведомлений в один запуск
 
 class DatabaseConfig(BaseSettings):
     host: str
@@ -28,9 +36,24 @@ class DatabaseConfig(BaseSettings):
 
 class SftpConfig(BaseSettings):
     host: str
+    port: int = 22
     username: str
     key_path: str
     remote_path: str
+    compression: Literal["none", "gzip", "zstd"] = "none"  # Сжатие при загрузке (zstd требует zstandard)
+    compression_level: Optional[int] = None  # По умолчанию: gzip 6, zstd 3
+    # Проверка загруженного файла: auto (sha256sum на сервере, иначе download), sha256sum, download, stat
+    verification: Literal["auto", "sha256sum", "download", "stat"] = "auto"
+    # Пул постоянных SFTP сессий (загрузчик и health check)
+    pool_size: int = 4                    # Одновременно открытых сессий
+    pool_max_idle: float = 300            # Простаивающая дольше сессия закрывается, секунд
+    pool_checkout_timeout: float = 30     # Предел ожидания свободной сессии, секунд
+    keepalive_interval: float = 30        # SSH keepalive, секунд; простоявшая дольше сессия проверяется перед выдачей
+    connect_timeout: float = 10
+    # Загрузка нескольких файлов по одной сессии и конвейер запросов записи SFTP
+    upload_concurrency: int = 4           # Файлов одновременно в одной сессии
+    block_size: int = 0                   # Байт в запросе записи (0 - по лимитам сервера, asyncssh)
+    max_requests: int = 0                 # Запросов записи в полете (0 - по размеру блока, asyncssh)
 
 class NotificationsConfig(BaseSettings):
     class Email(BaseSettings):
@@ -48,6 +71,63 @@ class NotificationsConfig(BaseSettings):
 class SchedulerConfig(BaseSettings):
     interval_hours: int
 
+class PipelineConfig(BaseSettings):
+    """Параллелизм стадий конвейера обработки (fetch -> convert -> persist -> upload)."""
+    queue_size: int = 8        # Емкость очереди между стадиями (источник backpressure)
+    convert_workers: int = 2
+    persist_workers: int = 2
+    upload_workers: int = 4
+
+class ConversionConfig(BaseSettings):
+    """Выполнение конвертации .xlsx -> CSV вне event loop."""
+    mode: Literal["thread", "process"] = "thread"   # process - пул процессов, конвертации идут на разных ядрах
+    max_workers: int = 2       # Одновременных конвертаций (и процессов в пуле)
+    cache_dir: str = "storage/cas"          # Директория кеша готовых CSV (по SHA256 .xlsx)
+    cache_max_bytes: int = 1024 ** 3        # Предел размера кеша, LRU-вытеснение (0 - кеш отключен)
+    # Бэкенд чтения .xlsx (xlsx_readers); auto - calamine, если установлен и книга небольшая, иначе xml
+    reader: Literal["auto", "calamine", "xml", "openpyxl"] = "auto"
+    # --- Parquet рядом с CSV (нужен pyarrow) ---
+    parquet_enabled: bool = False
+    parquet_compression: Literal["zstd", "gzip", "snappy", "none"] = "zstd"
+    parquet_upload: bool = False        # Загружать Parquet на SFTP вместе с CSV
+
+class StorageConfig(BaseSettings):
+    """Файловые операции стадии обработки файлов (отдельный пул потоков вне event loop)."""
+    io_workers: int = 4    # Одновременных операций с хранилищем (makedirs, перенос, запись, fsync)
+    fsync: bool = True     # fsync файла и директории по завершении записи
+
+class NormalizationRules(BaseSettings):
+    """Правила приведения листа стоп-листа к таблице с настоящим заголовком."""
+    header_columns: List[str] = ["SERIJSKI BROJ", "REGISTARSKI BROJ VOZILA"]  # По ним ищется строка заголовка
+    drop_columns: List[str] = ["Row Number"]
+    drop_empty_columns: bool = True
+    plate_columns: List[str] = ["REGISTARSKI BROJ VOZILA"]  # Без пробелов по краям, в верхнем регистре
+    id_columns: List[str] = ["SERIJSKI BROJ", "ID"]         # Числовые коды без '.0'
+
+class NormalizationConfig(BaseSettings):
+    """Нормализация CSV по отправителю; файлы остальных отправителей остаются как в книге."""
+    senders: Dict[str, NormalizationRules] = {}
+
+    def rules_for(self, sender: str) -> Optional[NormalizationRules]:
+        sender = sender.lower()
+        return next((rules for address, rules in self.senders.items() if address.lower() == sender), None)
+
+class DeltaConfig(BaseSettings):
+    """Дельта стоп-листа относительно предыдущего списка отправителя."""
+    enabled: bool = True
+    key_columns: List[str] = ["SERIJSKI BROJ"]      # Ключ строки
+    ignore_columns: List[str] = ["Row Number"]      # Не учитываются при поиске изменений
+    upload_delta_only: bool = False     # Загружать на SFTP только дельту (если есть предыдущий список)
+
+class LookupConfig(BaseSettings):
+    """Индекс текущего стоп-листа в памяти для API поиска (/stoplist/lookup)."""
+    enabled: bool = True
+    plate_column: str = "REGISTARSKI BROJ VOZILA"
+    serial_column: str = "SERIJSKI BROJ"
+    id_column: str = "ID"
+    # Колонки, которые возвращает поиск
+    result_columns: List[str] = ["SERIJSKI BROJ", "ID", "KUPAC", "KATEGORIJA VOZILA", "REGISTARSKI BROJ VOZILA", "STATUS"]
+
 class LoggingConfig(BaseSettings):
     config_file: str
     log_to_file: bool
@@ -60,6 +140,12 @@ class AppConfig(BaseSettings):
     notifications: NotificationsConfig
     scheduler: SchedulerConfig
     logging: LoggingConfig
+    pipeline: PipelineConfig = PipelineConfig()
+    conversion: ConversionConfig = ConversionConfig()
+    storage: StorageConfig = StorageConfig()
+    normalization: NormalizationConfig = NormalizationConfig()
+    delta: DeltaConfig = DeltaConfig()
+    lookup: LookupConfig = LookupConfig()
 
 # =====================================
 # 3. Функция загрузки конфигурации
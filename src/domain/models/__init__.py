@@ -15,14 +15,16 @@ class ProcessedFile(BaseModel):
     Модель для представления информации об обработанном файле.
     Соответствует таблице processed_files в БД.
     """
-    id: Optional[int] = Field(None, description="Уникальный идентификатор записи")
+    id: Optional[int] = Field(default=None, description="Уникальный идентификатор записи")
     message_id: str = Field(..., description="Уникальный идентификатор email-сообщения")
     sender_email: str = Field(..., description="Email отправителя")
     file_name: str = Field(..., description="Имя исходного файла")
     file_path: str = Field(..., description="Путь к сохраненному .xlsx файлу")
-    csv_path: Optional[str] = Field(None, description="Путь к сконвертированному .csv файлу")
-    sftp_uploaded: bool = Field(False, description="Статус загрузки на SFTP")
-    file_hash: Optional[str] = Field(None, description="Хеш-сумма файла (SHA256)")
+    csv_path: Optional[str] = Field(default=None, description="Путь к сконвертированному .csv файлу")
+    sftp_uploaded: bool = Field(default=False, description="Статус загрузки на SFTP")
+    file_hash: Optional[str] = Field(default=None, description="Хеш-сумма файла (SHA256)")
+    parquet_path: Optional[str] = Field(default=None, description="Путь к Parquet-файлу, записанному вместе с CSV")
+    parquet_hash: Optional[str] = Field(default=None, description="Хеш-сумма Parquet-файла (SHA256)")
     processed_at: datetime = Field(default_factory=datetime.now, description="Время обработки")
     email_date: datetime = Field(..., description="Дата из заголовка письма")
 
@@ -34,12 +36,45 @@ class OperationLog(BaseModel):
     Модель для логов операций.
     Соответствует таблице operation_logs в БД.
     """
-    id: Optional[int] = Field(None, description="Уникальный идентификатор записи")
+    id: Optional[int] = Field(default=None, description="Уникальный идентификатор записи")
     operation_type: str = Field(..., description="Тип операции (e.g., 'EMAIL_FETCH', 'FILE_CONVERT')")
     status: str = Field(..., description="Статус операции (SUCCESS, ERROR, WARNING)")
-    message: Optional[str] = Field(None, description="Сообщение, связанное с операцией")
-    context: Optional[Dict[str, Any]] = Field(None, description="Дополнительный контекст в формате JSON")
+    message: Optional[str] = Field(default=None, description="Сообщение, связанное с операцией")
+    context: Optional[Dict[str, Any]] = Field(default=None, description="Дополнительный контекст в формате JSON")
     created_at: datetime = Field(default_factory=datetime.now, description="Время создания лога")
 
     class Config:
         from_attributes = True
+
+class MailboxSyncState(BaseModel):
+    """
+    Состояние инкрементальной синхронизации почтовой папки.
+    Соответствует таблице mailbox_sync_state в БД.
+    """
+    id: Optional[int] = Field(default=None, description="Уникальный идентификатор записи")
+    folder: str = Field(..., description="Имя почтовой папки (e.g., 'INBOX')")
+    uid_validity: int = Field(..., description="UIDVALIDITY папки на момент синхронизации")
+    last_uid: int = Field(default=0, description="Последний просмотренный UID (high-water mark)")
+    updated_at: datetime = Field(default_factory=datetime.now, description="Время последней синхронизации")
+
+    class Config:
+        from_attributes = True
+
+class ConversionCacheEntry(BaseModel):
+    """
+    Запись кеша конвертации: SHA256 исходного .xlsx -> готовый CSV.
+    Соответствует таблице conversion_cache в БД.
+    """
+    id: Optional[int] = Field(default=None, description="Уникальный идентификатор записи")
+    xlsx_hash: str = Field(..., description="SHA256 исходного .xlsx (ключ кеша)")
+    artifact_path: str = Field(..., description="Путь к CSV в директории кеша")
+    csv_hash: str = Field(..., description="SHA256 CSV")
+    csv_size: int = Field(..., description="Размер CSV в байтах")
+    rows: int = Field(..., description="Строк данных в CSV")
+    columns: int = Field(..., description="Колонок в CSV")
+    hits: int = Field(default=0, description="Сколько раз CSV взят из кеша")
+    created_at: datetime = Field(default_factory=datetime.now, description="Время первой конвертации")
+    last_used_at: datetime = Field(default_factory=datetime.now, description="Время последнего использования (для LRU)")
+
+    class Config:
+        from_attributes = True
@@ -2,9 +2,10 @@
 # 1. Импорт библиотек
 # =====================================
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, Optional, List, Any
+from typing import Generic, TypeVar, Optional, List, Any, Iterable, Set
+from datetime import datetime
 
-from src.domain.models import ProcessedFile, OperationLog
+from src.domain.models import ProcessedFile, OperationLog, MailboxSyncState, ConversionCacheEntry
 
 # =====================================
 # 2. Определение Generic-типов
@@ -46,8 +47,71 @@ class IProcessedFileRepository(AbstractRepository[ProcessedFile], ABC):
         """Ищет файл по уникальному ID сообщения."""
         raise NotImplementedError
 
+    @abstractmethod
+    async def find_existing_message_ids(self, message_ids: Iterable[str]) -> Set[str]:
+        """Возвращает подмножество переданных ID сообщений, уже сохраненных в БД (одним запросом)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_latest_with_csv(self) -> Optional[ProcessedFile]:
+        """Возвращает файл с CSV и самой поздней датой письма."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_previous_by_sender(self, sender_email: str, before: datetime) -> Optional[ProcessedFile]:
+        """Возвращает последний файл отправителя с CSV и датой письма раньше `before`."""
+        raise NotImplementedError
+
 class IOperationLogRepository(AbstractRepository[OperationLog], ABC):
     """
     Интерфейс для репозитория логов операций.
     """
     pass # На данный момент стандартных CRUD операций достаточно
+
+class IMailboxSyncStateRepository(AbstractRepository[MailboxSyncState], ABC):
+    """
+    Интерфейс для репозитория состояния синхронизации почтовых папок.
+    """
+    @abstractmethod
+    async def get_by_folder(self, folder: str) -> Optional[MailboxSyncState]:
+        """Возвращает сохраненное состояние папки или None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def save(self, state: MailboxSyncState) -> MailboxSyncState:
+        """Создает или обновляет состояние папки (upsert по имени папки)."""
+        raise NotImplementedError
+
+class IConversionCacheRepository(AbstractRepository[ConversionCacheEntry], ABC):
+    """
+    Интерфейс для репозитория кеша конвертации.
+    """
+    @abstractmethod
+    async def find_by_xlsx_hash(self, xlsx_hash: str) -> Optional[ConversionCacheEntry]:
+        """Ищет запись по SHA256 исходного .xlsx."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def save(self, entry: ConversionCacheEntry) -> ConversionCacheEntry:
+        """Создает или обновляет запись (upsert по xlsx_hash)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def touch(self, xlsx_hash: str, used_at: datetime) -> None:
+        """Отмечает использование записи: обновляет last_used_at и счетчик попаданий."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def total_size(self) -> int:
+        """Суммарный размер CSV в кеше (байт)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def least_recently_used(self, limit: int) -> List[ConversionCacheEntry]:
+        """Возвращает до `limit` записей, давно не использовавшихся (по возрастанию last_used_at)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_by_xlsx_hashes(self, xlsx_hashes: Iterable[str]) -> None:
+        """Удаляет записи по SHA256 исходных .xlsx."""
+        raise NotImplementedError
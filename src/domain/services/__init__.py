@@ -2,7 +2,7 @@
 # 1. Импорт библиотек
 # =====================================
 from abc import ABC, abstractmethod
-from typing import List, AsyncGenerator, NamedTuple, Optional
+from typing import List, AsyncGenerator, AsyncIterator, NamedTuple, Optional
 from datetime import datetime
 
 # =====================================
@@ -10,9 +10,20 @@ from datetime import datetime
 # =====================================
 
 class EmailAttachment(NamedTuple):
-    """Структура для хранения вложения из письма."""
+    """
+    Вложение из письма.
+
+    Большие вложения не держатся в памяти: сервис чтения почты пишет их
+    потоково в директорию хранения, а дальше передается только путь.
+    Небольшие вложения приходят с содержимым в `content`; тогда рядом с `path`
+    лежит пустой скрытый резерв имени `.<имя>.part`, а сам .xlsx
+    архивируется под `path` при конвертации.
+    """
     filename: str
-    content: bytes
+    path: str       # Путь к сохраненному файлу
+    size: int       # Размер в байтах (после декодирования)
+    sha256: str     # SHA256 содержимого
+    content: Optional[bytes] = None     # Содержимое, если вложение не записано на диск
 
 class RawEmail(NamedTuple):
     """Структура для хранения необработанного письма."""
@@ -21,6 +32,18 @@ class RawEmail(NamedTuple):
     date: datetime
     attachments: List[EmailAttachment]
 
+class UploadRequest(NamedTuple):
+    """Файл для загрузки на SFTP с проверкой хеш-суммы."""
+    local_path: str
+    remote_path: str
+    expected_hash: str  # SHA256 локального файла
+
+class StreamUpload(NamedTuple):
+    """Итог потоковой загрузки на SFTP."""
+    remote_path: str  # Путь на SFTP (с расширением сжатия)
+    sha256: str       # SHA256 переданных данных до сжатия
+    size: int
+
 # =====================================
 # 3. Абстрактные интерфейсы сервисов
 # =====================================
@@ -75,3 +98,43 @@ class ISftpUploadService(ABC):
             bool: True если загрузка и валидация успешны, False в противном случае
         """
         raise NotImplementedError
+
+    @abstractmethod
+    async def upload_files_with_validation(self, files: List[UploadRequest]) -> List[bool]:
+        """
+        Загружает несколько файлов по одному соединению, параллельно, с проверкой каждого.
+
+        Args:
+            files: Файлы для загрузки
+
+        Returns:
+            List[bool]: Результат для каждого файла (в порядке `files`)
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upload_stream(
+        self, chunks: AsyncIterator[bytes], remote_path: str, local_copy: Optional[str] = None
+    ) -> Optional[StreamUpload]:
+        """
+        Загружает данные на SFTP по мере их получения, без готового локального файла.
+
+        Args:
+            chunks: Асинхронный итератор кусков данных (например, вывод конвертера)
+            remote_path: Путь назначения на SFTP сервере
+            local_copy: Путь, по которому одновременно сохраняется локальная копия (необязательно)
+
+        Returns:
+            Optional[StreamUpload]: Хеш и размер загруженных данных или None при неудаче
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def cleanup_stale_uploads(self) -> int:
+        """
+        Удаляет временные файлы прерванных загрузок на SFTP сервере (вызывается при запуске).
+
+        Returns:
+            int: Число удаленных файлов
+        """
+        raise NotImplementedError
@@ -0,0 +1,206 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import re
+from collections.abc import Iterable
+from email.header import decode_header, make_header
+from typing import Any, NamedTuple
+from urllib.parse import unquote_to_bytes
+
+# =====================================
+# 2. Структуры данных
+# =====================================
+
+# Разобранное значение ответа IMAP: атом/строка (bytes), NIL (None) или список
+ImapValue = bytes | None | list[Any]
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+class MimePart(NamedTuple):
+    """Описание листовой MIME-части письма по данным BODYSTRUCTURE."""
+    part_id: str            # Номер части для BODY.PEEK[<part_id>]
+    content_type: str       # e.g. 'application/pdf'
+    filename: str | None
+    encoding: str           # Content-Transfer-Encoding в нижнем регистре
+    size: int               # Размер в закодированном виде (байт)
+
+class BodyStructureError(ValueError):
+    """Ответ сервера не удалось разобрать как BODYSTRUCTURE."""
+
+# =====================================
+# 3. Разбор ответов FETCH
+# =====================================
+
+_TOKEN_RE = re.compile(rb'\s*(?:(?P<open>\()|(?P<close>\))|"(?P<quoted>(?:[^"\\]|\\.)*)"|\{(?P<literal>\d+)\}\s*$|(?P<atom>[^\s()"\[]+(?:\[[^\]]*\][^\s()"]*)?))')
+
+def _tokenize(segment: bytes, literal: bytes | None, tokens: list[tuple[str, bytes | None]]) -> None:
+    pos = 0
+    while pos < len(segment):
+        match = _TOKEN_RE.match(segment, pos)
+        if not match or match.end() == pos:
+            if segment[pos:].strip():
+                raise BodyStructureError(f"Unexpected IMAP data: {segment[pos:pos + 40]!r}")
+            break
+        pos = match.end()
+
+        if match.group('open'):
+            tokens.append(('(', None))
+        elif match.group('close'):
+            tokens.append((')', None))
+        elif match.group('quoted') is not None:
+            tokens.append(('str', re.sub(rb'\\(.)', rb'\1', match.group('quoted'))))
+        elif match.group('literal') is not None:
+            if literal is None:
+                raise BodyStructureError("Literal marker without literal data")
+            tokens.append(('str', literal))
+        elif match.group('atom') is not None:
+            atom = match.group('atom')
+            tokens.append(('nil', None) if atom.upper() == b'NIL' else ('str', atom))
+
+def _build(tokens: list[tuple[str, bytes | None]], pos: int) -> tuple[ImapValue, int]:
+    kind, value = tokens[pos]
+    if kind == '(':
+        items = []
+        pos += 1
+        while tokens[pos][0] != ')':
+            item, pos = _build(tokens, pos)
+            items.append(item)
+        return items, pos + 1
+    if kind == ')':
+        raise BodyStructureError("Unbalanced parenthesis in IMAP response")
+    return value, pos + 1
+
+def parse_fetch_response(data: Iterable[bytes | tuple[bytes, bytes] | None]) -> dict[str, dict[str, ImapValue]]:
+    """
+    Разбирает ответ imaplib на `UID FETCH` в словарь по UID.
+
+    Args:
+        data: Вторая часть результата `client.uid('FETCH', ...)`
+
+    Returns:
+        Dict[str, Dict[str, ImapValue]]: {uid: {'BODYSTRUCTURE': [...], 'BODY[1]': b'...'}}
+    """
+    tokens: list[tuple[str, bytes | None]] = []
+    for item in data:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            _tokenize(item[0], item[1], tokens)
+        else:
+            _tokenize(item, None, tokens)
+
+    result: dict[str, dict[str, ImapValue]] = {}
+    pos = 0
+    try:
+        while pos < len(tokens):
+            # Каждый ответ имеет вид: <seq> (<ключ> <значение> ...)
+            pos += 1
+            attributes, pos = _build(tokens, pos)
+            if not isinstance(attributes, list):
+                raise BodyStructureError(f"Expected a parenthesized FETCH response, got {attributes!r}")
+            fields: dict[str, ImapValue] = {
+                attributes[i].decode('ascii', 'replace').upper(): attributes[i + 1]
+                for i in range(0, len(attributes) - 1, 2)
+            }
+            uid = fields.get('UID')
+            if isinstance(uid, bytes):
+                result[uid.decode('ascii')] = fields
+    except (IndexError, AttributeError, TypeError) as e:
+        raise BodyStructureError(f"Malformed FETCH response: {e}") from e
+
+    return result
+
+# =====================================
+# 4. Разбор BODYSTRUCTURE
+# =====================================
+
+def _text(value: ImapValue) -> str:
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else ''
+
+def _params(value: ImapValue) -> dict[str, str]:
+    if not isinstance(value, list):
+        return {}
+    return {_text(value[i]).lower(): _text(value[i + 1]) for i in range(0, len(value) - 1, 2)}
+
+def _decode_rfc2231(segments: list[tuple[int, bool, str]]) -> str:
+    """Собирает значение параметра из сегментов RFC 2231 (name*0*, name*1, ...)."""
+    charset = 'utf-8'
+    data = b''
+    for number, encoded, value in sorted(segments):
+        if encoded and number == 0 and value.count("'") >= 2:
+            charset, _, value = value.partition("'")
+            _, _, value = value.partition("'")
+            charset = charset or 'utf-8'
+        data += unquote_to_bytes(value) if encoded else value.encode('utf-8')
+    try:
+        return data.decode(charset)
+    except (LookupError, UnicodeDecodeError):
+        return data.decode('utf-8', 'replace')
+
+def _decode_filename(params: dict[str, str]) -> str | None:
+    """Декодирует имя файла с учетом RFC 2231 (filename*, продолжения) и RFC 2047."""
+    for name in ('filename', 'name'):
+        segments = []
+        for key, value in params.items():
+            match = re.fullmatch(rf'{name}\*(?:(\d+)(\*?))?', key)
+            if match:
+                number = int(match.group(1)) if match.group(1) else 0
+                encoded = match.group(1) is None or bool(match.group(2))
+                segments.append((number, encoded, value))
+        if segments:
+            return _decode_rfc2231(segments)
+        if params.get(name):
+            return str(make_header(decode_header(params[name])))
+    return None
+
+def _leaf_part(node: list[Any], part_id: str) -> MimePart:
+    maintype, subtype = _text(node[0]).lower(), _text(node[1]).lower()
+    content_params = _params(node[2])
+    encoding = _text(node[5]).lower() or '7bit'
+    size = int(node[6]) if isinstance(node[6], bytes) and node[6].isdigit() else 0
+
+    # Положение disposition зависит от типа части (RFC 3501, 7.4.2)
+    if maintype == 'text':
+        disposition_index = 9
+    elif maintype == 'message' and subtype == 'rfc822':
+        disposition_index = 11
+    else:
+        disposition_index = 8
+
+    disposition_params: dict[str, str] = {}
+    if len(node) > disposition_index and isinstance(node[disposition_index], list):
+        disposition_params = _params(node[disposition_index][1] if len(node[disposition_index]) > 1 else None)
+
+    filename = _decode_filename(disposition_params) or _decode_filename(content_params)
+    return MimePart(part_id, f"{maintype}/{subtype}", filename, encoding, size)
+
+def iter_leaf_parts(bodystructure: ImapValue, prefix: str = '') -> list[MimePart]:
+    """
+    Возвращает все листовые части письма с их номерами для BODY[<part>].
+
+    Вложенные письма (message/rfc822) не раскрываются.
+    """
+    if not isinstance(bodystructure, list) or not bodystructure:
+        raise BodyStructureError("BODYSTRUCTURE must be a list")
+
+    if isinstance(bodystructure[0], list):
+        parts: list[MimePart] = []
+        index = 0
+        for child in bodystructure:
+            if not isinstance(child, list):
+                break  # Подтип multipart и параметры расширения
+            index += 1
+            parts.extend(iter_leaf_parts(child, f"{prefix}{index}."))
+        return parts
+
+    return [_leaf_part(bodystructure, prefix.rstrip('.') or '1')]
+
+def find_xlsx_parts(bodystructure: ImapValue) -> list[MimePart]:
+    """Возвращает части письма, являющиеся .xlsx файлами (по имени или типу содержимого)."""
+    result = []
+    for part in iter_leaf_parts(bodystructure):
+        if part.filename and part.filename.endswith('.xlsx'):
+            result.append(part)
+        elif part.content_type == XLSX_CONTENT_TYPE:
+            result.append(part._replace(filename=f"{part.filename or 'attachment_' + part.part_id}.xlsx"))
+    return result
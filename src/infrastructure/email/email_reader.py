@@ -1,16 +1,64 @@
 # =====================================
 # 1. Импорт библиотек
 # =====================================
-from typing import AsyncGenerator
-from imap_tools import MailBox
+import asyncio
+import concurrent.futures
+import os
+import threading
+from datetime import datetime
+from email import policy
+from email.parser import BytesHeaderParser
+from typing import AsyncGenerator, Any, Iterator, List, NamedTuple, Optional
+from imap_tools import MailBox, MailMessageFlags, AND, OR, U
 
 from src.config import EmailConfig
-from src.domain.repositories import IProcessedFileRepository
+from src.domain.models import MailboxSyncState
+from src.domain.repositories import IProcessedFileRepository, IMailboxSyncStateRepository
 from src.domain.services import IEmailReaderService, RawEmail, EmailAttachment
+from src.infrastructure.email.bodystructure import (
+    BodyStructureError,
+    MimePart,
+    find_xlsx_parts,
+    iter_leaf_parts,
+    parse_fetch_response,
+)
 from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.storage.spool import AttachmentSpool, dated_storage_dir
 
 # =====================================
-# 2. Сервис чтения Email
+# 2. Служебные объекты очереди
+# =====================================
+
+# Маркер завершения работы потока чтения IMAP
+_FETCH_DONE = object()
+
+# Папка, из которой читаются письма
+_FOLDER = 'INBOX'
+
+# Первая фаза: только структура и нужные заголовки, без тела письма
+_PREFETCH_ITEMS = '(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (FROM DATE SUBJECT)])'
+_PREFETCH_BATCH = 100
+
+# Интервал (сек), с которым поток чтения проверяет флаг остановки
+_HANDOVER_POLL_INTERVAL = 0.5
+
+class _FetchError:
+    """Обертка для передачи исключения из потока чтения в event loop."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+class _ConsumerGone(Exception):
+    """Потребитель прекратил чтение, поток должен завершиться."""
+
+class _FetchSummary(NamedTuple):
+    """Итог работы потока чтения: счетчик писем и новый high-water mark папки."""
+    messages_found: int
+    uid_validity: Optional[int] = None
+    last_uid: Optional[int] = None
+
+# =====================================
+# 3. Сервис чтения Email
 # =====================================
 
 class EmailReaderService(IEmailReaderService):
@@ -19,15 +67,38 @@ class EmailReaderService(IEmailReaderService):
 
     Реализует проверку на дубликаты по message_id и фильтрацию
     по белому списку отправителей.
+
+    Блокирующие вызовы imap_tools (login, fetch, разбор MIME) выполняются
+    в отдельном потоке; готовые письма передаются в event loop через
+    ограниченную asyncio.Queue, поэтому чтение большого ящика не
+    останавливает health checks, /metrics и планировщик.
+
+    Сначала выполняется только поиск UID, затем все кандидаты проверяются
+    на дубликаты одним запросом к БД, и скачиваются лишь новые письма.
+    Для них сначала запрашиваются BODYSTRUCTURE и заголовки, а затем
+    через BODY.PEEK[<part>] только MIME-части с .xlsx; остальные вложения
+    (PDF, изображения) с сервера не передаются.
+
+    Вложения не держатся в памяти: части скачиваются кусками
+    (`BODY.PEEK[<part>]<offset.size>`), декодируются на лету и пишутся
+    в директорию хранения за дату письма. RawEmail содержит только пути.
+
+    При наличии репозитория состояния синхронизации ищет только письма
+    с UID больше сохраненного high-water mark (`UID last+1:*`). Полный
+    поиск непрочитанных выполняется лишь при первом запуске и смене UIDVALIDITY.
     """
 
     def __init__(
         self,
         config: EmailConfig,
         processed_file_repo: IProcessedFileRepository,
+        sync_state_repo: Optional[IMailboxSyncStateRepository] = None,
+        storage_path: str = "storage",
     ):
         self.config = config
         self.repo = processed_file_repo
+        self.sync_repo = sync_state_repo
+        self.storage_path = storage_path
         self.logger = get_logger(__name__)
         self.logger.info("EmailReaderService initialized")
 
@@ -40,50 +111,306 @@ class EmailReaderService(IEmailReaderService):
         """
         self.logger.info("Starting email fetch process")
 
+        sync_state = await self.sync_repo.get_by_folder(_FOLDER) if self.sync_repo else None
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.config.fetch_queue_size)
+        stop_event = threading.Event()
+        worker = loop.run_in_executor(None, self._fetch_worker, loop, queue, stop_event, sync_state)
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is _FETCH_DONE:
+                    break
+                if isinstance(item, _FetchError):
+                    raise item.error
+
+                email: RawEmail = item
+
+                if email.attachments:
+                    self.logger.info(f"Email {email.message_id} contains {len(email.attachments)} .xlsx attachments")
+                    yield email
+                else:
+                    self.logger.warning(f"No .xlsx attachments found in message {email.message_id}")
+
+            summary: _FetchSummary = await worker
+            self.logger.info(f"Email fetch completed. Processed {summary.messages_found} messages")
+
+            # High-water mark сдвигается только после полной обработки пакета
+            if self.sync_repo and summary.uid_validity is not None and summary.last_uid is not None:
+                await self.sync_repo.save(MailboxSyncState(
+                    folder=_FOLDER,
+                    uid_validity=summary.uid_validity,
+                    last_uid=summary.last_uid,
+                ))
+                self.logger.debug(f"Saved sync state for {_FOLDER}: last UID {summary.last_uid}")
+
+        except Exception as e:
+            self.logger.error(f"Failed to fetch emails: {e}", exc_info=True)
+            raise
+
+        finally:
+            # Если потребитель прервал итерацию, поток завершится сам
+            stop_event.set()
+
+    # =====================================
+    # 4. Работа в потоке чтения IMAP
+    # =====================================
+
+    def _fetch_worker(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue,
+        stop_event: threading.Event,
+        sync_state: Optional[MailboxSyncState],
+    ) -> _FetchSummary:
+        """
+        Выполняет блокирующее чтение почтового ящика в отдельном потоке.
+
+        Returns:
+            _FetchSummary: Количество просмотренных писем и новый high-water mark
+        """
+        messages_found = 0
         try:
             with MailBox(self.config.server).login(
-                self.config.username, self.config.password, initial_folder='INBOX'
+                self.config.username, self.config.password, initial_folder=_FOLDER
             ) as mailbox:
                 self.logger.debug(f"Connected to mail server: {self.config.server}")
 
-                # Передаем критерии напрямую в fetch
-                messages_found = 0
-                for msg in mailbox.fetch(criteria="ALL", seen=False, from_=self.config.allowed_senders, mark_seen=True):
-                    messages_found += 1
-                    self.logger.info(f"Processing email: UID={msg.uid}, From={msg.from_}, Subject={msg.subject}")
-
-                    message_id = msg.uid # Используем UID, т.к. он стабилен в рамках сессии
-
-                    # Проверка на дубликаты
-                    if await self.repo.find_by_message_id(message_id):
-                        self.logger.debug(f"Message {message_id} already processed, skipping")
-                        continue
-
-                    # Извлечение .xlsx вложений
-                    xlsx_attachments = []
-                    for att in msg.attachments:
-                        if att.filename.endswith('.xlsx'):
-                            xlsx_attachments.append(EmailAttachment(
-                                filename=att.filename,
-                                content=att.payload
-                            ))
-                            self.logger.debug(f"Found .xlsx attachment: {att.filename}")
-                        else:
-                            self.logger.debug(f"Skipping non-.xlsx attachment: {att.filename}")
-
-                    if xlsx_attachments:
-                        self.logger.info(f"Email {message_id} contains {len(xlsx_attachments)} .xlsx attachments")
-                        yield RawEmail(
-                            message_id=message_id,
-                            sender=msg.from_,
-                            date=msg.date,
-                            attachments=xlsx_attachments
+                uid_validity, last_uid = None, 0
+                if self.sync_repo:
+                    status = mailbox.folder.status(_FOLDER, ['UIDVALIDITY', 'UIDNEXT'])
+                    uid_validity = status['UIDVALIDITY']
+                    # UIDNEXT снимается до поиска: письма, пришедшие позже, попадут в следующий цикл
+                    new_last_uid = status['UIDNEXT'] - 1
+
+                    if sync_state and sync_state.uid_validity == uid_validity:
+                        last_uid = sync_state.last_uid
+                        self.logger.debug(f"Incremental sync of {_FOLDER} from UID {last_uid + 1}")
+                    elif sync_state:
+                        self.logger.warning(
+                            f"UIDVALIDITY of {_FOLDER} changed ({sync_state.uid_validity} -> {uid_validity}), "
+                            f"performing full resync"
                         )
                     else:
-                        self.logger.warning(f"No .xlsx attachments found in message {message_id}")
+                        self.logger.info(f"No sync state for {_FOLDER}, performing full resync")
+
+                criteria = self._build_criteria(last_uid)
+                self.logger.debug(f"IMAP search criteria: {criteria}")
+
+                uids = mailbox.uids(criteria)
+                if last_uid:
+                    # Диапазон `n:*` всегда включает последнее письмо, даже если его UID < n
+                    uids = [uid for uid in uids if int(uid) > last_uid]
+                messages_found = len(uids)
 
-                self.logger.info(f"Email fetch completed. Processed {messages_found} messages")
+                # Проверка на дубликаты: один запрос к БД на весь пакет
+                existing = self._call_in_loop(loop, stop_event, self.repo.find_existing_message_ids(uids))
+                new_uids = [uid for uid in uids if uid not in existing]
+                self.logger.info(f"Found {messages_found} candidate messages, {len(new_uids)} not processed yet")
+
+                for email in self._fetch_messages(mailbox, new_uids):
+                    if not self._hand_over(loop, queue, stop_event, email):
+                        self.logger.debug("Email fetch interrupted by consumer")
+                        return _FetchSummary(messages_found)
+
+                if uid_validity is not None and uids:
+                    new_last_uid = max(new_last_uid, max(int(uid) for uid in uids))
+
+        except _ConsumerGone:
+            self.logger.debug("Email fetch interrupted by consumer")
+            return _FetchSummary(messages_found)
 
         except Exception as e:
-            self.logger.error(f"Failed to fetch emails: {e}", exc_info=True)
-            raise
+            self._hand_over(loop, queue, stop_event, _FetchError(e))
+            return _FetchSummary(messages_found)
+
+        self._hand_over(loop, queue, stop_event, _FETCH_DONE)
+        if uid_validity is None:
+            return _FetchSummary(messages_found)
+        return _FetchSummary(messages_found, uid_validity, max(new_last_uid, last_uid))
+
+    def _build_criteria(self, last_uid: int) -> Any:
+        """
+        Формирует критерий поиска IMAP.
+
+        Args:
+            last_uid: High-water mark папки (0 - полный поиск непрочитанных писем)
+        """
+        conditions = []
+        if self.config.allowed_senders:
+            conditions.append(OR(from_=self.config.allowed_senders))
+
+        if last_uid:
+            return AND(*conditions, uid=U(str(last_uid + 1), '*'))
+        return AND(*conditions, seen=False)
+
+    def _fetch_messages(self, mailbox: MailBox, uids: List[str]) -> Iterator[RawEmail]:
+        """
+        Двухфазное получение писем: BODYSTRUCTURE + заголовки, затем только .xlsx части.
+
+        Письма, структуру которых не удалось разобрать, скачиваются целиком.
+        """
+        for start in range(0, len(uids), _PREFETCH_BATCH):
+            batch = uids[start:start + _PREFETCH_BATCH]
+            items = parse_fetch_response(self._uid_fetch(mailbox, ','.join(batch), _PREFETCH_ITEMS))
+
+            for uid in batch:
+                item = items.get(uid)
+                try:
+                    if item is None:
+                        raise BodyStructureError(f"No BODYSTRUCTURE returned for UID {uid}")
+                    parts = iter_leaf_parts(item.get('BODYSTRUCTURE'))
+                except BodyStructureError as e:
+                    self.logger.warning(f"Falling back to full download of UID {uid}: {e}")
+                    for msg in mailbox.fetch(uid_list=[uid], mark_seen=True):
+                        self.logger.info(f"Processing email: UID={msg.uid}, From={msg.from_}, Subject={msg.subject}")
+                        yield self._build_raw_email(msg)
+                    continue
+
+                sender, date, subject = self._parse_headers(item)
+                self.logger.info(f"Processing email: UID={uid}, From={sender}, Subject={subject}")
+
+                xlsx_parts = find_xlsx_parts(item['BODYSTRUCTURE'])
+                for part in parts:
+                    if part.filename and part.part_id not in {p.part_id for p in xlsx_parts}:
+                        self.logger.debug(f"Skipping non-.xlsx attachment: {part.filename} ({part.size} bytes not downloaded)")
+
+                attachments = self._download_parts(mailbox, uid, date, xlsx_parts)
+                mailbox.flag([uid], MailMessageFlags.SEEN, True)
+
+                yield RawEmail(message_id=uid, sender=sender, date=date, attachments=attachments)
+
+    def _uid_fetch(self, mailbox: MailBox, uid_set: str, items: str) -> list:
+        typ, data = mailbox.client.uid('FETCH', uid_set, items)
+        if typ != 'OK':
+            raise RuntimeError(f"IMAP FETCH {items} failed for UID {uid_set}: {data}")
+        return data
+
+    def _download_parts(
+        self, mailbox: MailBox, uid: str, date: datetime, parts: List[MimePart]
+    ) -> List[EmailAttachment]:
+        """
+        Потоково скачивает указанные MIME-части письма в директорию хранения.
+
+        Вложения до in_memory_attachment_limit остаются в памяти; для больших
+        в памяти одновременно находится не больше одного куска spool_chunk_size.
+        """
+        attachments = []
+        for part in parts:
+            chunk_size = self.config.spool_chunk_size
+            directory = dated_storage_dir(self.storage_path, date)
+            # Имя задано у всех частей из find_xlsx_parts; запасное - как у безымянных частей там
+            filename = os.path.basename(part.filename or f"attachment_{part.part_id}.xlsx")
+
+            with AttachmentSpool(
+                directory, filename, part.encoding,
+                unique_suffix=uid, memory_limit=self.config.in_memory_attachment_limit,
+            ) as spool:
+                offset = 0
+                while True:
+                    request = f'(BODY.PEEK[{part.part_id}]<{offset}.{chunk_size}>)'
+                    fields = parse_fetch_response(self._uid_fetch(mailbox, uid, request)).get(uid, {})
+                    key = f'BODY[{part.part_id}]<{offset}>'
+                    if key not in fields:
+                        raise RuntimeError(f"IMAP FETCH returned no {key} for UID {uid}")
+                    chunk = fields[key] or b''
+                    if not isinstance(chunk, bytes):
+                        raise RuntimeError(f"IMAP FETCH returned a list instead of {key} for UID {uid}")
+                    spool.write(chunk)
+                    offset += len(chunk)
+                    if len(chunk) < chunk_size:
+                        break
+                # Обрыв части не должен пометить письмо прочитанным и сдвинуть high-water mark
+                if offset != part.size:
+                    raise RuntimeError(
+                        f"Part {part.part_id} of UID {uid} is truncated: got {offset} of {part.size} bytes"
+                    )
+                attachment = spool.commit()
+
+            attachments.append(attachment)
+            where = "memory" if attachment.content is not None else attachment.path
+            self.logger.debug(f"Found .xlsx attachment: {part.filename}, spooled {attachment.size} bytes to {where}")
+        return attachments
+
+    def _parse_headers(self, item: dict) -> tuple:
+        """Извлекает отправителя, дату и тему из заголовков первой фазы."""
+        raw_headers = next(
+            (value for key, value in item.items() if key.startswith('BODY[HEADER.FIELDS') and isinstance(value, bytes)),
+            b'',
+        )
+        headers = BytesHeaderParser(policy=policy.default).parsebytes(raw_headers)
+
+        from_header = headers['from']
+        addresses = getattr(from_header, 'addresses', ()) if from_header else ()
+        sender = addresses[0].addr_spec if addresses else str(from_header or '')
+
+        date_header = headers['date']
+        date = getattr(date_header, 'datetime', None) or datetime(1900, 1, 1)
+
+        return sender, date, str(headers['subject'] or '')
+
+    def _build_raw_email(self, msg: Any) -> RawEmail:
+        """Извлекает .xlsx вложения письма (разбор MIME выполняется в потоке чтения)."""
+        message_id = msg.uid  # Используем UID, т.к. он стабилен в рамках сессии
+
+        xlsx_attachments = []
+        for att in msg.attachments:
+            if att.filename.endswith('.xlsx'):
+                directory = dated_storage_dir(self.storage_path, msg.date)
+                with AttachmentSpool(
+                    directory, os.path.basename(att.filename),
+                    unique_suffix=msg.uid, memory_limit=self.config.in_memory_attachment_limit,
+                ) as spool:
+                    spool.write(att.payload)
+                    xlsx_attachments.append(spool.commit())
+                self.logger.debug(f"Found .xlsx attachment: {att.filename}")
+            else:
+                self.logger.debug(f"Skipping non-.xlsx attachment: {att.filename}")
+
+        return RawEmail(
+            message_id=message_id,
+            sender=msg.from_,
+            date=msg.date,
+            attachments=xlsx_attachments
+        )
+
+    def _hand_over(
+        self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, stop_event: threading.Event, item: Any
+    ) -> bool:
+        """
+        Передает элемент в очередь event loop, соблюдая ее ограничение по размеру.
+
+        Returns:
+            bool: False, если потребитель прекратил чтение и элемент не доставлен
+        """
+        try:
+            self._call_in_loop(loop, stop_event, queue.put(item))
+            return True
+        except _ConsumerGone:
+            return False
+
+    def _call_in_loop(self, loop: asyncio.AbstractEventLoop, stop_event: threading.Event, coro: Any) -> Any:
+        """
+        Выполняет корутину в event loop и ждет результат из потока чтения.
+
+        Raises:
+            _ConsumerGone: Потребитель прекратил чтение или event loop закрыт
+        """
+        try:
+            future = asyncio.run_coroutine_threadsafe(coro, loop)
+        except RuntimeError as e:
+            # Event loop уже закрыт
+            coro.close()
+            raise _ConsumerGone() from e
+
+        while True:
+            try:
+                return future.result(timeout=_HANDOVER_POLL_INTERVAL)
+            except concurrent.futures.TimeoutError as e:
+                if stop_event.is_set():
+                    future.cancel()
+                    raise _ConsumerGone() from e
+            except concurrent.futures.CancelledError as e:
+                raise _ConsumerGone() from e
@@ -0,0 +1,134 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import threading
+import time
+from collections.abc import Callable
+
+from imap_tools import MailBox
+
+from src.config import EmailConfig
+from src.infrastructure.logging.logger import get_logger
+
+# =====================================
+# 2. Наблюдатель IMAP IDLE
+# =====================================
+
+class ImapIdleWatcher:
+    """
+    Push-режим получения почты через IMAP IDLE (RFC 2177).
+
+    Держит отдельное соединение с почтовым сервером в фоновом потоке и
+    вызывает `on_new_mail` в течение секунд после появления нового письма.
+    Само чтение писем по-прежнему выполняет EmailReaderService, а интервальная
+    задача планировщика остается страховочной проверкой.
+
+    При обрыве соединения переподключается с exponential backoff и после
+    восстановления инициирует внеочередную проверку ящика, чтобы не потерять
+    письма, пришедшие за время простоя.
+    """
+
+    # Ответы сервера, означающие появление новых писем
+    NEW_MAIL_MARKERS = (b"EXISTS", b"RECENT")
+
+    def __init__(self, config: EmailConfig, on_new_mail: Callable[[], None], poll_interval: float = 1.0):
+        self.config = config
+        self.on_new_mail = on_new_mail
+        self.poll_interval = poll_interval
+        self.logger = get_logger(__name__)
+
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Запускает фоновый поток наблюдения за ящиком."""
+        if self.is_running:
+            self.logger.warning("IMAP IDLE watcher is already running")
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="imap-idle-watcher", daemon=True)
+        self._thread.start()
+        self.logger.info(f"IMAP IDLE watcher started for {self.config.server}")
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Останавливает наблюдение.
+
+        Args:
+            timeout: Сколько ждать завершения потока (None - не ждать дольше одного цикла опроса)
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout if timeout is not None else self.poll_interval * 2)
+        self.logger.info("IMAP IDLE watcher stopped")
+
+    # =====================================
+    # 3. Работа в фоновом потоке
+    # =====================================
+
+    def _run(self) -> None:
+        delay = 1.0
+        reconnecting = False
+
+        while not self._stop_event.is_set():
+            try:
+                with MailBox(self.config.server).login(
+                    self.config.username, self.config.password, initial_folder='INBOX'
+                ) as mailbox:
+                    if "IDLE" not in mailbox.client.capabilities:
+                        self.logger.error(f"IMAP server {self.config.server} does not support IDLE, push mode disabled")
+                        return
+
+                    self.logger.debug(f"IMAP IDLE session established with {self.config.server}")
+                    delay = 1.0
+
+                    if reconnecting:
+                        # Письма могли прийти, пока соединение было разорвано
+                        self._notify("reconnect")
+                        reconnecting = False
+
+                    while not self._stop_event.is_set():
+                        responses = self._idle_cycle(mailbox)
+                        if self._has_new_mail(responses):
+                            self._notify("push")
+
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                self.logger.warning(f"IMAP IDLE connection lost: {e}. Reconnecting in {delay:.0f}s")
+                reconnecting = True
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.config.idle_reconnect_max_delay)
+
+    def _idle_cycle(self, mailbox: MailBox) -> list[bytes]:
+        """
+        Выполняет одну сессию IDLE длиной не более idle_timeout_seconds.
+
+        Опрос сокета идет короткими интервалами, чтобы stop() срабатывал быстро.
+        """
+        deadline = time.monotonic() + self.config.idle_timeout_seconds
+        responses: list[bytes] = []
+
+        mailbox.idle.start()
+        try:
+            while not responses and not self._stop_event.is_set() and time.monotonic() < deadline:
+                responses = mailbox.idle.poll(timeout=self.poll_interval)
+        finally:
+            mailbox.idle.stop()
+
+        return responses
+
+    def _has_new_mail(self, responses: list[bytes]) -> bool:
+        return any(marker in response for response in responses for marker in self.NEW_MAIL_MARKERS)
+
+    def _notify(self, reason: str) -> None:
+        self.logger.info(f"New mail signalled by IMAP IDLE ({reason})")
+        try:
+            self.on_new_mail()
+        except Exception as e:
+            self.logger.error(f"IMAP IDLE callback failed: {e}", exc_info=True)
@@ -2,7 +2,7 @@
 # 1. Импорт библиотек
 # =====================================
 from prometheus_client import Counter, Histogram, Gauge, Info, CollectorRegistry, generate_latest
-from typing import Dict, Any
+from typing import Any, Callable, Dict, TypeVar, cast
 import time
 
 from src.infrastructure.logging.logger import get_logger
@@ -51,6 +51,13 @@ class PrometheusMetrics:
             registry=self.registry
         )
 
+        self.sftp_pool_connections_total = Counter(
+            'sftp_pool_connections_total',
+            'SFTP pool session events',
+            ['event'],  # opened, reused, discarded, expired
+            registry=self.registry
+        )
+
         self.errors_by_type = Counter(
             'errors_by_type_total',
             'Total number of errors by type',
@@ -67,6 +74,30 @@ class PrometheusMetrics:
             registry=self.registry
         )
 
+        # Файловые операции стадии обработки файлов (StorageIO): ожидание пула и сама операция
+        self.storage_io_queue_wait_seconds = Histogram(
+            'storage_io_queue_wait_seconds',
+            'Time storage operations wait for a free storage I/O thread',
+            ['operation'],  # makedirs, reserve, move, write, fsync, cache_link, cache_evict
+            buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float('inf')],
+            registry=self.registry
+        )
+
+        self.storage_io_duration_seconds = Histogram(
+            'storage_io_duration_seconds',
+            'Time spent in storage operations (excluding queue wait)',
+            ['operation'],
+            buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float('inf')],
+            registry=self.registry
+        )
+
+        self.sftp_pool_wait_seconds = Histogram(
+            'sftp_pool_wait_seconds',
+            'Time to check out an SFTP session from the pool (including connecting)',
+            buckets=[0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf')],
+            registry=self.registry
+        )
+
         self.health_check_duration_seconds = Histogram(
             'health_check_duration_seconds',
             'Time spent on health checks',
@@ -94,6 +125,19 @@ class PrometheusMetrics:
             registry=self.registry
         )
 
+        self.sftp_pool_sessions = Gauge(
+            'sftp_pool_sessions',
+            'Open SFTP sessions in the pool',
+            ['state'],  # idle, in_use
+            registry=self.registry
+        )
+
+        self.storage_io_queue_depth = Gauge(
+            'storage_io_queue_depth',
+            'Number of storage operations waiting for a free storage I/O thread',
+            registry=self.registry
+        )
+
         # === Информационные метрики (Info) ===
         self.app_info = Info(
             'app_info',
@@ -133,6 +177,14 @@ class PrometheusMetrics:
         """Записывает метрику загрузки на SFTP."""
         self.sftp_uploads_total.labels(status=status, validation_result=validation_result).inc()
 
+    def record_sftp_pool_connection(self, event: str) -> None:
+        """Записывает событие сессии пула SFTP (открыта, переиспользована, закрыта)."""
+        self.sftp_pool_connections_total.labels(event=event).inc()
+
+    def record_sftp_pool_wait(self, duration_seconds: float) -> None:
+        """Записывает время получения сессии из пула SFTP."""
+        self.sftp_pool_wait_seconds.observe(duration_seconds)
+
     def record_error(self, error_type: str, component: str, severity: str = 'error') -> None:
         """Записывает метрику ошибки."""
         self.errors_by_type.labels(
@@ -145,6 +197,11 @@ class PrometheusMetrics:
         """Записывает время выполнения операции."""
         self.processing_duration_seconds.labels(operation_type=operation_type).observe(duration_seconds)
 
+    def record_storage_io(self, operation: str, queue_wait_seconds: float, duration_seconds: float) -> None:
+        """Записывает ожидание в очереди и время файловой операции хранилища."""
+        self.storage_io_queue_wait_seconds.labels(operation=operation).observe(queue_wait_seconds)
+        self.storage_io_duration_seconds.labels(operation=operation).observe(duration_seconds)
+
     def record_health_check_duration(self, dependency: str, duration_seconds: float) -> None:
         """Записывает время выполнения health check."""
         self.health_check_duration_seconds.labels(dependency=dependency).observe(duration_seconds)
@@ -159,6 +216,15 @@ class PrometheusMetrics:
         """Устанавливает размер очереди."""
         self.queue_size.set(size)
 
+    def set_sftp_pool_sessions(self, idle: int, in_use: int) -> None:
+        """Устанавливает число простаивающих и занятых сессий пула SFTP."""
+        self.sftp_pool_sessions.labels(state="idle").set(idle)
+        self.sftp_pool_sessions.labels(state="in_use").set(in_use)
+
+    def set_storage_io_queue_depth(self, depth: int) -> None:
+        """Устанавливает число файловых операций в очереди пула хранилища."""
+        self.storage_io_queue_depth.set(depth)
+
     def update_last_successful_processing(self) -> None:
         """Обновляет время последней успешной обработки."""
         self.last_successful_processing_timestamp.set(time.time())
@@ -199,10 +265,12 @@ metrics = PrometheusMetrics()
 # 4. Декораторы для автоматического измерения
 # =====================================
 
-def time_operation(operation_type: str):
+F = TypeVar("F", bound=Callable[..., Any])
+
+def time_operation(operation_type: str) -> Callable[[F], F]:
     """Декоратор для автоматического измерения времени выполнения операций."""
-    def decorator(func):
-        async def async_wrapper(*args, **kwargs):
+    def decorator(func: F) -> F:
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
             start_time = time.time()
             try:
                 result = await func(*args, **kwargs)
@@ -214,7 +282,7 @@ def time_operation(operation_type: str):
                 metrics.record_processing_duration(f"{operation_type}_failed", duration)
                 raise
 
-        def sync_wrapper(*args, **kwargs):
+        def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
             start_time = time.time()
             try:
                 result = func(*args, **kwargs)
@@ -228,8 +296,8 @@ def time_operation(operation_type: str):
 
         # Определяем, является ли функция асинхронной
         if hasattr(func, '__code__') and func.__code__.co_flags & 0x80:  # CO_COROUTINE
-            return async_wrapper
+            return cast(F, async_wrapper)
         else:
-            return sync_wrapper
+            return cast(F, sync_wrapper)
 
     return decorator
@@ -0,0 +1,42 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import threading
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+# =====================================
+# 2. Объекты, общие для всего процесса
+# =====================================
+
+class ProcessShared(Generic[T]):
+    """
+    Лениво создаваемые объекты, общие для всего процесса.
+
+    DI контейнер создается заново на каждый цикл планировщика (и отдельно
+    для API), поэтому его Singleton живет только один цикл. Пулы и состояние,
+    которые должны пережить цикл и быть общими для API и обработчика,
+    хранятся здесь: `get` создает объект при первом обращении по ключу,
+    `release` забирает все созданные (для закрытия при завершении приложения).
+    """
+
+    def __init__(self) -> None:
+        self._items: dict[Hashable | None, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self, factory: Callable[[], T], key: Hashable | None = None) -> T:
+        """Возвращает объект для `key`, при первом обращении создает его вызовом `factory`."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                item = self._items[key] = factory()
+            return item
+
+    def release(self) -> list[T]:
+        """Забирает все созданные объекты; следующий `get` создаст новые."""
+        with self._lock:
+            items = list(self._items.values())
+            self._items.clear()
+        return items
@@ -0,0 +1,215 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import asyncssh
+
+from src.config import SftpConfig
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.monitoring.metrics import metrics
+from src.infrastructure.patterns.process_shared import ProcessShared
+
+# =====================================
+# 2. SFTP сессия пула
+# =====================================
+
+class _SessionClient(asyncssh.SSHClient):
+    """Отмечает сессию потерянной, как только SSH соединение закрылось (в том числе по keepalive)."""
+
+    def __init__(self) -> None:
+        self.lost = False
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self.lost = True
+
+class SftpSession:
+    """SSH соединение (`conn`, для удаленных команд) с запущенным SFTP клиентом (`sftp`)."""
+
+    def __init__(self, conn: Any, sftp: Any, client: _SessionClient):
+        self.conn = conn
+        self.sftp = sftp
+        self.client = client
+        self.released_at = time.monotonic()
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.released_at
+
+    async def close(self) -> None:
+        try:
+            self.sftp.exit()
+            self.conn.close()
+            await self.conn.wait_closed()
+        except Exception:
+            # Соединение уже разорвано: закрывать нечего
+            pass
+
+# =====================================
+# 3. Пул сессий
+# =====================================
+
+class SftpSessionPool:
+    """
+    Пул постоянных SFTP сессий к одному серверу.
+
+    Установка SSH соединения (рукопожатие и обмен ключами) дольше загрузки
+    CSV в пару мегабайт, поэтому сессии не закрываются после загрузки,
+    а возвращаются в пул и используются следующими загрузками и health check.
+    Сессия - это SSH соединение и SFTP клиент на нем (`SftpSession`).
+
+    - Одновременно открыто не больше `pool_size` сессий; ожидание свободной
+      ограничено `pool_checkout_timeout` (TimeoutError).
+    - SSH keepalive (`keepalive_interval`) обнаруживает разорванные соединения,
+      сессия, простоявшая дольше интервала, перед выдачей проверяется запросом
+      к серверу. Разорванная сессия закрывается и заменяется новой.
+    - Сессия, простоявшая дольше `pool_max_idle`, закрывается.
+    - Если внутри `session()` возникла ошибка, сессия не возвращается в пул:
+      повторная попытка получит новое соединение.
+
+    Сессии привязаны к event loop: если пул используется из другого loop,
+    сессии прежнего отбрасываются.
+    """
+
+    def __init__(self, config: SftpConfig):
+        self.config = config
+        self.connection_options = {
+            "host": config.host,
+            "port": config.port,
+            "username": config.username,
+            "client_keys": [config.key_path],
+            "connect_timeout": config.connect_timeout,
+            "keepalive_interval": config.keepalive_interval,
+        }
+        self.logger = get_logger(__name__)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._idle: deque[SftpSession] = deque()
+        self._slots = asyncio.Semaphore(config.pool_size)
+        self._in_use = 0
+        self._reaper: asyncio.Task | None = None
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[SftpSession]:
+        """Выдает сессию из пула (или открывает новую) и возвращает ее в пул после использования."""
+        self._bind_loop()
+        started = time.perf_counter()
+        await asyncio.wait_for(self._slots.acquire(), self.config.pool_checkout_timeout)
+        try:
+            session = await self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        metrics.record_sftp_pool_wait(time.perf_counter() - started)
+
+        self._in_use += 1
+        self._update_metrics()
+        healthy = False
+        try:
+            yield session
+            healthy = True
+        finally:
+            self._in_use -= 1
+            if healthy and not session.client.lost:
+                session.released_at = time.monotonic()
+                self._idle.append(session)
+                self._schedule_reaper()
+            else:
+                metrics.record_sftp_pool_connection("discarded")
+                await session.close()
+            self._update_metrics()
+            self._slots.release()
+
+    async def close(self) -> None:
+        """Закрывает все простаивающие сессии (при завершении приложения)."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        while self._idle:
+            await self._idle.popleft().close()
+        self._update_metrics()
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None:
+            # Соединения прежнего loop в текущем использовать нельзя
+            self.logger.debug(f"SFTP pool for {self.config.host} moved to a new event loop, dropping idle sessions")
+        self._loop = loop
+        self._idle.clear()
+        self._slots = asyncio.Semaphore(self.config.pool_size)
+        self._in_use = 0
+        self._reaper = None
+
+    async def _checkout(self) -> SftpSession:
+        # Последняя возвращенная сессия - самая "теплая"; старые дольше простаивают и закрываются
+        while self._idle:
+            session = self._idle.pop()
+            if await self._is_alive(session):
+                metrics.record_sftp_pool_connection("reused")
+                return session
+            metrics.record_sftp_pool_connection("discarded")
+            await session.close()
+        return await self._connect()
+
+    async def _is_alive(self, session: SftpSession) -> bool:
+        if session.client.lost or session.idle_for() > self.config.pool_max_idle:
+            return False
+        if session.idle_for() < self.config.keepalive_interval:
+            return True
+        try:
+            await session.sftp.realpath(".")
+            return True
+        except (asyncssh.Error, OSError) as e:
+            self.logger.debug(f"Idle SFTP session to {self.config.host} is broken: {e}")
+            return False
+
+    async def _connect(self) -> SftpSession:
+        self.logger.debug(f"Opening SFTP session to {self.config.host}")
+        client = _SessionClient()
+        conn = await asyncssh.connect(**self.connection_options, client_factory=lambda: client)
+        try:
+            sftp = await conn.start_sftp_client()
+        except BaseException:
+            conn.close()
+            raise
+        metrics.record_sftp_pool_connection("opened")
+        return SftpSession(conn, sftp, client)
+
+    def _schedule_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_idle())
+
+    async def _reap_idle(self) -> None:
+        """Закрывает сессии, простоявшие дольше pool_max_idle, пока в пуле есть простаивающие."""
+        while self._idle:
+            oldest = self._idle[0]
+            await asyncio.sleep(max(self.config.pool_max_idle - oldest.idle_for(), 0) + 0.1)
+            while self._idle and self._idle[0].idle_for() > self.config.pool_max_idle:
+                session = self._idle.popleft()
+                metrics.record_sftp_pool_connection("expired")
+                await session.close()
+            self._update_metrics()
+
+    def _update_metrics(self) -> None:
+        metrics.set_sftp_pool_sessions(idle=len(self._idle), in_use=self._in_use)
+
+# =====================================
+# 4. Общие пулы приложения
+# =====================================
+
+_pools: ProcessShared[SftpSessionPool] = ProcessShared()
+
+def get_sftp_pool(config: SftpConfig) -> SftpSessionPool:
+    """Возвращает (и при первом вызове создает) пул сессий к серверу из `config`."""
+    key = (config.host, config.port, config.username, config.key_path)
+    return _pools.get(lambda: SftpSessionPool(config), key)
+
+async def close_sftp_pools() -> None:
+    """Закрывает сессии всех пулов (при завершении приложения)."""
+    for pool in _pools.release():
+        await pool.close()
@@ -6,13 +6,169 @@ import asyncssh  # type: ignore
 import hashlib
 import tempfile
 import os
+import posixpath
+import zlib
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
 
 from src.config import SftpConfig
-from src.domain.services import ISftpUploadService
+from src.domain.services import ISftpUploadService, StreamUpload, UploadRequest
 from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.sftp.sftp_pool import SftpSession, SftpSessionPool, get_sftp_pool
+from src.infrastructure.sftp.sftp_verify import (
+    AUTO_ORDER,
+    VerificationFailed,
+    VerificationUnavailable,
+    remote_sha256,
+    remote_stat_matches,
+)
+from src.infrastructure.storage.spool import HashingWriter
+
+# Расширение удаленного файла для каждого режима сжатия
+COMPRESSION_EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+_COMPRESSION_CHUNK_SIZE = 1024 * 1024
+
+# Файл загружается под скрытым временным именем (.<имя>.part) и переименовывается после проверки
+TEMP_PREFIX, TEMP_SUFFIX = ".", ".part"
+
+def temporary_remote_path(remote_path: str) -> str:
+    """Скрытое временное имя на SFTP, под которым файл загружается до проверки."""
+    directory, name = posixpath.split(remote_path)
+    return posixpath.join(directory, f"{TEMP_PREFIX}{name}{TEMP_SUFFIX}")
+
+# =====================================
+# 2. Сжатие перед загрузкой
+# =====================================
+
+class CompressedFile(NamedTuple):
+    path: str
+    sha256: str         # Хеш сжатого файла (его и проверяем на SFTP)
+    source_sha256: str  # Хеш исходного файла, посчитанный при чтении
+    size: int
+
+def _compressor(mode: str, level: Optional[int]) -> Any:
+    if mode == "gzip":
+        # wbits=31: формат gzip без имени файла и с нулевым mtime, результат детерминирован
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+    if mode == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+    raise ValueError(f"Unknown compression mode: {mode}")
+
+def compress_file(source_path: str, target_path: str, mode: str, level: Optional[int] = None) -> CompressedFile:
+    """
+    Потоково сжимает файл кусками; хеши исходного и сжатого файла считаются за тот же проход.
+
+    Returns:
+        CompressedFile: Путь, размер и SHA256 сжатого файла, SHA256 исходного
+    """
+    compressor = _compressor(mode, level)
+    source_hash = hashlib.sha256()
+
+    with open(source_path, "rb") as source, HashingWriter(open(target_path, "wb")) as target:
+        for chunk in iter(lambda: source.read(_COMPRESSION_CHUNK_SIZE), b""):
+            source_hash.update(chunk)
+            target.write(compressor.compress(chunk))
+        target.write(compressor.flush())
+
+    return CompressedFile(path=target_path, sha256=target.sha256, source_sha256=source_hash.hexdigest(), size=target.size)
+
+def _remove_local(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+# =====================================
+# 3. Потоковая загрузка
+# =====================================
+
+# Данные потока отправляются блоками этого размера (asyncssh делит блок на параллельные запросы записи)
+_STREAM_BLOCK_SIZE = 1024 * 1024
+# Блоков в полете: источник опережает сеть не больше чем на столько блоков
+_STREAM_BLOCKS_IN_FLIGHT = 4
+
+class _ChunkSource:
+    """
+    Читает куски исходного потока: считает их SHA256 и размер и пишет локальную копию.
+
+    Запоминает, дочитан ли поток до конца и не было ли ошибки в самом
+    источнике, чтобы отличать ее от сбоя передачи.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], local_file: Optional[Any] = None):
+        self._chunks = chunks.__aiter__()
+        self.local_file = local_file
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+        self.exhausted = False
+        self.error: Optional[BaseException] = None
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    def __aiter__(self) -> "_ChunkSource":
+        return self
+
+    async def __anext__(self) -> bytes:
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self.exhausted = True
+            raise
+        except BaseException as e:
+            self.error = e
+            raise
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+        if self.local_file is not None:
+            await asyncio.to_thread(self.local_file.write, chunk)
+        return chunk
+
+class _PipelinedWriter:
+    """Пишет поток в открытый файл SFTP блоками, не дожидаясь подтверждения предыдущих блоков."""
+
+    def __init__(self, remote_file: Any):
+        self.remote_file = remote_file
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+        self._buffer = bytearray()
+        self._writes: Deque[asyncio.Future] = deque()
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        if len(self._buffer) >= _STREAM_BLOCK_SIZE:
+            await self._send()
+
+    async def flush(self) -> None:
+        """Отправляет остаток буфера и дожидается подтверждения всех записей."""
+        if self._buffer:
+            await self._send()
+        while self._writes:
+            await self._writes.popleft()
+
+    def cancel(self) -> None:
+        while self._writes:
+            self._writes.popleft().cancel()
+
+    async def _send(self) -> None:
+        block, self._buffer = bytes(self._buffer), bytearray()
+        self._sha256.update(block)
+        offset, self.size = self.size, self.size + len(block)
+        # Запись с явным смещением: блоки в полете не зависят от позиции файла
+        self._writes.append(asyncio.ensure_future(self.remote_file.write(block, offset)))
+        if len(self._writes) > _STREAM_BLOCKS_IN_FLIGHT:
+            await self._writes.popleft()
 
 # =====================================
-# 2. Реализация сервиса SFTP
+# 4. Реализация сервиса SFTP
 # =====================================
 
 class SftpUploadService(ISftpUploadService):
@@ -21,17 +177,59 @@ class SftpUploadService(ISftpUploadService):
 
     Реализует аутентификацию по ключу и механизм exponential backoff
     для обработки временных сбоев сети.
+
+    В режиме сжатия (`compression`: gzip или zstd) файл один раз сжимается
+    во временный файл рядом с исходным, на SFTP загружается он с расширением
+    .gz/.zst, а проверка хеша выполняется по сжатому файлу.
+
+    SFTP сессии берутся из пула `pool` (по умолчанию - общий пул приложения
+    для этого сервера), поэтому SSH соединение не устанавливается заново
+    для каждого файла и каждого цикла обработки.
+
+    Загруженный файл проверяется способом из `verification`:
+    - sha256sum: хеш считается командой на сервере, файл не скачивается;
+    - download: файл скачивается обратно и хешируется локально;
+    - stat: только размер и mtime (дешево, без проверки содержимого).
+    В режиме auto используется первый поддерживаемый сервером способ из
+    sha256sum и download (оба сверяют SHA256 содержимого); выбранный способ
+    запоминается, неподдерживаемые больше не пробуются.
+
+    Файл загружается под скрытым временным именем (`temporary_remote_path`)
+    и только после проверки переименовывается в `remote_path` (posix_rename,
+    атомарная замена), так что читатель каталога никогда не видит
+    недописанный или поврежденный файл. Временные файлы, оставшиеся
+    от прерванных загрузок, удаляет `cleanup_stale_uploads` при запуске.
+
+    `upload_stream` загружает данные из асинхронного итератора по мере их
+    появления (запись идет с конвейером блоков, хеш считается по ходу),
+    так что передача перекрывается с получением данных, а локальный файл
+    не обязателен.
     """
 
-    def __init__(self, config: SftpConfig):
+    def __init__(self, config: SftpConfig, pool: Optional[SftpSessionPool] = None):
         self.config = config
-        self.connection_options = {
-            "host": self.config.host,
-            "username": self.config.username,
-            "client_keys": [self.config.key_path]
-        }
+        self.pool = pool or get_sftp_pool(config)
+        self.verification = self.config.verification
+        self._unsupported_verifications: Set[str] = set()
+        # Конвейер запросов записи SFTP: размер блока и число блоков в полете (0 - по лимитам сервера)
+        self._write_options: Dict[str, Any] = {}
+        if self.config.block_size > 0:
+            self._write_options["block_size"] = self.config.block_size
+        if self.config.max_requests > 0:
+            self._write_options["max_requests"] = self.config.max_requests
+        self._put_options = dict(self._write_options)
+        if self.verification == "stat":
+            self._put_options["preserve"] = True
+        self.compression = self.config.compression
         self.logger = get_logger(__name__)
-        self.logger.info(f"SftpUploadService initialized for host: {self.config.host}")
+        if self.compression == "zstd":
+            # Отсутствие zstandard должно обнаружиться при запуске, а не при первой загрузке
+            import zstandard  # noqa: F401
+        self.logger.info(f"SftpUploadService initialized for host: {self.config.host} (compression: {self.compression})")
+
+    def remote_path_for(self, remote_path: str) -> str:
+        """Путь, под которым файл окажется на SFTP (с расширением сжатия)."""
+        return remote_path + COMPRESSION_EXTENSIONS[self.compression]
 
     async def upload_file(self, local_path: str, remote_path: str) -> bool:
         """
@@ -51,23 +249,15 @@ class SftpUploadService(ISftpUploadService):
 
         for attempt in range(max_retries):
             try:
-                self.logger.debug(f"Attempt {attempt + 1}/{max_retries}: Connecting to SFTP server {self.config.host}")
-
-                conn = await asyncssh.connect(**self.connection_options)
-                try:
-                    sftp = await conn.start_sftp_client()
-                    try:
-                        self.logger.debug(f"SFTP client started, uploading file...")
-                        await sftp.put(local_path, remote_path)
-                        self.logger.info(f"File successfully uploaded to {remote_path}")
-                        return True
-                    finally:
-                        sftp.exit()
-                        self.logger.debug("SFTP client closed")
-                finally:
-                    conn.close()
-                    await conn.wait_closed()
-                    self.logger.debug("SSH connection closed")
+                self.logger.debug(f"Attempt {attempt + 1}/{max_retries}: Getting SFTP session to {self.config.host}")
+
+                async with self.pool.session() as session:
+                    self.logger.debug("SFTP session ready, uploading file...")
+                    temp_path = temporary_remote_path(remote_path)
+                    await session.sftp.put(local_path, temp_path)
+                    await self._publish(session.sftp, temp_path, remote_path)
+                    self.logger.info(f"File successfully uploaded to {remote_path}")
+                    return True
 
             except (asyncssh.Error, OSError) as e:
                 self.logger.warning(f"SFTP attempt {attempt + 1}/{max_retries} failed: {e}")
@@ -85,6 +275,9 @@ class SftpUploadService(ISftpUploadService):
         """
         Загружает файл на SFTP с последующей проверкой целостности по хеш-сумме.
 
+        В режиме сжатия `expected_hash` сверяется с исходным файлом при сжатии,
+        а на SFTP проверяется хеш сжатого файла (`remote_path_for(remote_path)`).
+
         Args:
             local_path: Путь к локальному файлу
             remote_path: Путь назначения на SFTP сервере
@@ -93,50 +286,70 @@ class SftpUploadService(ISftpUploadService):
         Returns:
             bool: True если загрузка и валидация успешны, False в противном случае
         """
+        results = await self.upload_files_with_validation([UploadRequest(local_path, remote_path, expected_hash)])
+        return results[0]
+
+    async def upload_files_with_validation(self, files: List[UploadRequest]) -> List[bool]:
+        """
+        Загружает несколько файлов с проверкой хеша по одной SFTP сессии.
+
+        Одновременно передается не больше `upload_concurrency` файлов: их запросы
+        идут по одному SSH каналу, и ожидание ответов сервера перекрывается.
+        Каждый файл проверяется и публикуется независимо; не прошедшие проверку
+        или прерванные сбоем соединения повторяются (до 3 попыток).
+
+        Args:
+            files: Файлы для загрузки (в режиме сжатия - исходные, несжатые)
+
+        Returns:
+            List[bool]: Результат для каждого файла (в порядке `files`)
+        """
+        if self.compression == "none":
+            return await self._put_with_validation(list(files))
+
+        outcomes = await asyncio.gather(*(self._compress(file) for file in files), return_exceptions=True)
+        requests = [outcome for outcome in outcomes if isinstance(outcome, UploadRequest)]
+        try:
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+            uploaded = iter(await self._put_with_validation(requests))
+            return [outcome is not None and next(uploaded) for outcome in outcomes]
+        finally:
+            for request in requests:
+                _remove_local(request.local_path)
+
+    async def _put_with_validation(self, files: List[UploadRequest]) -> List[bool]:
+        """Загрузка файлов как есть с проверкой хеша и повторными попытками."""
         max_retries = 3
         delay = 1
+        results = [False] * len(files)
+        pending = list(range(len(files)))
 
-        self.logger.info(f"Starting SFTP upload with validation: {local_path} -> {remote_path}")
-        self.logger.debug(f"Expected SHA256 hash: {expected_hash[:16]}...")
+        for file in files:
+            self.logger.info(f"Starting SFTP upload with validation: {file.local_path} -> {file.remote_path}")
+            self.logger.debug(f"Expected SHA256 hash: {file.expected_hash[:16]}...")
 
         for attempt in range(max_retries):
+            if not pending:
+                break
             try:
-                self.logger.debug(f"Attempt {attempt + 1}/{max_retries}: Connecting to SFTP server {self.config.host}")
+                self.logger.debug(f"Attempt {attempt + 1}/{max_retries}: Getting SFTP session to {self.config.host}")
 
-                conn = await asyncssh.connect(**self.connection_options)
-                try:
-                    sftp = await conn.start_sftp_client()
-                    try:
-                        # 1. Загружаем файл на SFTP
-                        self.logger.debug(f"SFTP client started, uploading file...")
-                        await sftp.put(local_path, remote_path)
-                        self.logger.debug(f"File uploaded to {remote_path}, starting validation...")
-
-                        # 2. Проверяем целостность файла
-                        is_valid = await self._validate_remote_file_hash(sftp, remote_path, expected_hash)
-
-                        if is_valid:
-                            self.logger.info(f"File {remote_path} successfully uploaded and validated")
-                            return True
-                        else:
-                            self.logger.error(f"Hash validation failed for {remote_path}. File may be corrupted.")
-                            # Удаляем поврежденный файл
-                            try:
-                                await sftp.remove(remote_path)
-                                self.logger.debug(f"Removed corrupted file {remote_path}")
-                            except Exception as remove_error:
-                                self.logger.warning(f"Failed to remove corrupted file {remote_path}: {remove_error}")
-
-                            # Продолжаем попытки
-                            continue
+                async with self.pool.session() as session:
+                    slots = asyncio.Semaphore(self.config.upload_concurrency)
 
-                    finally:
-                        sftp.exit()
-                        self.logger.debug("SFTP client closed")
-                finally:
-                    conn.close()
-                    await conn.wait_closed()
-                    self.logger.debug("SSH connection closed")
+                    async def upload(session: SftpSession, slots: asyncio.Semaphore, index: int) -> None:
+                        async with slots:
+                            results[index] = await self._upload_validated(session, files[index])
+
+                    outcomes = await asyncio.gather(
+                        *(upload(session, slots, index) for index in pending), return_exceptions=True,
+                    )
+                    # Сбой соединения в любой загрузке: сессия не возвращается в пул, незавершенные повторяются
+                    for outcome in outcomes:
+                        if isinstance(outcome, BaseException):
+                            raise outcome
 
             except (asyncssh.Error, OSError) as e:
                 self.logger.warning(f"SFTP upload attempt {attempt + 1}/{max_retries} failed: {e}")
@@ -145,14 +358,251 @@ class SftpUploadService(ISftpUploadService):
                     self.logger.info(f"Retrying in {delay} seconds...")
                     await asyncio.sleep(delay)
                     delay *= 2  # Exponential backoff
-                else:
-                    self.logger.error(f"All {max_retries} SFTP upload attempts failed for {local_path}")
 
+            # Не прошедшие проверку повторяются сразу (сессия исправна и возвращается в пул)
+            pending = [index for index in pending if not results[index]]
+
+        for index in pending:
+            self.logger.error(f"All {max_retries} SFTP upload attempts failed for {files[index].local_path}")
+        return results
+
+    async def _upload_validated(self, session: SftpSession, file: UploadRequest) -> bool:
+        """Одна попытка: загрузка под временным именем, проверка и переименование."""
+        local_path, remote_path, expected_hash = file
+        sftp = session.sftp
+        temp_path = temporary_remote_path(remote_path)
+
+        # 1. Загружаем файл на SFTP под временным именем (для проверки по stat - с mtime исходного файла)
+        self.logger.debug(f"Uploading {local_path} to {temp_path}...")
+        await sftp.put(local_path, temp_path, **self._put_options)
+        self.logger.debug(f"File uploaded to {temp_path}, starting validation...")
+
+        # 2. Проверяем целостность файла и только затем открываем его под настоящим именем
+        is_valid = await self._verify_upload(session, local_path, temp_path, expected_hash)
+
+        if is_valid:
+            await self._publish(sftp, temp_path, remote_path)
+            self.logger.info(f"File {remote_path} successfully uploaded and validated")
+            return True
+
+        self.logger.error(f"Hash validation failed for {remote_path}. File may be corrupted.")
+        # Удаляем поврежденный файл (под настоящим именем он не появлялся)
+        await self._remove_temporary(sftp, temp_path)
+        return False
+
+    async def upload_stream(
+        self, chunks: AsyncIterator[bytes], remote_path: str, local_copy: Optional[str] = None
+    ) -> Optional[StreamUpload]:
+        """
+        Загружает данные на SFTP по мере их получения из `chunks`.
+
+        Данные пишутся в открытый файл на SFTP (под временным именем) блоками,
+        не дожидаясь подтверждения предыдущих; SHA256 исходных и переданных
+        (в режиме сжатия - сжатых) данных считается по ходу. Затем файл
+        проверяется и переименовывается, как при обычной загрузке.
+
+        Поток читается один раз, поэтому без `local_copy` сбой передачи не
+        повторяется. С `local_copy` данные одновременно сохраняются в этот файл,
+        и при сбое остаток потока дописывается в него, а файл загружается
+        обычным способом с повторными попытками.
+
+        Ошибка самого источника (`chunks`) пробрасывается вызывающему;
+        временный файл на SFTP и неполная локальная копия удаляются.
+
+        Args:
+            chunks: Асинхронный итератор кусков данных
+            remote_path: Путь назначения на SFTP сервере (без расширения сжатия)
+            local_copy: Путь для локальной копии данных (необязательно)
+
+        Returns:
+            Optional[StreamUpload]: Путь на SFTP, SHA256 и размер исходных данных или None при неудаче
+        """
+        target_path = self.remote_path_for(remote_path)
+        local_file = await asyncio.to_thread(open, local_copy, "wb") if local_copy else None
+        source = _ChunkSource(chunks, local_file)
+        self.logger.info(f"Starting SFTP stream upload -> {target_path}")
+
+        try:
+            try:
+                uploaded = await self._stream_to_remote(source, target_path)
+            except (asyncssh.Error, OSError) as e:
+                if source.error is not None:
+                    raise
+                self.logger.warning(f"SFTP stream upload to {target_path} failed: {e}")
+                uploaded = False
+
+            if source.error is not None:
+                raise source.error
+            if uploaded:
+                self.logger.info(f"Stream {target_path} successfully uploaded and validated ({source.size} bytes)")
+                return StreamUpload(target_path, source.sha256, source.size)
+            if local_file is None or local_copy is None:
+                self.logger.error(f"SFTP stream upload to {target_path} failed, no local copy to retry from")
+                return None
+
+            # Повтор из локальной копии: дописываем остаток потока и загружаем файл целиком
+            async for _ in source:
+                pass
+        except BaseException:
+            if local_file is not None and local_copy is not None:
+                await asyncio.to_thread(local_file.close)
+                _remove_local(local_copy)
+            raise
+
+        await asyncio.to_thread(local_file.close)
+        self.logger.info(f"Retrying {target_path} from local copy {local_copy}")
+        if await self.upload_file_with_validation(local_copy, remote_path, source.sha256):
+            return StreamUpload(target_path, source.sha256, source.size)
+        return None
+
+    async def _stream_to_remote(self, source: _ChunkSource, target_path: str) -> bool:
+        """Одна попытка потоковой загрузки: запись под временным именем, проверка и переименование."""
+        temp_path = temporary_remote_path(target_path)
+        compressor = None if self.compression == "none" else _compressor(self.compression, self.config.compression_level)
+
+        async with self.pool.session() as session:
+            sftp = session.sftp
+            try:
+                async with sftp.open(temp_path, "wb", **self._write_options) as remote_file:
+                    writer = _PipelinedWriter(remote_file)
+                    try:
+                        async for chunk in source:
+                            await writer.write(compressor.compress(chunk) if compressor else chunk)
+                        if compressor is not None:
+                            await writer.write(compressor.flush())
+                        await writer.flush()
+                    finally:
+                        writer.cancel()
+            except Exception:
+                if source.error is None:
+                    raise
+                # Ошибка источника: сессия исправна, временный файл не нужен
+                await self._remove_temporary(sftp, temp_path)
+                return False
+
+            if self.verification == "stat":
+                # Для потока сравнивать mtime не с чем: проверяется размер
+                is_valid = (await sftp.stat(temp_path)).size == writer.size
+            else:
+                is_valid = await self._verify_upload(session, None, temp_path, writer.sha256)
+
+            if is_valid:
+                await self._publish(sftp, temp_path, target_path)
+                return True
+
+            self.logger.error(f"Validation failed for stream upload {target_path}")
+            await self._remove_temporary(sftp, temp_path)
+            return False
+
+    async def _remove_temporary(self, sftp: Any, temp_path: str) -> None:
+        try:
+            await sftp.remove(temp_path)
+            self.logger.debug(f"Removed temporary file {temp_path}")
+        except Exception as remove_error:
+            self.logger.warning(f"Failed to remove temporary file {temp_path}: {remove_error}")
+
+    async def cleanup_stale_uploads(self) -> int:
+        """
+        Удаляет из `remote_path` временные файлы прерванных загрузок (вызывается при запуске).
+
+        Returns:
+            int: Число удаленных файлов
+        """
+        removed = 0
+        async with self.pool.session() as session:
+            for name in await session.sftp.listdir(self.config.remote_path):
+                if not (name.startswith(TEMP_PREFIX) and name.endswith(TEMP_SUFFIX)):
+                    continue
+                path = posixpath.join(self.config.remote_path, name)
+                try:
+                    await session.sftp.remove(path)
+                    removed += 1
+                except asyncssh.SFTPNoSuchFile:
+                    pass
+
+        if removed:
+            self.logger.info(f"Removed {removed} stale temporary uploads from {self.config.remote_path}")
+        return removed
+
+    async def _publish(self, sftp: Any, temp_path: str, remote_path: str) -> None:
+        """Переименовывает проверенный файл в `remote_path`, атомарно заменяя прежний."""
+        try:
+            await sftp.posix_rename(temp_path, remote_path)
+        except asyncssh.SFTPOpUnsupported:
+            # Сервер без posix-rename@openssh.com: rename SFTPv3 не заменяет существующий файл
+            try:
+                await sftp.remove(remote_path)
+            except asyncssh.SFTPNoSuchFile:
+                pass
+            await sftp.rename(temp_path, remote_path)
+
+    async def _compress(self, file: UploadRequest) -> Optional[UploadRequest]:
+        """Сжимает файл для загрузки; None, если локальный файл не совпадает с ожидаемым хешем."""
+        compressed_path = f"{file.local_path}{COMPRESSION_EXTENSIONS[self.compression]}.part"
+        try:
+            compressed = await asyncio.to_thread(
+                compress_file, file.local_path, compressed_path, self.compression, self.config.compression_level
+            )
+        except BaseException:
+            _remove_local(compressed_path)
+            raise
+
+        if compressed.source_sha256 != file.expected_hash:
+            # Локальный файл изменился после конвертации: загружать его нельзя
+            self.logger.error(f"Hash mismatch for local file {file.local_path} before compression, upload aborted")
+            _remove_local(compressed_path)
+            return None
+
+        self.logger.info(
+            f"Compressed {file.local_path} with {self.compression}: "
+            f"{os.path.getsize(file.local_path)} -> {compressed.size} bytes"
+        )
+        return UploadRequest(compressed.path, self.remote_path_for(file.remote_path), compressed.sha256)
+
+    def _verification_candidates(self) -> Tuple[str, ...]:
+        # Выбранный вручную способ, если сервер его не поддерживает, заменяется скачиванием
+        order = AUTO_ORDER if self.verification == "auto" else (self.verification, "download")
+        return tuple(method for method in dict.fromkeys(order) if method not in self._unsupported_verifications)
+
+    async def _verify_upload(
+        self, session: SftpSession, local_path: Optional[str], remote_path: str, expected_hash: str
+    ) -> bool:
+        """
+        Проверяет загруженный файл первым поддерживаемым сервером способом.
+
+        Returns:
+            bool: True если файл на сервере совпадает с локальным
+        """
+        for method in self._verification_candidates():
+            if method == "download":
+                return await self._validate_remote_file_hash(session.sftp, remote_path, expected_hash)
+
+            try:
+                if method == "stat":
+                    if local_path is None:
+                        # Поток в режиме stat сверяется по размеру в _stream_to_remote
+                        continue
+                    return await remote_stat_matches(session.sftp, local_path, remote_path)
+                actual_hash = await remote_sha256(session.conn, remote_path)
+            except VerificationUnavailable as e:
+                self.logger.info(f"SFTP server {self.config.host} does not support {method} verification: {e}")
+                self._unsupported_verifications.add(method)
+                continue
+            except VerificationFailed as e:
+                # Способ поддерживается, но файл проверить не удалось: загрузка считается неуспешной
+                self.logger.error(f"{method} verification of {remote_path} failed: {e}")
+                return False
+
+            if actual_hash == expected_hash:
+                self.logger.debug(f"Remote sha256sum matches for {remote_path}")
+                return True
+            self.logger.error(f"Hash mismatch for {remote_path}. Expected: {expected_hash[:16]}..., Got: {actual_hash[:16]}...")
+            return False
         return False
 
     async def _validate_remote_file_hash(self, sftp, remote_path: str, expected_hash: str) -> bool:
         """
-        Проверяет хеш-сумму файла на удаленном SFTP сервере.
+        Проверяет хеш-сумму файла на удаленном SFTP сервере, скачав его обратно.
 
         Args:
             sftp: Активный SFTP клиент
@@ -0,0 +1,76 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import os
+import re
+import shlex
+from typing import Any
+
+import asyncssh
+
+# Способы проверки, которые выбираются автоматически: оба сверяют SHA256 содержимого
+AUTO_ORDER: tuple[str, ...] = ("sha256sum", "download")
+
+# Команды подсчета SHA256 на сервере (GNU coreutils, затем BSD/macOS)
+SHA256_COMMANDS: tuple[str, ...] = ("sha256sum --", "shasum -a 256 --")
+
+_SHA256_RE = re.compile(r"^\\?([0-9a-fA-F]{64})\s")
+
+# Предел ожидания удаленной команды: хеш CSV считается за доли секунды
+_COMMAND_TIMEOUT = 60
+
+# Коды выхода shell: команда не найдена (127) или не может быть запущена (126)
+_COMMAND_MISSING_STATUSES = (126, 127)
+
+# Ответ OpenSSH с ForceCommand internal-sftp на любую команду
+_SFTP_ONLY_MESSAGE = "allows sftp connections only"
+
+# =====================================
+# 2. Проверки загруженного файла на сервере
+# =====================================
+
+class VerificationUnavailable(Exception):
+    """Сервер не поддерживает этот способ проверки (нет shell, нет команды)."""
+
+class VerificationFailed(Exception):
+    """Команда проверки есть, но завершилась ошибкой (нет файла, ошибка чтения)."""
+
+async def remote_sha256(conn: Any, remote_path: str) -> str:
+    """
+    Считает SHA256 файла командой на сервере по тому же SSH соединению.
+
+    Файл не передается обратно: по сети идет только строка с хешем.
+
+    Raises:
+        VerificationUnavailable: Сервер не выполняет команды (только SFTP) или ни одной команды нет
+        VerificationFailed: Команда запустилась, но не посчитала хеш
+    """
+    for command in SHA256_COMMANDS:
+        try:
+            result = await conn.run(f"{command} {shlex.quote(remote_path)}", check=False, timeout=_COMMAND_TIMEOUT)
+        except asyncssh.ChannelOpenError as e:
+            raise VerificationUnavailable(f"remote commands are not allowed: {e}") from e
+
+        output = f"{result.stdout or ''}{result.stderr or ''}".strip()
+        if result.exit_status == 0:
+            match = _SHA256_RE.match(str(result.stdout))
+            if match:
+                return match.group(1).lower()
+            raise VerificationFailed(f"unexpected output of {command}: {output[:200]!r}")
+        if _SFTP_ONLY_MESSAGE in output:
+            raise VerificationUnavailable(f"remote commands are not allowed: {output[:200]}")
+        if result.exit_status not in _COMMAND_MISSING_STATUSES:
+            raise VerificationFailed(f"{command} exited with status {result.exit_status}: {output[:200]}")
+    raise VerificationUnavailable(f"no SHA256 command on the server ({', '.join(SHA256_COMMANDS)})")
+
+async def remote_stat_matches(sftp: Any, local_path: str, remote_path: str) -> bool:
+    """
+    Дешевая проверка без чтения содержимого: совпадают размер и mtime.
+
+    Имеет смысл, только если файл загружен с preserve=True (mtime копируется
+    с локального файла). Обнаруживает обрыв и недописанный файл, но не
+    искажение содержимого, поэтому автоматически не выбирается.
+    """
+    attrs = await sftp.stat(remote_path)
+    local = os.stat(local_path)
+    return bool(attrs.size == local.st_size and attrs.mtime == int(local.st_mtime))
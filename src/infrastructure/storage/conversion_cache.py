@@ -0,0 +1,165 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import os
+import shutil
+from datetime import datetime
+
+from src.domain.models import ConversionCacheEntry
+from src.domain.repositories import IConversionCacheRepository
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.storage.storage_io import StorageIO
+from src.infrastructure.storage.xlsx_converter import ConversionResult
+
+# Сколько записей выбирается из БД за один шаг вытеснения
+_EVICTION_BATCH = 100
+
+# =====================================
+# 2. Операции с файлами кеша
+# =====================================
+
+def _link_or_copy(source: str, destination: str) -> None:
+    """
+    Атомарно размещает копию `source` по пути `destination`.
+
+    Используется жесткая ссылка (без копирования данных); если источник
+    на другой файловой системе, файл копируется.
+    """
+    tmp_path = os.path.join(os.path.dirname(destination), f".{os.path.basename(destination)}.part")
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+def _remove_artifact(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# =====================================
+# 3. Кеш конвертации
+# =====================================
+
+class ConversionCache:
+    """
+    Контентно-адресуемый кеш конвертации: SHA256 исходного .xlsx -> готовый CSV.
+
+    CSV хранятся в директории кеша как `<xx>/<sha256 .xlsx>.csv`, а хеш, размер
+    и размеры таблицы - в таблице conversion_cache. Повторно присланная книга
+    не разбирается: CSV берется из кеша жесткой ссылкой.
+
+    Когда суммарный размер превышает `max_bytes`, вытесняются записи,
+    которые дольше всего не использовались (LRU по last_used_at).
+    Ошибки кеша не прерывают обработку: в худшем случае файл конвертируется заново.
+    Операции с файлами кеша выполняются в пуле файловых операций (StorageIO).
+    """
+
+    def __init__(
+        self,
+        repo: IConversionCacheRepository,
+        directory: str = "storage/cas",
+        max_bytes: int = 1024 ** 3,
+        storage_io: StorageIO | None = None,
+    ):
+        self.repo = repo
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.storage_io = storage_io or StorageIO()
+        self.logger = get_logger(__name__)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def artifact_path(self, xlsx_hash: str) -> str:
+        return os.path.join(self.directory, xlsx_hash[:2], f"{xlsx_hash}.csv")
+
+    async def fetch(self, xlsx_hash: str, csv_path: str) -> ConversionResult | None:
+        """
+        Размещает CSV из кеша по пути `csv_path`.
+
+        Returns:
+            Optional[ConversionResult]: Итог исходной конвертации или None, если книги нет в кеше
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            entry = await self.repo.find_by_xlsx_hash(xlsx_hash)
+            if entry is None:
+                return None
+
+            try:
+                await self.storage_io.run("cache_link", _link_or_copy, entry.artifact_path, csv_path)
+            except FileNotFoundError:
+                # Файл кеша удален вручную: запись больше не действительна
+                self.logger.warning(f"Cached CSV for {xlsx_hash[:16]}... is missing, dropping cache entry")
+                await self.repo.delete_by_xlsx_hashes([xlsx_hash])
+                return None
+
+            await self.repo.touch(xlsx_hash, datetime.now())
+        except Exception as e:
+            self.logger.warning(f"Conversion cache lookup failed for {xlsx_hash[:16]}...: {e}")
+            return None
+
+        return ConversionResult(
+            rows=entry.rows, columns=entry.columns, engine="cache", size=entry.csv_size, sha256=entry.csv_hash,
+        )
+
+    async def store(self, xlsx_hash: str, csv_path: str, result: ConversionResult) -> None:
+        """Сохраняет сконвертированный CSV в кеш и при необходимости вытесняет старые записи."""
+        if not self.enabled or result.size > self.max_bytes:
+            return
+
+        artifact_path = self.artifact_path(xlsx_hash)
+        try:
+            await self.storage_io.run("makedirs", os.makedirs, os.path.dirname(artifact_path), exist_ok=True)
+            await self.storage_io.run("cache_link", _link_or_copy, csv_path, artifact_path)
+            now = datetime.now()
+            await self.repo.save(ConversionCacheEntry(
+                xlsx_hash=xlsx_hash,
+                artifact_path=artifact_path,
+                csv_hash=result.sha256,
+                csv_size=result.size,
+                rows=result.rows,
+                columns=result.columns,
+                created_at=now,
+                last_used_at=now,
+            ))
+            await self.evict()
+        except Exception as e:
+            self.logger.warning(f"Failed to store {xlsx_hash[:16]}... in conversion cache: {e}")
+
+    async def evict(self) -> int:
+        """
+        Удаляет давно не использовавшиеся записи, пока кеш не уложится в `max_bytes`.
+
+        Returns:
+            int: Число удаленных записей
+        """
+        total = await self.repo.total_size()
+        evicted = 0
+
+        while total > self.max_bytes:
+            victims = []
+            for entry in await self.repo.least_recently_used(_EVICTION_BATCH):
+                if total <= self.max_bytes:
+                    break
+                victims.append(entry)
+                total -= entry.csv_size
+            if not victims:
+                break
+
+            # Сначала запись в БД, затем файл: запись без файла безопасна (см. fetch)
+            await self.repo.delete_by_xlsx_hashes(entry.xlsx_hash for entry in victims)
+            for entry in victims:
+                await self.storage_io.run("cache_evict", _remove_artifact, entry.artifact_path)
+            evicted += len(victims)
+
+        if evicted:
+            self.logger.info(f"Evicted {evicted} entries from conversion cache ({total} bytes left)")
+        return evicted
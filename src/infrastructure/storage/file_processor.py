@@ -1,16 +1,102 @@
 # =====================================
 # 1. Импорт библиотек
 # =====================================
+import asyncio
+import functools
+import io
+import multiprocessing
 import os
-import hashlib
-from typing import List
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Tuple, Union
 
+from src.config import ConversionConfig, NormalizationConfig, NormalizationRules
 from src.domain.services import IFileProcessingService, RawEmail, EmailAttachment
 from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.monitoring.metrics import time_operation
+from src.infrastructure.patterns.process_shared import ProcessShared
+from src.infrastructure.storage.conversion_cache import ConversionCache
+from src.infrastructure.storage.spool import dated_storage_dir
+from src.infrastructure.storage.storage_io import StorageIO, partial_path
+from src.infrastructure.storage.stoplist_normalizer import normalize_xlsx
+from src.infrastructure.storage.xlsx_converter import ConversionResult, convert_xlsx_to_csv
+from src.infrastructure.storage.xlsx_readers import XlsxSource
 
 # =====================================
-# 2. Сервис обработки файлов
+# 2. Конвертация (выполняется в потоке или дочернем процессе)
+# =====================================
+
+def convert_file(
+    xlsx_source: Union[str, bytes],
+    csv_path: str,
+    parquet_path: Optional[str] = None,
+    parquet_compression: str = "zstd",
+    normalization: Optional[NormalizationRules] = None,
+    reader: str = "auto",
+) -> ConversionResult:
+    """
+    Конвертирует .xlsx в CSV (UTF-8 BOM); SHA256 CSV считается при записи.
+
+    Функция верхнего уровня, чтобы ее можно было передать в пул процессов:
+    на вход путь или содержимое книги, на выход только метаданные.
+    Если задан `parquet_path`, Parquet пишется в том же проходе.
+    Если заданы правила `normalization`, в `csv_path` (и Parquet) записывается
+    нормализованная таблица (stoplist_normalizer).
+    `reader` - бэкенд чтения книги (xlsx_readers).
+
+    Returns:
+        ConversionResult: Итог конвертации с размером и SHA256 CSV файла
+    """
+    # Вложение в памяти (bytes) разбирается без чтения с диска
+    source: XlsxSource = io.BytesIO(xlsx_source) if isinstance(xlsx_source, bytes) else xlsx_source
+    if normalization is None:
+        return convert_xlsx_to_csv(source, csv_path, parquet_path, parquet_compression, reader)
+    return normalize_xlsx(source, csv_path, normalization, parquet_path, parquet_compression, reader)
+
+def reserve_csv_path(full_path: str, email: RawEmail) -> str:
+    """
+    Атомарно занимает свободное имя CSV для письма пустым файлом-заглушкой.
+
+    CSV за дату письма может уже существовать (другое письмо) и еще ждать
+    загрузки на SFTP, а письма за одну дату конвертируются параллельно:
+    имя занимается созданием файла с O_EXCL, поэтому два воркера (или
+    вложения одного письма) никогда не получат один путь.
+    """
+    base_name = f"RS_stoplist_{email.date.strftime('%Y%m%d')}"
+    candidate, index = f"{base_name}.csv", 1
+    while True:
+        path = os.path.join(full_path, candidate)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return path
+        except FileExistsError:
+            index += 1
+            suffix = email.message_id if index == 2 else f"{email.message_id}_{index - 1}"
+            candidate = f"{base_name}_{suffix}.csv"
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+_process_pool: ProcessShared[ProcessPoolExecutor] = ProcessShared()
+
+def get_conversion_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Возвращает (и при первом вызове создает) пул процессов конвертации."""
+    # spawn: дочерние процессы не наследуют потоки IMAP и планировщика
+    return _process_pool.get(lambda: ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    ))
+
+def shutdown_conversion_pool(wait: bool = True) -> None:
+    """Останавливает пул процессов конвертации (при завершении приложения)."""
+    for pool in _process_pool.release():
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+# =====================================
+# 3. Сервис обработки файлов
 # =====================================
 
 class FileProcessingService(IFileProcessingService):
@@ -19,17 +105,61 @@ class FileProcessingService(IFileProcessingService):
 
     Реализует сохранение в структурированную директорию по дате
     и конвертацию в CSV с UTF-8 BOM.
+
+    Вложение, пришедшее в памяти (`content`), разбирается прямо из нее, а
+    исходный .xlsx параллельно записывается в хранилище в отдельном потоке,
+    так что файл не читается с диска повторно.
+
+    Если передан `conversion_cache`, книга с уже известным SHA256 не
+    разбирается: CSV берется из контентно-адресуемого кеша.
+
+    Для отправителей из `normalization_config` CSV нормализуется: настоящая
+    строка заголовка, без пустых колонок, номера и коды в едином виде.
+    Такие файлы в кеш не попадают (результат зависит от отправителя).
+
+    С `parquet_enabled` рядом с CSV (то же имя, .parquet) при той же конвертации
+    пишется Parquet. Кеш хранит только CSV, поэтому в этом режиме он
+    не используется для выдачи готовых файлов.
+
+    Конвертация не выполняется в event loop. В режиме `thread` она идет
+    в рабочем потоке, в режиме `process` - в общем пуле процессов, так
+    что несколько вложений конвертируются параллельно на разных ядрах без GIL.
+    Число одновременных конвертаций ограничено `max_workers`.
+    Лист читается потоково (xlsx_converter) без построения DataFrame;
+    pandas используется, только если потоковый результат мог бы отличаться.
+
+    Остальные операции с хранилищем (директории, перенос и запись .xlsx,
+    выбор имени CSV) идут в ограниченном пуле `storage_io`, а готовые файлы
+    сбрасываются на диск (fsync) до того, как метаданные уйдут на загрузку.
+    Время разбора книги пишется в метрику file_convert отдельно от них.
     """
 
-    def __init__(self, base_storage_path: str = "storage"):
+    def __init__(
+        self,
+        base_storage_path: str = "storage",
+        conversion_config: Optional[ConversionConfig] = None,
+        conversion_cache: Optional[ConversionCache] = None,
+        normalization_config: Optional[NormalizationConfig] = None,
+        storage_io: Optional[StorageIO] = None,
+    ):
         self.base_storage_path = base_storage_path
+        self.conversion_config = conversion_config or ConversionConfig()
+        self.conversion_cache = conversion_cache
+        self.normalization_config = normalization_config or NormalizationConfig()
+        self.storage_io = storage_io or StorageIO()
+        self._conversion_slots = asyncio.Semaphore(self.conversion_config.max_workers)
         self.logger = get_logger(__name__)
-        self.logger.info(f"FileProcessingService initialized with base path: {base_storage_path}")
+        self.logger.info(
+            f"FileProcessingService initialized with base path: {base_storage_path}, "
+            f"conversion mode: {self.conversion_config.mode} (max {self.conversion_config.max_workers})"
+        )
 
     async def save_and_convert(self, email: RawEmail) -> List[dict]:
         """
         Сохраняет вложения email и конвертирует их в CSV.
 
+        Все .xlsx вложения письма конвертируются одновременно (в пределах max_workers).
+
         Args:
             email: Email с вложениями для обработки
 
@@ -37,7 +167,9 @@ class FileProcessingService(IFileProcessingService):
             List[dict]: Метаданные обработанных файлов
         """
         self.logger.info(f"Processing files for message {email.message_id} from {email.sender}")
-        processed_files_metadata = []
+
+        prepared: List[Tuple[EmailAttachment, str, str]] = []
+        full_path: Optional[str] = None
 
         for attachment in email.attachments:
             if not attachment.filename.endswith('.xlsx'):
@@ -46,44 +178,62 @@ class FileProcessingService(IFileProcessingService):
 
             self.logger.info(f"Processing .xlsx file: {attachment.filename}")
 
-            # Создание структуры директорий по дате
-            date_path = f"{email.date.year}/{email.date.month:02d}/{email.date.day:02d}"
-            full_path = os.path.join(self.base_storage_path, "ps", date_path)
-            os.makedirs(full_path, exist_ok=True)
-            self.logger.debug(f"Created directory structure: {full_path}")
-
-            # Сохранение исходного .xlsx файла
-            xlsx_path = os.path.join(full_path, attachment.filename)
-            with open(xlsx_path, "wb") as f:
-                f.write(attachment.content)
-            self.logger.debug(f"Saved .xlsx file to: {xlsx_path}")
-
-            # Вычисление хеш-суммы исходного .xlsx файла
-            xlsx_hash = hashlib.sha256(attachment.content).hexdigest()
-            self.logger.debug(f"Calculated SHA256 hash for .xlsx: {xlsx_hash[:16]}...")
-
-            # Конвертация в CSV
-            csv_filename = f"RS_stoplist_{email.date.strftime('%Y%m%d')}.csv"
-            csv_path = os.path.join(full_path, csv_filename)
-
-            try:
-                self.logger.debug(f"Converting {attachment.filename} to CSV format")
-                df = pd.read_excel(xlsx_path, engine='openpyxl')
-                df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-                self.logger.info(f"Successfully converted to CSV: {csv_path}")
-
-                # Логгирование статистики
-                self.logger.debug(f"CSV contains {len(df)} rows and {len(df.columns)} columns")
-
-                # Вычисление хеш-суммы CSV файла для валидации SFTP
-                with open(csv_path, "rb") as csv_file:
-                    csv_hash = hashlib.sha256(csv_file.read()).hexdigest()
-                self.logger.debug(f"Calculated SHA256 hash for CSV: {csv_hash[:16]}...")
-
-            except Exception as e:
-                self.logger.error(f"Error converting file {attachment.filename} to CSV: {e}", exc_info=True)
+            # Создание структуры директорий по дате (одна на все вложения письма)
+            if full_path is None:
+                full_path = await self.storage_io.run("makedirs", dated_storage_dir, self.base_storage_path, email.date)
+                self.logger.debug(f"Created directory structure: {full_path}")
+
+            # Исходный .xlsx уже записан на диск сервисом чтения почты (для вложения
+            # в памяти там лежит скрытый резерв имени); переносим его, только если
+            # он сохранен в другое хранилище
+            xlsx_path = attachment.path
+            if os.path.dirname(os.path.abspath(xlsx_path)) != os.path.abspath(full_path):
+                xlsx_path = os.path.join(full_path, os.path.basename(attachment.path))
+                if attachment.content is None:
+                    await self.storage_io.move(attachment.path, xlsx_path)
+                else:
+                    await self.storage_io.move(partial_path(attachment.path), partial_path(xlsx_path))
+            if attachment.content is None:
+                self.logger.debug(f"Stored .xlsx file at: {xlsx_path} ({attachment.size} bytes)")
+
+            # Хеш-сумма исходного .xlsx посчитана при записи вложения
+            self.logger.debug(f"SHA256 hash for .xlsx: {attachment.sha256[:16]}...")
+
+            csv_path = await self.storage_io.run("reserve", reserve_csv_path, full_path, email)
+            prepared.append((attachment, xlsx_path, csv_path))
+
+        # Конвертация в CSV
+        rules = self.normalization_config.rules_for(email.sender)
+        outcomes = await asyncio.gather(
+            *(self._convert(attachment, xlsx_path, csv_path, rules) for attachment, xlsx_path, csv_path in prepared),
+            return_exceptions=True,
+        )
+
+        processed_files_metadata = []
+        for (attachment, xlsx_path, csv_path), outcome in zip(prepared, outcomes, strict=True):
+            if isinstance(outcome, BaseException):
+                if isinstance(outcome, Exception):
+                    self.logger.error(f"Error converting file {attachment.filename} to CSV: {outcome}", exc_info=outcome)
+                # Освобождаем зарезервированные имена (вместе с недописанным CSV)
+                await self.storage_io.run("remove", _remove_file, csv_path)
+                if attachment.content is not None:
+                    await self.storage_io.run("remove", _remove_file, partial_path(xlsx_path))
                 continue
 
+            result = outcome
+            self.logger.info(f"Successfully converted to CSV: {csv_path}")
+
+            # Логгирование статистики
+            engine = f"{result.engine} engine, {result.reader} reader" if result.reader else f"{result.engine} engine"
+            self.logger.debug(f"CSV contains {result.rows} rows and {result.columns} columns ({engine})")
+            self.logger.debug(f"SHA256 hash for CSV ({result.size} bytes): {result.sha256[:16]}...")
+
+            parquet_path = self._parquet_path(csv_path)
+            if parquet_path and result.parquet_sha256:
+                self.logger.debug(f"SHA256 hash for Parquet ({result.parquet_size} bytes): {result.parquet_sha256[:16]}...")
+            else:
+                parquet_path = None
+
             # Сбор метаданных
             file_metadata = {
                 "message_id": email.message_id,
@@ -91,11 +241,103 @@ class FileProcessingService(IFileProcessingService):
                 "file_name": attachment.filename,
                 "file_path": xlsx_path,
                 "csv_path": csv_path,
-                "file_hash": csv_hash,  # Используем хеш CSV файла для валидации SFTP
+                "file_hash": result.sha256,  # Используем хеш CSV файла для валидации SFTP
+                "parquet_path": parquet_path,
+                "parquet_hash": result.parquet_sha256 if parquet_path else None,
                 "email_date": email.date,
             }
             processed_files_metadata.append(file_metadata)
             self.logger.info(f"File {attachment.filename} processed successfully")
 
+        # Отмена (или остановка процесса) - не ошибка конвертации файла: пробрасываем ее
+        # после освобождения зарезервированных имен
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+                raise outcome
+
         self.logger.info(f"Completed processing {len(processed_files_metadata)} files for message {email.message_id}")
         return processed_files_metadata
+
+    def _parquet_path(self, csv_path: str) -> Optional[str]:
+        if not self.conversion_config.parquet_enabled:
+            return None
+        return f"{os.path.splitext(csv_path)[0]}.parquet"
+
+    async def _convert(
+        self, attachment: EmailAttachment, xlsx_path: str, csv_path: str, rules: Optional[NormalizationRules] = None
+    ) -> ConversionResult:
+        if attachment.content is None:
+            result = await self._convert_cached(attachment, xlsx_path, csv_path, rules)
+        else:
+            # Архивирование исходника идет параллельно с разбором книги из памяти
+            archived, converted = await asyncio.gather(
+                self.storage_io.write(xlsx_path, attachment.content),
+                self._convert_cached(attachment, attachment.content, csv_path, rules),
+                return_exceptions=True,
+            )
+            if isinstance(archived, BaseException):
+                raise archived
+            if isinstance(converted, BaseException):
+                raise converted
+            self.logger.debug(f"Stored .xlsx file at: {xlsx_path} ({attachment.size} bytes)")
+            result = converted
+
+        # Файлы уйдут на SFTP и в БД только после записи на диск
+        await self.storage_io.sync(csv_path)
+        parquet_path = self._parquet_path(csv_path)
+        if parquet_path and result.parquet_sha256:
+            await self.storage_io.sync(parquet_path)
+        return result
+
+    async def _convert_cached(
+        self,
+        attachment: EmailAttachment,
+        xlsx_source: Union[str, bytes],
+        csv_path: str,
+        rules: Optional[NormalizationRules] = None,
+    ) -> ConversionResult:
+        cache = self.conversion_cache if rules is None else None
+        if cache is not None and not self.conversion_config.parquet_enabled:
+            cached = await cache.fetch(attachment.sha256, csv_path)
+            if cached is not None:
+                self.logger.info(f"Reusing cached CSV for {attachment.filename} (xlsx {attachment.sha256[:16]}...)")
+                return cached
+
+        result = await self._run_conversion(attachment, xlsx_source, csv_path, rules)
+        if cache is not None:
+            await cache.store(attachment.sha256, csv_path, result)
+        return result
+
+    async def _run_conversion(
+        self,
+        attachment: EmailAttachment,
+        xlsx_source: Union[str, bytes],
+        csv_path: str,
+        rules: Optional[NormalizationRules] = None,
+    ) -> ConversionResult:
+        async with self._conversion_slots:
+            self.logger.debug(f"Converting {attachment.filename} to CSV format ({self.conversion_config.mode} mode)")
+            options: dict = {}
+            parquet_path = self._parquet_path(csv_path)
+            if parquet_path:
+                options.update(parquet_path=parquet_path, parquet_compression=self.conversion_config.parquet_compression)
+            if rules is not None:
+                options.update(normalization=rules)
+            if self.conversion_config.reader != "auto":
+                options.update(reader=self.conversion_config.reader)
+            convert = functools.partial(convert_file, xlsx_source, csv_path, **options)
+
+            return await self._execute_conversion(convert)
+
+    @time_operation("file_convert")
+    async def _execute_conversion(self, convert: Callable[[], ConversionResult]) -> ConversionResult:
+        if self.conversion_config.mode != "process":
+            return await asyncio.to_thread(convert)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(get_conversion_pool(self.conversion_config.max_workers), convert)
+        except BrokenProcessPool:
+            # Дочерний процесс аварийно завершился (например, OOM); следующий вызов создаст новый пул
+            shutdown_conversion_pool(wait=False)
+            raise
@@ -1,16 +1,27 @@
 # =====================================
 # 1. Импорт библиотек
 # =====================================
-from typing import Optional, List, Type, Dict
+from datetime import datetime
+from typing import Any, Optional, List, Type, Dict, Iterable, Set
 
-from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import BigInteger, DateTime, String, any_, bindparam, delete, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.orm import sessionmaker
 
-from src.domain.models import ProcessedFile as ProcessedFileModel, OperationLog as OperationLogModel
-from src.domain.repositories import IProcessedFileRepository, IOperationLogRepository
+from src.domain.models import (
+    ProcessedFile as ProcessedFileModel,
+    OperationLog as OperationLogModel,
+    MailboxSyncState as MailboxSyncStateModel,
+    ConversionCacheEntry as ConversionCacheEntryModel,
+)
+from src.domain.repositories import (
+    IProcessedFileRepository,
+    IOperationLogRepository,
+    IMailboxSyncStateRepository,
+    IConversionCacheRepository,
+)
 from src.infrastructure.storage.database import Base
 
 # =====================================
@@ -28,6 +39,8 @@ class ProcessedFile(Base):
     csv_path: Mapped[Optional[str]]
     sftp_uploaded: Mapped[bool] = mapped_column(default=False)
     file_hash: Mapped[Optional[str]]
+    parquet_path: Mapped[Optional[str]]
+    parquet_hash: Mapped[Optional[str]]
     processed_at: Mapped[Optional[str]]
     email_date: Mapped[str]
 
@@ -41,6 +54,28 @@ class OperationLog(Base):
     context: Mapped[Optional[Dict]] = mapped_column(JSONB, nullable=True)
     created_at: Mapped[Optional[str]]
 
+class MailboxSyncState(Base):
+    __tablename__ = "mailbox_sync_state"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    folder: Mapped[str] = mapped_column(unique=True, index=True)
+    uid_validity: Mapped[int] = mapped_column(BigInteger)
+    last_uid: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[Optional[str]]
+
+class ConversionCacheEntry(Base):
+    __tablename__ = "conversion_cache"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    xlsx_hash: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    artifact_path: Mapped[str]
+    csv_hash: Mapped[str] = mapped_column(String(64))
+    csv_size: Mapped[int] = mapped_column(BigInteger)
+    rows: Mapped[int] = mapped_column(BigInteger)
+    columns: Mapped[int]
+    hits: Mapped[int] = mapped_column(BigInteger, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
 
 # =====================================
 # 3. Базовая реализация репозитория
@@ -52,7 +87,7 @@ class SQLAlchemyRepository:
     def __init__(self, session_factory: sessionmaker):
         self.session_factory = session_factory
 
-    async def add(self, data: dict) -> Base:
+    async def add(self, data: Any) -> Any:
         async with self.session_factory() as session:
             instance = self.model(**data)
             session.add(instance)
@@ -92,6 +127,47 @@ class ProcessedFileRepository(SQLAlchemyRepository, IProcessedFileRepository):
             instance = result.scalar_one_or_none()
             return ProcessedFileModel.from_orm(instance) if instance else None
 
+    async def find_existing_message_ids(self, message_ids: Iterable[str]) -> Set[str]:
+        ids = list(dict.fromkeys(message_ids))
+        if not ids:
+            return set()
+
+        async with self.session_factory() as session:
+            # WHERE message_id = ANY(:ids) - один запрос на весь пакет
+            stmt = select(self.model.message_id).where(
+                self.model.message_id == any_(bindparam("ids", value=ids, type_=ARRAY(String)))
+            )
+            result = await session.execute(stmt)
+            return set(result.scalars().all())
+
+    async def find_latest_with_csv(self) -> Optional[ProcessedFileModel]:
+        async with self.session_factory() as session:
+            stmt = (
+                select(self.model)
+                .where(self.model.csv_path.is_not(None))
+                .order_by(self.model.email_date.desc(), self.model.id.desc())
+                .limit(1)
+            )
+            result = await session.execute(stmt)
+            instance = result.scalar_one_or_none()
+            return ProcessedFileModel.from_orm(instance) if instance else None
+
+    async def find_previous_by_sender(self, sender_email: str, before: datetime) -> Optional[ProcessedFileModel]:
+        async with self.session_factory() as session:
+            stmt = (
+                select(self.model)
+                .where(
+                    self.model.sender_email == sender_email,
+                    self.model.email_date < before,
+                    self.model.csv_path.is_not(None),
+                )
+                .order_by(self.model.email_date.desc(), self.model.id.desc())
+                .limit(1)
+            )
+            result = await session.execute(stmt)
+            instance = result.scalar_one_or_none()
+            return ProcessedFileModel.from_orm(instance) if instance else None
+
 class OperationLogRepository(SQLAlchemyRepository, IOperationLogRepository):
     model = OperationLog
 
@@ -102,3 +178,91 @@ class OperationLogRepository(SQLAlchemyRepository, IOperationLogRepository):
             await session.commit()
             await session.refresh(db_log)
             return OperationLogModel.from_orm(db_log)
+
+class MailboxSyncStateRepository(SQLAlchemyRepository, IMailboxSyncStateRepository):
+    model = MailboxSyncState
+
+    async def get_by_folder(self, folder: str) -> Optional[MailboxSyncStateModel]:
+        async with self.session_factory() as session:
+            stmt = select(self.model).where(self.model.folder == folder)
+            result = await session.execute(stmt)
+            instance = result.scalar_one_or_none()
+            return MailboxSyncStateModel.from_orm(instance) if instance else None
+
+    async def save(self, state: MailboxSyncStateModel) -> MailboxSyncStateModel:
+        async with self.session_factory() as session:
+            stmt = select(self.model).where(self.model.folder == state.folder)
+            result = await session.execute(stmt)
+            db_state = result.scalar_one_or_none()
+
+            if db_state is None:
+                db_state = self.model(**state.dict(exclude={"id"}))
+                session.add(db_state)
+            else:
+                db_state.uid_validity = state.uid_validity
+                db_state.last_uid = state.last_uid
+                db_state.updated_at = state.updated_at
+
+            await session.commit()
+            await session.refresh(db_state)
+            return MailboxSyncStateModel.from_orm(db_state)
+
+class ConversionCacheRepository(SQLAlchemyRepository, IConversionCacheRepository):
+    model = ConversionCacheEntry
+
+    async def find_by_xlsx_hash(self, xlsx_hash: str) -> Optional[ConversionCacheEntryModel]:
+        async with self.session_factory() as session:
+            stmt = select(self.model).where(self.model.xlsx_hash == xlsx_hash)
+            result = await session.execute(stmt)
+            instance = result.scalar_one_or_none()
+            return ConversionCacheEntryModel.from_orm(instance) if instance else None
+
+    async def save(self, entry: ConversionCacheEntryModel) -> ConversionCacheEntryModel:
+        async with self.session_factory() as session:
+            stmt = select(self.model).where(self.model.xlsx_hash == entry.xlsx_hash)
+            result = await session.execute(stmt)
+            db_entry = result.scalar_one_or_none()
+
+            if db_entry is None:
+                db_entry = self.model(**entry.dict(exclude={"id"}))
+                session.add(db_entry)
+            else:
+                for field, value in entry.dict(exclude={"id", "xlsx_hash", "hits", "created_at"}).items():
+                    setattr(db_entry, field, value)
+
+            await session.commit()
+            await session.refresh(db_entry)
+            return ConversionCacheEntryModel.from_orm(db_entry)
+
+    async def touch(self, xlsx_hash: str, used_at: datetime) -> None:
+        async with self.session_factory() as session:
+            stmt = (
+                update(self.model)
+                .where(self.model.xlsx_hash == xlsx_hash)
+                .values(last_used_at=used_at, hits=self.model.hits + 1)
+            )
+            await session.execute(stmt)
+            await session.commit()
+
+    async def total_size(self) -> int:
+        async with self.session_factory() as session:
+            result = await session.execute(select(func.coalesce(func.sum(self.model.csv_size), 0)))
+            return int(result.scalar_one())
+
+    async def least_recently_used(self, limit: int) -> List[ConversionCacheEntryModel]:
+        async with self.session_factory() as session:
+            stmt = select(self.model).order_by(self.model.last_used_at).limit(limit)
+            result = await session.execute(stmt)
+            return [ConversionCacheEntryModel.from_orm(instance) for instance in result.scalars().all()]
+
+    async def delete_by_xlsx_hashes(self, xlsx_hashes: Iterable[str]) -> None:
+        hashes = list(dict.fromkeys(xlsx_hashes))
+        if not hashes:
+            return
+
+        async with self.session_factory() as session:
+            stmt = delete(self.model).where(
+                self.model.xlsx_hash == any_(bindparam("hashes", value=hashes, type_=ARRAY(String)))
+            )
+            await session.execute(stmt)
+            await session.commit()
@@ -0,0 +1,222 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import binascii
+import hashlib
+import io
+import os
+import quopri
+import re
+from datetime import datetime
+from types import TracebackType
+from typing import TYPE_CHECKING, BinaryIO
+
+from src.domain.services import EmailAttachment
+from src.infrastructure.storage.storage_io import partial_path
+
+if TYPE_CHECKING:
+    from _typeshed import ReadableBuffer
+
+# =====================================
+# 2. Структура хранилища
+# =====================================
+
+def dated_storage_dir(base_storage_path: str, date: datetime) -> str:
+    """
+    Возвращает (и создает) директорию хранения файлов за дату письма.
+
+    Формат: <base>/ps/YYYY/MM/DD
+    """
+    path = os.path.join(base_storage_path, "ps", f"{date.year}/{date.month:02d}/{date.day:02d}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+# =====================================
+# 3. Потоковое декодирование частей письма
+# =====================================
+
+_WHITESPACE_RE = re.compile(rb'\s+')
+
+class TransferDecoder:
+    """
+    Инкрементальный декодер Content-Transfer-Encoding.
+
+    Принимает закодированные данные произвольными кусками и возвращает
+    декодированные байты, удерживая в буфере только неполный хвост
+    (до 3 символов base64 или одну строку quoted-printable).
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._tail = b''
+
+    def feed(self, data: bytes) -> bytes:
+        if self.encoding == 'base64':
+            data = self._tail + _WHITESPACE_RE.sub(b'', data)
+            usable = len(data) - len(data) % 4
+            self._tail = data[usable:]
+            return binascii.a2b_base64(data[:usable]) if usable else b''
+
+        if self.encoding == 'quoted-printable':
+            data = self._tail + data
+            # Мягкий перенос (=\r\n) может быть разрезан между кусками
+            cut = data.rfind(b'\n') + 1
+            self._tail = data[cut:]
+            return quopri.decodestring(data[:cut]) if cut else b''
+
+        return data
+
+    def flush(self) -> bytes:
+        tail, self._tail = self._tail, b''
+        if not tail:
+            return b''
+        if self.encoding == 'base64':
+            return binascii.a2b_base64(tail + b'=' * (-len(tail) % 4))
+        if self.encoding == 'quoted-printable':
+            return quopri.decodestring(tail)
+        return tail
+
+# =====================================
+# 4. Запись с хешированием
+# =====================================
+
+class HashingWriter(io.RawIOBase):
+    """
+    Бинарный поток, который пишет в файл и одновременно считает SHA256 и размер.
+
+    Контрольная сумма получается без повторного чтения файла с диска.
+    Для записи текста оборачивается в `io.BufferedWriter` и `io.TextIOWrapper`.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self._file = file
+        self._hasher = hashlib.sha256()
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: "ReadableBuffer") -> int:
+        written = self._file.write(data)
+        self._hasher.update(data)
+        self.size += written
+        return written
+
+    def redirect(self, file: BinaryIO) -> None:
+        """Продолжает запись в другой файл; хеш и размер накапливаются дальше."""
+        self._file.close()
+        self._file = file
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+    @property
+    def sha256(self) -> str:
+        return self._hasher.hexdigest()
+
+# =====================================
+# 5. Запись вложения в спул-файл
+# =====================================
+
+class AttachmentSpool:
+    """
+    Записывает вложение на диск по мере получения, считая размер и SHA256.
+
+    Данные пишутся во временный файл `.<имя>.part` в той же директории и
+    атомарно переименовываются в итоговое имя в `commit()`, поэтому
+    оборванная загрузка не оставляет "готового" файла. Если файл с таким
+    именем уже есть и задан `unique_suffix`, к имени добавляется суффикс.
+
+    Если задан `memory_limit`, вложение до этого размера остается в памяти:
+    `commit()` возвращает его с `content` и только резервирует имя пустым
+    скрытым `.<имя>.part`; итоговое имя появляется, когда конвертер допишет
+    архивную копию (storage_io.write_file). Превысившее лимит вложение
+    продолжает писаться во временный файл.
+
+    Использование:
+        with AttachmentSpool(directory, filename, encoding) as spool:
+            spool.write(chunk)
+            attachment = spool.commit()
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        filename: str,
+        encoding: str | None = None,
+        unique_suffix: str | None = None,
+        memory_limit: int = 0,
+    ):
+        self.filename = filename
+        self.path = os.path.join(directory, filename)
+        if unique_suffix and (os.path.exists(self.path) or os.path.exists(partial_path(self.path))):
+            # Файл с таким именем уже сохранен из другого письма
+            stem, ext = os.path.splitext(filename)
+            self.path = os.path.join(directory, f"{stem}_{unique_suffix}{ext}")
+        self._tmp_path = partial_path(self.path)
+        self._decoder = TransferDecoder(encoding or 'binary')
+        self._memory_limit = memory_limit
+        self._buffer: io.BytesIO | None = None
+        self._file: HashingWriter | None = None
+
+    def __enter__(self) -> "AttachmentSpool":
+        if self._memory_limit > 0:
+            self._buffer = io.BytesIO()
+            self._file = HashingWriter(self._buffer)
+        else:
+            self._file = HashingWriter(open(self._tmp_path, "wb"))
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+    def write(self, data: bytes) -> None:
+        """Декодирует и записывает очередной кусок содержимого части."""
+        self._write_decoded(self._decoder.feed(data))
+
+    def commit(self) -> EmailAttachment:
+        """Завершает запись и возвращает описание сохраненного вложения."""
+        self._write_decoded(self._decoder.flush())
+        written, self._file = self._file, None
+        if written is None:
+            raise ValueError("AttachmentSpool is not open")
+        content = self._buffer.getvalue() if self._buffer is not None else None
+        written.close()
+
+        if content is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            # Резервируем имя, чтобы следующее вложение с тем же именем получило суффикс;
+            # пустой файл под итоговым именем выглядел бы как готовый исходник
+            open(self._tmp_path, "wb").close()
+
+        return EmailAttachment(
+            filename=self.filename,
+            path=self.path,
+            size=written.size,
+            sha256=written.sha256,
+            content=content,
+        )
+
+    def _write_decoded(self, data: bytes) -> None:
+        if self._file is None:
+            raise ValueError("AttachmentSpool is not open")
+        if data:
+            self._file.write(data)
+            if self._buffer is not None and self._file.size > self._memory_limit:
+                # Вложение больше лимита: переносим накопленное в спул-файл
+                spill = open(self._tmp_path, "wb")
+                spill.write(self._buffer.getvalue())
+                self._buffer = None
+                self._file.redirect(spill)
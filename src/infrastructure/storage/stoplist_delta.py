@@ -0,0 +1,231 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import asyncio
+import csv
+import os
+import time
+from collections.abc import Sequence
+from operator import itemgetter
+from typing import Any, NamedTuple
+
+from src.config import DeltaConfig
+from src.domain.models import ProcessedFile
+from src.domain.repositories import IProcessedFileRepository
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.storage.xlsx_converter import HashingCsvWriter
+
+# Значения колонки CHANGE в CSV дельты
+ADDED, REMOVED, CHANGED = "added", "removed", "changed"
+
+class DeltaError(ValueError):
+    """Список нельзя сравнить (например, в CSV нет ключевых колонок)."""
+
+class StoplistTable(NamedTuple):
+    """Строки стоп-листа, проиндексированные по ключу."""
+    header: list[str]
+    rows: dict[Any, tuple[str, ...]]   # Ключ - строка (одна ключевая колонка) или кортеж
+    duplicate_keys: int
+
+class StoplistDelta(NamedTuple):
+    """Результат сравнения двух стоп-листов."""
+    header: list[str]
+    added: list[tuple[str, ...]]
+    removed: list[tuple[str, ...]]
+    changed: list[tuple[str, ...]]   # Новые значения измененных строк
+    unchanged: int
+    duplicate_keys: int
+
+    def summary(self) -> dict:
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "changed": len(self.changed),
+            "unchanged": self.unchanged,
+            "duplicate_keys": self.duplicate_keys,
+        }
+
+class DeltaFile(NamedTuple):
+    """Записанный CSV дельты."""
+    path: str
+    sha256: str
+    summary: dict
+
+# =====================================
+# 2. Чтение и сравнение списков
+# =====================================
+
+def read_stoplist(csv_path: str, key_columns: Sequence[str]) -> StoplistTable:
+    """
+    Читает CSV стоп-листа в словарь {ключ: строка}.
+
+    Строкой заголовка считается первая строка, содержащая все ключевые колонки:
+    над таблицей в книге обычно есть название отчета и пустые строки.
+    Строки с пустым ключом пропускаются; при повторе ключа остается последняя строка.
+    Значения сравниваются как есть (CSV пишет один и тот же конвертер).
+
+    Raises:
+        DeltaError: В файле нет строки с ключевыми колонками
+    """
+    with open(csv_path, encoding="utf-8-sig", newline="") as csv_file:
+        reader = csv.reader(csv_file)
+
+        for header in reader:
+            if all(column in header for column in key_columns):
+                break
+        else:
+            raise DeltaError(f"Key columns {list(key_columns)} not found in {os.path.basename(csv_path)}")
+
+        width = len(header)
+        key_of = itemgetter(*(header.index(column) for column in key_columns))
+        empty_key = key_of([""] * width)
+        rows: dict[Any, tuple[str, ...]] = {}
+        total = 0
+
+        for row in reader:
+            if len(row) < width:
+                row.extend([""] * (width - len(row)))
+            key = key_of(row)
+            if key == empty_key:
+                continue
+            # Кортеж строк GC перестает отслеживать после первой сборки,
+            # а сотни тысяч списков он обходил бы на каждой
+            rows[key] = tuple(row)
+            total += 1
+
+    return StoplistTable(header=header, rows=rows, duplicate_keys=total - len(rows))
+
+def compute_delta(
+    previous_csv: str,
+    current_csv: str,
+    key_columns: Sequence[str],
+    ignore_columns: Sequence[str] = (),
+) -> StoplistDelta:
+    """
+    Сравнивает два стоп-листа по ключу (hash join по словарям ключей).
+
+    Строка считается измененной, если отличается любая колонка, кроме
+    `ignore_columns` (например, порядковый номер строки). Колонки
+    предыдущего списка сопоставляются с текущим по имени.
+    """
+    previous = read_stoplist(previous_csv, key_columns)
+    current = read_stoplist(current_csv, key_columns)
+    header = current.header
+
+    # Индексы колонок предыдущего списка в порядке колонок текущего (-1 - колонки не было)
+    previous_index = {name: index for index, name in enumerate(previous.header) if name}
+    mapping = [previous_index.get(name, -1) if name else index for index, name in enumerate(header)]
+    # Сравниваются кортежи колонок (itemgetter) - без цикла по колонкам на Python
+    project = itemgetter(*(index for index, name in enumerate(header) if name not in ignore_columns))
+    if previous.header != header:
+        previous_rows = {
+            key: tuple([row[source] if 0 <= source < len(row) else "" for source in mapping])
+            for key, row in previous.rows.items()
+        }
+    else:
+        previous_rows = previous.rows
+
+    added, changed = [], []
+    unchanged = 0
+    for key, row in current.rows.items():
+        old_row = previous_rows.get(key)
+        if old_row is None:
+            added.append(row)
+        elif project(row) != project(old_row):
+            changed.append(row)
+        else:
+            unchanged += 1
+
+    current_rows = current.rows
+    removed = [row for key, row in previous_rows.items() if key not in current_rows]
+
+    return StoplistDelta(
+        header=header,
+        added=added,
+        removed=removed,
+        changed=changed,
+        unchanged=unchanged,
+        duplicate_keys=current.duplicate_keys,
+    )
+
+def write_delta_csv(delta: StoplistDelta, csv_path: str) -> str:
+    """
+    Пишет дельту в CSV (UTF-8 BOM): колонка CHANGE и колонки текущего списка.
+
+    Returns:
+        str: SHA256 записанного файла
+    """
+    with HashingCsvWriter(csv_path) as writer:
+        writer.writerow(["CHANGE", *delta.header])
+        for change, rows in ((ADDED, delta.added), (REMOVED, delta.removed), (CHANGED, delta.changed)):
+            for row in rows:
+                writer.writerow([change, *row])
+        return writer.result(rows=writer.rows - 1, columns=len(delta.header) + 1, engine="delta").sha256
+
+def delta_path_for(csv_path: str) -> str:
+    stem, ext = os.path.splitext(csv_path)
+    return f"{stem}_delta{ext}"
+
+# =====================================
+# 3. Сервис дельт
+# =====================================
+
+class StoplistDeltaService:
+    """
+    Строит дельту нового стоп-листа относительно предыдущего списка того же отправителя.
+
+    Предыдущий список - последний обработанный файл отправителя с более
+    ранней датой письма, CSV которого еще лежит в хранилище.
+    """
+
+    def __init__(self, file_repo: IProcessedFileRepository, config: DeltaConfig | None = None):
+        self.file_repo = file_repo
+        self.config = config or DeltaConfig()
+        self.logger = get_logger(__name__)
+
+    @property
+    def upload_delta_only(self) -> bool:
+        return self.config.enabled and self.config.upload_delta_only
+
+    async def build_delta(self, current: ProcessedFile) -> DeltaFile | None:
+        """
+        Сравнивает CSV файла с предыдущим списком и пишет CSV дельты рядом с ним.
+
+        Returns:
+            Optional[DeltaFile]: Дельта или None, если сравнивать не с чем
+        """
+        if not self.config.enabled or not current.csv_path:
+            return None
+
+        previous = await self.file_repo.find_previous_by_sender(current.sender_email, current.email_date)
+        if previous is None or not previous.csv_path or not os.path.exists(previous.csv_path):
+            self.logger.info(f"No previous stoplist for {current.sender_email}, delta skipped")
+            return None
+
+        started = time.perf_counter()
+        try:
+            delta = await asyncio.to_thread(
+                compute_delta,
+                previous.csv_path,
+                current.csv_path,
+                self.config.key_columns,
+                self.config.ignore_columns,
+            )
+        except DeltaError as e:
+            self.logger.warning(f"Cannot compute stoplist delta for {current.file_name}: {e}")
+            return None
+
+        delta_path = delta_path_for(current.csv_path)
+        sha256 = await asyncio.to_thread(write_delta_csv, delta, delta_path)
+
+        summary = {
+            **delta.summary(),
+            "previous_csv": previous.csv_path,
+            "delta_csv": delta_path,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        self.logger.info(
+            f"Stoplist delta for {current.file_name}: +{summary['added']} -{summary['removed']} "
+            f"~{summary['changed']} ({summary['duration_ms']} ms)"
+        )
+        return DeltaFile(path=delta_path, sha256=sha256, summary=summary)
@@ -0,0 +1,191 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import asyncio
+import csv
+import re
+from datetime import datetime
+
+from src.config import LookupConfig
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.patterns.process_shared import ProcessShared
+
+# Позиции строк по ключу: int для единственной строки, кортеж - если строк несколько
+_Positions = int | tuple[int, ...]
+
+_PLATE_NOISE_RE = re.compile(r"[\s\-./]+")
+
+# =====================================
+# 2. Нормализация ключей
+# =====================================
+
+def normalize_plate(value: str) -> str:
+    """Регистрационный номер без пробелов, дефисов и точек, в верхнем регистре ('bg 142-0su' -> 'BG1420SU')."""
+    return _PLATE_NOISE_RE.sub("", value).upper()
+
+def normalize_code(value: str) -> str:
+    """Серийный номер или ID: без пробелов по краям и без дробной части Excel ('364128967.0')."""
+    value = value.strip()
+    return value[:-2] if value.endswith(".0") and value[:-2].isdigit() else value
+
+# =====================================
+# 3. Индекс стоп-листа
+# =====================================
+
+class StoplistIndex:
+    """
+    Неизменяемый индекс одного стоп-листа для поиска в памяти.
+
+    Значения хранятся по колонкам (кортеж на колонку, строка - позиция в
+    кортежах), повторяющиеся значения (KUPAC, STATUS) разделяют один объект
+    строки. Поиск - словарь нормализованный ключ -> позиция строки для
+    регистрационного номера, серийного номера и ID.
+    """
+
+    def __init__(self, columns: dict[str, tuple[str, ...]], keys: dict[str, dict[str, _Positions]], source: str):
+        self.columns = columns
+        self.keys = keys
+        self.source = source
+        self.rows = len(next(iter(columns.values()), ()))
+        self.loaded_at = datetime.now()
+
+    @classmethod
+    def from_csv(cls, csv_path: str, config: LookupConfig | None = None) -> "StoplistIndex":
+        """
+        Строит индекс из CSV стоп-листа.
+
+        Строкой заголовка считается первая строка с колонками серийного номера
+        и регистрационного номера (над таблицей в книге есть название отчета).
+
+        Raises:
+            ValueError: В файле нет нужных колонок
+        """
+        config = config or LookupConfig()
+        key_columns = {
+            "plate": (config.plate_column, normalize_plate),
+            "serial": (config.serial_column, normalize_code),
+            "id": (config.id_column, normalize_code),
+        }
+
+        with open(csv_path, encoding="utf-8-sig", newline="") as csv_file:
+            reader = csv.reader(csv_file)
+            for header in reader:
+                if config.serial_column in header and config.plate_column in header:
+                    break
+            else:
+                raise ValueError(f"Stoplist columns not found in {csv_path}")
+
+            names = [(index, name) for index, name in enumerate(header) if name and name in config.result_columns]
+            values: dict[str, list[str]] = {name: [] for _, name in names}
+            keys: dict[str, dict[str, _Positions]] = {key: {} for key in key_columns}
+            key_indexes = {key: (header.index(column), normalize) for key, (column, normalize) in key_columns.items() if column in header}
+            shared: dict[str, str] = {}
+            position = 0
+
+            for row in reader:
+                if len(row) < len(header):
+                    row.extend([""] * (len(header) - len(row)))
+                if not any(row):
+                    continue
+
+                for index, name in names:
+                    value = row[index]
+                    values[name].append(shared.setdefault(value, value))
+                for key, (index, normalize) in key_indexes.items():
+                    normalized = normalize(row[index])
+                    if normalized:
+                        _add_position(keys[key], normalized, position)
+                position += 1
+
+        columns = {name: tuple(column) for name, column in values.items()}
+        return cls(columns, keys, source=csv_path)
+
+    def lookup(self, plate: str | None = None, serial: str | None = None, id: str | None = None) -> list[dict]:
+        """
+        Ищет строки стоп-листа по любому из ключей.
+
+        Если задано несколько ключей, возвращается объединение совпадений без повторов.
+        """
+        positions: list[int] = []
+        for key, value, normalize in (
+            ("plate", plate, normalize_plate),
+            ("serial", serial, normalize_code),
+            ("id", id, normalize_code),
+        ):
+            if not value:
+                continue
+            found = self.keys[key].get(normalize(value))
+            if found is None:
+                continue
+            for position in (found,) if isinstance(found, int) else found:
+                if position not in positions:
+                    positions.append(position)
+
+        return [self.row(position) for position in positions]
+
+    def row(self, position: int) -> dict:
+        return {name: column[position] for name, column in self.columns.items()}
+
+    def info(self) -> dict:
+        return {"source": self.source, "rows": self.rows, "loaded_at": self.loaded_at.isoformat()}
+
+def _add_position(index: dict[str, _Positions], key: str, position: int) -> None:
+    existing = index.get(key)
+    if existing is None:
+        index[key] = position
+    elif isinstance(existing, int):
+        index[key] = (existing, position)
+    else:
+        index[key] = existing + (position,)
+
+# =====================================
+# 4. Текущий индекс приложения
+# =====================================
+
+class StoplistIndexHolder:
+    """
+    Хранит текущий индекс и атомарно заменяет его новым.
+
+    Новый индекс строится в рабочем потоке целиком, затем одной операцией
+    присваивания становится текущим: запросы видят либо старый, либо новый
+    список, но не частично загруженный.
+    """
+
+    def __init__(self, config: LookupConfig | None = None):
+        self.config = config or LookupConfig()
+        self.current: StoplistIndex | None = None
+        self._email_date: datetime | None = None
+        self._lock = asyncio.Lock()
+        self.logger = get_logger(__name__)
+
+    async def load(self, csv_path: str, email_date: datetime | None = None) -> bool:
+        """
+        Загружает стоп-лист и делает его текущим.
+
+        Если уже загружен список с более поздней датой письма, новый файл игнорируется
+        (файлы конвейера могут завершаться не по порядку).
+
+        Returns:
+            bool: True, если индекс заменен
+        """
+        async with self._lock:
+            if email_date is not None and self._email_date is not None and email_date < self._email_date:
+                self.logger.debug(f"Stoplist {csv_path} is older than the loaded one, index not replaced")
+                return False
+
+            index = await asyncio.to_thread(StoplistIndex.from_csv, csv_path, self.config)
+            self.current = index
+            self._email_date = email_date
+
+        self.logger.info(f"Stoplist index loaded from {csv_path}: {index.rows} rows")
+        return True
+
+# =====================================
+# 5. Общий индекс процесса
+# =====================================
+
+_holders: ProcessShared[StoplistIndexHolder] = ProcessShared()
+
+def get_stoplist_index(config: LookupConfig | None = None) -> StoplistIndexHolder:
+    """Возвращает индекс текущего стоп-листа, общий для API и обработчиков всех циклов."""
+    return _holders.get(lambda: StoplistIndexHolder(config))
@@ -0,0 +1,197 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import os
+from typing import Any
+
+from src.config import NormalizationRules
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.storage.xlsx_converter import (
+    ConversionResult,
+    HashingCsvWriter,
+    SpooledSheet,
+    UnsupportedLayoutError,
+    XlsxSource,
+    pandas_xlsx_to_csv,
+    spool_sheet,
+    write_dataframe_parquet,
+)
+
+logger = get_logger(__name__)
+
+# Числовой код, который Excel/pandas записали как float: '364128967.0'
+_FLOAT_CODE_RE = r"^(\d+)\.0+$"
+# Экспоненциальная запись числа, которую нельзя вернуть к исходной строке без потерь
+_SCIENTIFIC_RE = r"^\d+(?:\.\d+)?[eE][+-]?\d+$"
+# Целое число, записанное строкой без потерь (без ведущих нулей, в пределах int64)
+_INTEGER_RE = r"-?(?:0|[1-9]\d{0,17})"
+
+class NormalizationError(ValueError):
+    """Лист не соответствует ожидаемой схеме стоп-листа (нет строки заголовка)."""
+
+# =====================================
+# 2. Нормализация таблицы
+# =====================================
+
+def normalize_stoplist(frame: Any, rules: NormalizationRules) -> Any:
+    """
+    Приводит лист стоп-листа к таблице с настоящим заголовком.
+
+    Все операции векторные (pandas/NumPy), без цикла по строкам:
+    - строка заголовка - первая, где есть все `rules.header_columns`
+      (над таблицей в книге название отчета и пустые строки);
+    - отбрасываются пустые строки, пустые колонки и `rules.drop_columns`;
+    - регистрационные номера без пробелов по краям, в верхнем регистре;
+    - числовые коды без дробной части float ('364128967.0' -> '364128967').
+
+    Args:
+        frame: DataFrame со всеми значениями-строками (`dtype=str`, пустые - '') и без заголовка
+
+    Raises:
+        NormalizationError: Строка заголовка не найдена
+    """
+    header_hits = frame.isin(rules.header_columns).sum(axis=1).to_numpy()
+    candidates = (header_hits == len(set(rules.header_columns))).nonzero()[0]
+    if not len(candidates):
+        raise NormalizationError(f"Header row with columns {rules.header_columns} not found")
+    header_row = candidates[0]
+
+    header = frame.iloc[header_row].str.strip()
+    table = frame.iloc[header_row + 1:]
+    table.columns = [name or f"Unnamed: {index}" for index, name in enumerate(header)]
+
+    filled = table.ne("").to_numpy()
+    table = table.loc[filled.any(axis=1)]
+    if rules.drop_empty_columns:
+        # Пустые колонки без имени (';;;;' в исходном листе); именованные остаются
+        table = table.loc[:, filled.any(axis=0) | header.ne("").to_numpy()]
+    table = table.drop(columns=[name for name in rules.drop_columns if name in table.columns])
+
+    updates = {}
+    for name in rules.plate_columns:
+        if name in table.columns:
+            updates[name] = table[name].str.strip().str.upper()
+    for name in rules.id_columns:
+        if name in table.columns:
+            codes = table[name].str.strip()
+            if codes.str.match(_SCIENTIFIC_RE).any():
+                raise NormalizationError(f"Column {name} contains numbers in scientific notation")
+            updates[name] = codes.str.replace(_FLOAT_CODE_RE, r"\1", regex=True)
+
+    return table.assign(**updates).reset_index(drop=True)
+
+def read_raw_csv(csv_path: str) -> Any:
+    """Читает CSV конвертера без разбора типов: все значения - строки, пропуски - ''."""
+    import pandas as pd
+
+    return pd.read_csv(
+        csv_path, header=None, dtype=str, keep_default_na=False, encoding="utf-8-sig", skip_blank_lines=False,
+    )
+
+def normalize_csv(
+    raw_csv_path: str,
+    csv_path: str,
+    rules: NormalizationRules,
+    parquet_path: str | None = None,
+    parquet_compression: str = "zstd",
+) -> ConversionResult:
+    """
+    Нормализует CSV конвертера и записывает результат в `csv_path` (и Parquet, если задан).
+
+    Returns:
+        ConversionResult: Размер таблицы, размер и SHA256 нормализованного CSV (и Parquet)
+    """
+    table = normalize_stoplist(read_raw_csv(raw_csv_path), rules)
+    return write_normalized(table, csv_path, rules, parquet_path, parquet_compression)
+
+def write_normalized(
+    table: Any,
+    csv_path: str,
+    rules: NormalizationRules,
+    parquet_path: str | None = None,
+    parquet_compression: str = "zstd",
+) -> ConversionResult:
+    """Записывает нормализованную таблицу в CSV и, если задан `parquet_path`, в Parquet."""
+    with HashingCsvWriter(csv_path) as writer:
+        table.to_csv(writer.stream, index=False)
+        result = writer.result(rows=len(table), columns=len(table.columns), engine="normalized")
+
+    if parquet_path:
+        size, sha256 = write_dataframe_parquet(_restore_integers(table, rules), parquet_path, parquet_compression)
+        result = result._replace(parquet_size=size, parquet_sha256=sha256)
+    return result
+
+def _restore_integers(table: Any, rules: NormalizationRules) -> Any:
+    """
+    Возвращает целочисленным колонкам тип Int64 для Parquet.
+
+    Таблица нормализуется строками, и без этого все колонки Parquet были бы
+    текстом. Регистрационные номера остаются строками, даже если состоят из цифр.
+    """
+    restored = {}
+    for name in table.columns.unique():
+        column = table[name]
+        if name in rules.plate_columns or getattr(column, "ndim", 1) != 1:
+            continue
+        filled = column.ne("")
+        if filled.any() and column[filled].str.fullmatch(_INTEGER_RE).all():
+            # Через строковый тип pandas: целые до 18 знаков без потерь точности float
+            restored[name] = column.where(filled).astype("string").astype("Int64")
+    return table.assign(**restored) if restored else table
+
+# =====================================
+# 3. Нормализация книги
+# =====================================
+
+def read_spooled_sheet(sheet: SpooledSheet) -> Any:
+    """
+    Таблица строк листа из spool конвертера - та же, что `read_raw_csv` для его CSV.
+
+    Значения уже отформатированы так, как их пишет в CSV потоковая
+    конвертация, поэтому промежуточный CSV не нужен.
+    """
+    import pandas as pd
+
+    return pd.DataFrame([sheet.header, *(text for text, _ in sheet.rows())], dtype=str)
+
+def normalize_xlsx(
+    xlsx_path: XlsxSource,
+    csv_path: str,
+    rules: NormalizationRules,
+    parquet_path: str | None = None,
+    parquet_compression: str = "zstd",
+    reader: str = "auto",
+) -> ConversionResult:
+    """
+    Конвертирует и нормализует лист стоп-листа, при неоднозначных данных - через pandas.
+
+    Лист читается во временный файл потоковой конвертации и оттуда сразу
+    в DataFrame строк; нормализация векторная (`normalize_stoplist`). Если
+    потоковая конвертация к листу неприменима, лист конвертируется pandas
+    во временный CSV и нормализуется им же.
+
+    Raises:
+        NormalizationError: Строка заголовка не найдена
+
+    Returns:
+        ConversionResult: Размер таблицы, размер и SHA256 нормализованного CSV (и Parquet)
+    """
+    try:
+        with spool_sheet(xlsx_path, reader, os.path.dirname(os.path.abspath(csv_path))) as sheet:
+            frame, reader_name = read_spooled_sheet(sheet), sheet.reader
+    except UnsupportedLayoutError as e:
+        name = os.path.basename(xlsx_path) if isinstance(xlsx_path, str) else "in-memory workbook"
+        logger.info(f"Streaming conversion not applicable for {name} ({e}), using pandas")
+        if not isinstance(xlsx_path, str):
+            xlsx_path.seek(0)
+    else:
+        table = normalize_stoplist(frame, rules)
+        return write_normalized(table, csv_path, rules, parquet_path, parquet_compression)._replace(reader=reader_name)
+
+    raw_path = os.path.join(os.path.dirname(csv_path), f".{os.path.basename(csv_path)}.raw")
+    try:
+        pandas_xlsx_to_csv(xlsx_path, raw_path)
+        return normalize_csv(raw_path, csv_path, rules, parquet_path, parquet_compression)
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
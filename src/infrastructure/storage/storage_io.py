@@ -0,0 +1,151 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import asyncio
+import os
+import shutil
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from src.config import StorageConfig
+from src.infrastructure.monitoring.metrics import metrics
+from src.infrastructure.patterns.process_shared import ProcessShared
+
+T = TypeVar("T")
+
+# =====================================
+# 2. Долговременная запись (выполняется в потоке пула)
+# =====================================
+
+def fsync_file(path: str) -> None:
+    """Сбрасывает на диск данные файла, записанного другим дескриптором (или другим процессом)."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def fsync_directory(path: str) -> None:
+    """Сбрасывает на диск запись директории: без этого созданный или переименованный файл может пропасть."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        # Директорию нельзя открыть для fsync (например, Windows) - остается только fsync файлов
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def partial_path(path: str) -> str:
+    """Скрытое имя недописанного файла (`.<имя>.part`) рядом с итоговым."""
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.part")
+
+def write_file(path: str, content: bytes, fsync: bool = True) -> None:
+    """Атомарно записывает файл (через временный .part) и при `fsync` дожидается записи на диск."""
+    tmp_path = partial_path(path)
+    with open(tmp_path, "wb") as target:
+        target.write(content)
+        if fsync:
+            target.flush()
+            os.fsync(target.fileno())
+    os.replace(tmp_path, path)
+    if fsync:
+        fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+def move_file(source: str, destination: str, fsync: bool = True) -> None:
+    """Переносит файл; при `fsync` запись о нем в новой директории сбрасывается на диск."""
+    shutil.move(source, destination)
+    if fsync:
+        fsync_directory(os.path.dirname(os.path.abspath(destination)))
+
+def sync_file(path: str) -> None:
+    """fsync готового файла и его директории (по завершении записи конвертером)."""
+    fsync_file(path)
+    fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+# =====================================
+# 3. Пул потоков файловых операций
+# =====================================
+
+_storage_pool: ProcessShared[ThreadPoolExecutor] = ProcessShared()
+# Операции, отправленные в пул и еще не начатые (очередь к хранилищу)
+_queued_operations = 0
+_queue_lock = threading.Lock()
+
+def get_storage_pool(max_workers: int) -> ThreadPoolExecutor:
+    """Возвращает (и при первом вызове создает) пул потоков файловых операций."""
+    return _storage_pool.get(lambda: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage-io"))
+
+def shutdown_storage_pool(wait: bool = True) -> None:
+    """Останавливает пул файловых операций (при завершении приложения)."""
+    for pool in _storage_pool.release():
+        pool.shutdown(wait=wait)
+
+def _track_queue(delta: int) -> None:
+    global _queued_operations
+
+    with _queue_lock:
+        _queued_operations += delta
+        depth = _queued_operations
+    metrics.set_storage_io_queue_depth(depth)
+
+def _untrack_cancelled(future: Future) -> None:
+    """Отмененная до начала операция не выполнится и из очереди сама не уйдет."""
+    if future.cancelled():
+        _track_queue(-1)
+
+class StorageIO:
+    """
+    Файловые операции хранилища вне event loop, в отдельном ограниченном пуле потоков.
+
+    На сетевом хранилище (NFS) makedirs, перенос и запись файла блокируются
+    на десятки и сотни миллисекунд; в event loop это останавливает остальные
+    письма и стадии конвейера. Пул отделен от пула asyncio.to_thread, поэтому
+    медленное хранилище не занимает потоки конвертации, а число одновременных
+    операций с ним ограничено `io_workers`.
+
+    Для каждой операции в метриках отдельно записываются ожидание в очереди
+    пула и время самой операции (storage_io_*), так что задержка хранилища
+    видна отдельно от времени разбора книги (file_convert).
+    """
+
+    def __init__(self, config: StorageConfig | None = None):
+        self.config = config or StorageConfig()
+
+    async def run(self, operation: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Выполняет `func` в пуле файловых операций; `operation` - метка в метриках."""
+        submitted = time.perf_counter()
+
+        def timed() -> T:
+            started = time.perf_counter()
+            _track_queue(-1)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record_storage_io(operation, started - submitted, time.perf_counter() - started)
+
+        _track_queue(1)
+        try:
+            future = get_storage_pool(self.config.io_workers).submit(timed)
+        except BaseException:
+            _track_queue(-1)
+            raise
+        future.add_done_callback(_untrack_cancelled)
+        return await asyncio.wrap_future(future)
+
+    async def write(self, path: str, content: bytes) -> None:
+        await self.run("write", write_file, path, content, fsync=self.config.fsync)
+
+    async def move(self, source: str, destination: str) -> None:
+        await self.run("move", move_file, source, destination, fsync=self.config.fsync)
+
+    async def sync(self, path: str) -> None:
+        """fsync готового файла и директории (если fsync включен в конфигурации)."""
+        if self.config.fsync:
+            await self.run("fsync", sync_file, path)
@@ -0,0 +1,574 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import contextlib
+import csv
+import io
+import os
+import pickle
+import tempfile
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from datetime import datetime, time
+from types import TracebackType
+from typing import IO, Any, NamedTuple
+
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.storage.spool import HashingWriter
+from src.infrastructure.storage.xlsx_readers import READERS, ReaderUnsupportedError, XlsxSource, reader_candidates
+
+logger = get_logger(__name__)
+
+# =====================================
+# 2. Правила совместимости с pandas
+# =====================================
+
+# Строки, которые pandas.read_excel считает пропусками (pandas._libs.parsers.STR_NA_VALUES)
+NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+# Строки, которые парсер pandas может превратить в bool
+_BOOL_STRINGS = frozenset({"true", "false"})
+
+_INT64_LIMIT = 2 ** 63
+
+# Виды значений ячеек после приведения, как в pandas (_convert_cell).
+# _RAW_TEXT - строка, которую pandas может преобразовать в число или bool
+# (например, '0123'); она печатается как есть, только если в колонке есть обычный текст.
+_NA, _INT, _FLOAT, _BOOL, _TEXT, _RAW_TEXT, _DATETIME, _TIME = range(8)
+
+class UnsupportedLayoutError(ValueError):
+    """Лист содержит данные, которые pandas приводит неочевидно; нужна конвертация через pandas."""
+
+class ConversionResult(NamedTuple):
+    """Итог конвертации .xlsx в CSV."""
+    rows: int       # Строк данных (без заголовка)
+    columns: int
+    engine: str     # 'streaming' или 'pandas'
+    size: int       # Размер CSV в байтах
+    sha256: str     # Хеш CSV, посчитанный при записи
+    parquet_size: int | None = None     # Размер Parquet-файла, если он записывался
+    parquet_sha256: str | None = None
+    reader: str | None = None           # Бэкенд чтения книги при потоковой конвертации (xlsx_readers)
+
+# =====================================
+# 3. Приведение значений ячеек
+# =====================================
+
+def _is_blank(cell: Any) -> bool:
+    """Пустая ячейка в смысле pandas (значение None или пустая строка)."""
+    return cell.value is None or cell.value == ""
+
+def _classify(cell: Any) -> tuple[int, Any]:
+    """
+    Приводит значение ячейки так же, как pandas, и определяет его вид.
+
+    Raises:
+        UnsupportedLayoutError: Тип значения не поддерживается потоковой конвертацией
+    """
+    value = cell.value
+    if value is None or cell.data_type == TYPE_ERROR:
+        return _NA, None
+
+    if cell.data_type == TYPE_NUMERIC and not isinstance(value, bool):
+        as_int = int(value)
+        if as_int == value:
+            if abs(as_int) >= _INT64_LIMIT:
+                raise UnsupportedLayoutError(f"Integer {as_int} does not fit into int64")
+            return _INT, as_int
+        return _FLOAT, float(value)
+
+    if isinstance(value, str):
+        if value in NA_STRINGS:
+            return _NA, None
+        if not value.strip() or value.strip().lower() in _BOOL_STRINGS or _looks_numeric(value):
+            return _RAW_TEXT, value
+        return _TEXT, value
+
+    if isinstance(value, bool):
+        return _BOOL, value
+    if isinstance(value, datetime):
+        return _DATETIME, value
+    if isinstance(value, time):
+        return _TIME, value
+
+    raise UnsupportedLayoutError(f"Unsupported cell value type {type(value).__name__}")
+
+def _looks_numeric(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+# =====================================
+# 4. Форматирование колонок
+# =====================================
+
+class _ColumnProfile:
+    """Накопленные при первом проходе сведения о колонке."""
+    __slots__ = ("kinds", "has_na", "midnight_only")
+
+    def __init__(self) -> None:
+        self.kinds: set[int] = set()
+        self.has_na = False
+        self.midnight_only = True
+
+    def add(self, kind: int, value: Any) -> None:
+        if kind == _NA:
+            self.has_na = True
+            return
+        self.kinds.add(kind)
+        if kind == _DATETIME:
+            if value.microsecond:
+                raise UnsupportedLayoutError("Datetime with microseconds")
+            if value.hour or value.minute or value.second:
+                self.midnight_only = False
+
+    def formatter(self) -> Callable[[Any], str]:
+        """Возвращает функцию форматирования значения в том виде, в каком его записал бы pandas."""
+        kinds = self.kinds
+
+        if _TEXT in kinds:
+            # Колонка object: значения печатаются как есть
+            return _format_object
+        if _RAW_TEXT in kinds:
+            raise UnsupportedLayoutError("Column of numeric-like text values")
+        if not kinds:
+            return _format_empty
+        if kinds == {_INT} and not self.has_na:
+            return str
+        if kinds <= {_INT, _FLOAT}:
+            # int с пропусками становится float64
+            return _format_float
+        if kinds == {_BOOL}:
+            # bool с пропусками pandas приводит к float64 (0.0/1.0)
+            return _format_float if self.has_na else str
+        if kinds == {_DATETIME}:
+            return _format_date if self.midnight_only else _format_datetime
+        if kinds == {_TIME}:
+            return str
+
+        raise UnsupportedLayoutError(f"Mixed column without text values: kinds {sorted(kinds)}")
+
+    def arrow_type(self) -> tuple[Any, Callable[[Any], Any]]:
+        """
+        Тип колонки Parquet и приведение значения к нему (вызывать после formatter()).
+
+        Текстовые колонки (KUPAC, STATUS, KATEGORIJA VOZILA) словарно кодируются:
+        тип определяется один раз по профилю, а не при каждом чтении файла.
+        """
+        import pyarrow as pa
+
+        kinds = self.kinds
+        if _TEXT in kinds:
+            return pa.dictionary(pa.int32(), pa.string()), _format_object
+        if not kinds:
+            return pa.string(), _format_empty
+        if kinds == {_INT}:
+            return pa.int64(), _identity
+        if kinds <= {_INT, _FLOAT}:
+            return pa.float64(), float
+        if kinds == {_BOOL}:
+            return pa.bool_(), _identity
+        if kinds == {_DATETIME}:
+            return (pa.date32(), datetime.date) if self.midnight_only else (pa.timestamp("us"), _identity)
+        return pa.time64("us"), _identity
+
+def _identity(value: Any) -> Any:
+    return value
+
+def _format_empty(value: Any) -> str:
+    return ""
+
+def _format_float(value: Any) -> str:
+    return repr(float(value))
+
+def _format_date(value: datetime) -> str:
+    return value.date().isoformat()
+
+def _format_datetime(value: datetime) -> str:
+    return value.isoformat(sep=" ")
+
+def _format_object(value: Any) -> str:
+    return repr(value) if isinstance(value, float) else str(value)
+
+# =====================================
+# 5. Потоковая конвертация
+# =====================================
+
+def _build_header(cells: list[Any], width: int) -> list[str]:
+    header = []
+    for index in range(width):
+        cell = cells[index] if index < len(cells) else None
+        if cell is None or _is_blank(cell):
+            header.append(f"Unnamed: {index}")
+        elif isinstance(cell.value, str):
+            # Заголовок не проходит через распознавание пропусков и чисел
+            header.append(cell.value)
+        elif cell.data_type == TYPE_NUMERIC and _classify(cell)[0] == _INT:
+            header.append(str(int(cell.value)))
+        else:
+            raise UnsupportedLayoutError(f"Unsupported header value {cell.value!r}")
+
+    if len(set(header)) != len(header):
+        raise UnsupportedLayoutError("Duplicate column names")
+    return header
+
+def _profile_sheet(rows: Iterable[Sequence[Any]], spool: IO[bytes]) -> tuple[list[str], list[_ColumnProfile], int]:
+    """
+    Проход по строкам листа: ширина, последняя непустая строка и виды значений колонок.
+
+    Приведенные значения строк данных (None - пропуск) записываются в `spool`
+    по одной строке, чтобы не разбирать XML книги второй раз.
+
+    Returns:
+        Tuple: Заголовок, профили колонок, число строк данных
+    """
+    header_cells: list[Any] | None = None
+    profiles: list[_ColumnProfile] = []
+    width = 0
+    last_row_with_data = -1
+    pending_blank_rows = False
+
+    for row_number, row in enumerate(rows):
+        used = len(row)
+        while used and _is_blank(row[used - 1]):
+            used -= 1
+
+        if header_cells is None:
+            header_cells = list(row[:used])
+            width = used
+            last_row_with_data = 0 if used else -1
+            continue
+
+        if not used:
+            # Пустые строки в конце листа pandas отбрасывает, в середине - сохраняет
+            pending_blank_rows = True
+            pickle.dump((), spool, pickle.HIGHEST_PROTOCOL)
+            continue
+
+        last_row_with_data = row_number
+        width = max(width, used)
+        if pending_blank_rows:
+            for profile in profiles:
+                profile.has_na = True
+            pending_blank_rows = False
+
+        while len(profiles) < used:
+            profile = _ColumnProfile()
+            # Строки выше, где колонка отсутствовала, дополняются пустыми значениями
+            profile.has_na = row_number > 1
+            profiles.append(profile)
+        values = []
+        for index in range(len(profiles)):
+            if index < used:
+                kind, value = _classify(row[index])
+                profiles[index].add(kind, value)
+                values.append(value)
+            else:
+                profiles[index].has_na = True
+        pickle.dump(tuple(values), spool, pickle.HIGHEST_PROTOCOL)
+
+    if last_row_with_data < 0:
+        raise UnsupportedLayoutError("Sheet is empty")
+
+    data_rows = last_row_with_data
+    while len(profiles) < width:
+        profile = _ColumnProfile()
+        profile.has_na = data_rows > 0
+        profiles.append(profile)
+
+    return _build_header(header_cells or [], width), profiles, data_rows
+
+class HashingCsvWriter:
+    """
+    CSV-файл в UTF-8 BOM, который хешируется по мере записи.
+
+    Каждый записанный байт сразу попадает в SHA256 (HashingWriter),
+    поэтому контрольная сумма не требует второго прохода по файлу.
+    `stream` - текстовый поток для писателей вроде `DataFrame.to_csv`.
+    """
+
+    def __init__(self, csv_path: str):
+        self._raw = HashingWriter(open(csv_path, "wb"))
+        self.stream = io.TextIOWrapper(io.BufferedWriter(self._raw), encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self.stream, lineterminator=os.linesep)
+        self.rows = 0
+
+    def __enter__(self) -> "HashingCsvWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def writerow(self, row: list[str]) -> None:
+        self._writer.writerow(row)
+        self.rows += 1
+
+    def close(self) -> None:
+        if not self.stream.closed:
+            self.stream.close()
+
+    def result(self, rows: int, columns: int, engine: str) -> ConversionResult:
+        """Закрывает файл и возвращает итог конвертации с размером и хешем CSV."""
+        self.close()
+        return ConversionResult(rows=rows, columns=columns, engine=engine, size=self._raw.size, sha256=self._raw.sha256)
+
+class HashingParquetWriter:
+    """
+    Parquet-файл, который пишется по группам строк и хешируется по мере записи.
+
+    Строки копятся в списках по колонкам и сбрасываются группой строк
+    каждые `batch_rows` строк, так что в памяти нет всей таблицы.
+    """
+
+    def __init__(self, parquet_path: str, header: list[str], types: list[Any], compression: str = "zstd",
+                 batch_rows: int = 65536):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._types = types
+        self._columns: list[list[Any]] = [[] for _ in header]
+        self._batch_rows = batch_rows
+        self._raw = HashingWriter(open(parquet_path, "wb"))
+        self._schema = pa.schema([pa.field(name, type_) for name, type_ in zip(header, types, strict=True)])
+        self._writer = pq.ParquetWriter(self._raw, self._schema, compression=compression)
+
+    def __enter__(self) -> "HashingParquetWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def writerow(self, row: list[Any]) -> None:
+        for column, value in zip(self._columns, row, strict=True):
+            column.append(value)
+        if len(self._columns[0]) >= self._batch_rows:
+            self._flush()
+
+    def write_table(self, table: Any) -> None:
+        self._writer.write_table(table)
+
+    def _flush(self) -> None:
+        if not self._columns or not self._columns[0]:
+            return
+        arrays = [self._array(values, type_) for values, type_ in zip(self._columns, self._types, strict=True)]
+        self._writer.write_batch(self._pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+        self._columns = [[] for _ in self._columns]
+
+    def _array(self, values: list[Any], type_: Any) -> Any:
+        if self._pa.types.is_dictionary(type_):
+            return self._pa.array(values, type_.value_type).dictionary_encode().cast(type_)
+        return self._pa.array(values, type_)
+
+    def close(self) -> None:
+        if not self._raw.closed:
+            self._flush()
+            self._writer.close()
+            self._raw.close()
+
+    @property
+    def size(self) -> int:
+        return self._raw.size
+
+    @property
+    def sha256(self) -> str:
+        return self._raw.sha256
+
+def _profile_workbook(
+    xlsx_path: XlsxSource, spool: IO[bytes], reader: str
+) -> tuple[str, list[str], list[_ColumnProfile], int]:
+    """
+    Профилирует первый лист первым бэкендом чтения, который принял книгу.
+
+    Returns:
+        Tuple: Имя бэкенда, заголовок, профили колонок, число строк данных
+    """
+    *fallible, reference = reader_candidates(xlsx_path, reader)
+    for name in fallible:
+        try:
+            with READERS[name](xlsx_path) as rows:
+                return (name, *_profile_sheet(rows, spool))
+        except ReaderUnsupportedError as e:
+            logger.debug(f"Reader {name} declined the workbook ({e}), trying the next one")
+            spool.seek(0)
+            spool.truncate()
+
+    # Последний кандидат - openpyxl: книгу он не отклоняет
+    with READERS[reference](xlsx_path) as rows:
+        return (reference, *_profile_sheet(rows, spool))
+
+class SpooledSheet:
+    """
+    Первый лист книги, прочитанный одним проходом во временный файл (см. `spool_sheet`).
+
+    `rows` перечитывает строки данных из временного файла без повторного
+    разбора XML: для каждой строки - значения в том виде, в каком их пишет
+    в CSV потоковая конвертация, и приведенные значения (None - пропуск).
+    """
+
+    def __init__(self, reader: str, header: list[str], profiles: list[_ColumnProfile], data_rows: int, spool: IO[bytes]):
+        self.reader = reader
+        self.header = header
+        self.profiles = profiles
+        self.data_rows = data_rows
+        self.width = len(header)
+        # Лист, который нельзя записать без расхождений с pandas, отклоняется сразу
+        self._formatters = [profile.formatter() for profile in profiles]
+        self._spool = spool
+
+    def rows(self) -> Iterator[tuple[list[str], list[Any]]]:
+        self._spool.seek(0)
+        formatters = self._formatters
+        for _ in range(self.data_rows):
+            values = list(pickle.load(self._spool))
+            values.extend([None] * (self.width - len(values)))
+            yield ["" if value is None else formatters[index](value) for index, value in enumerate(values)], values
+
+    def arrow_columns(self) -> list[tuple[Any, Callable[[Any], Any]]]:
+        """Типы колонок Parquet и приведение значений к ним по профилю всего листа."""
+        return [profile.arrow_type() for profile in self.profiles]
+
+@contextlib.contextmanager
+def spool_sheet(xlsx_path: XlsxSource, reader: str = "auto", directory: str | None = None) -> Iterator[SpooledSheet]:
+    """
+    Читает первый лист бэкендом `reader` во временный файл в `directory`.
+
+    Raises:
+        UnsupportedLayoutError: Лист нельзя сконвертировать потоково без расхождений с pandas
+    """
+    with tempfile.TemporaryFile(dir=directory) as spool:
+        yield SpooledSheet(*_profile_workbook(xlsx_path, spool, reader), spool)
+
+def stream_xlsx_to_csv(
+    xlsx_path: XlsxSource,
+    csv_path: str,
+    parquet_path: str | None = None,
+    parquet_compression: str = "zstd",
+    reader: str = "auto",
+) -> ConversionResult:
+    """
+    Конвертирует первый лист .xlsx в CSV (UTF-8 BOM) с постоянным потреблением памяти.
+
+    Книга читается один раз бэкендом `reader` (xlsx_readers: calamine, xml,
+    openpyxl; "auto" - самый быстрый подходящий): при чтении определяются
+    типы колонок (как их определил бы pandas), а приведенные строки
+    сохраняются во временный файл; затем CSV пишется построчно из него.
+    Результат побайтно совпадает с
+    `pd.read_excel(xlsx_path, engine='openpyxl').to_csv(csv_path, index=False, encoding='utf-8-sig')`
+    при любом бэкенде.
+
+    Если задан `parquet_path`, в том же проходе пишется типизированный Parquet
+    с типами колонок из того же профиля.
+
+    Raises:
+        UnsupportedLayoutError: Лист нельзя сконвертировать без расхождений с pandas
+    """
+    with spool_sheet(xlsx_path, reader, os.path.dirname(os.path.abspath(csv_path))) as sheet:
+        with contextlib.ExitStack() as stack:
+            writer = stack.enter_context(HashingCsvWriter(csv_path))
+            parquet = None
+            if parquet_path:
+                arrow_columns = sheet.arrow_columns()
+                parquet = stack.enter_context(HashingParquetWriter(
+                    parquet_path, sheet.header, [type_ for type_, _ in arrow_columns], parquet_compression,
+                ))
+                converters = [convert for _, convert in arrow_columns]
+
+            writer.writerow(sheet.header)
+
+            for text, values in sheet.rows():
+                writer.writerow(text)
+                if parquet is not None:
+                    parquet.writerow([None if value is None else converters[index](value) for index, value in enumerate(values)])
+
+            result = writer.result(rows=writer.rows - 1, columns=sheet.width, engine="streaming")._replace(reader=sheet.reader)
+            if parquet is not None:
+                parquet.close()
+                result = result._replace(parquet_size=parquet.size, parquet_sha256=parquet.sha256)
+            return result
+
+def pandas_xlsx_to_csv(
+    xlsx_path: XlsxSource, csv_path: str, parquet_path: str | None = None, parquet_compression: str = "zstd"
+) -> ConversionResult:
+    """Конвертация через pandas DataFrame (весь лист в памяти); Parquet пишется из того же DataFrame."""
+    import pandas as pd
+
+    df = pd.read_excel(xlsx_path, engine='openpyxl')
+    with HashingCsvWriter(csv_path) as writer:
+        df.to_csv(writer.stream, index=False)
+        result = writer.result(rows=len(df), columns=len(df.columns), engine="pandas")
+
+    if parquet_path:
+        size, sha256 = write_dataframe_parquet(df, parquet_path, parquet_compression)
+        result = result._replace(parquet_size=size, parquet_sha256=sha256)
+
+    return result
+
+def write_dataframe_parquet(df: Any, parquet_path: str, compression: str = "zstd") -> tuple[int, str]:
+    """
+    Записывает DataFrame в Parquet; текстовые колонки словарно кодируются.
+
+    Returns:
+        Tuple: Размер и SHA256 Parquet-файла
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    arrays, fields = [], []
+    for name in df.columns:
+        column = df[name]
+        if column.dtype == object or pd.api.types.is_string_dtype(column.dtype):
+            # Колонка object: как в CSV, но пропуски остаются null
+            values = [None if pd.isna(value) else _format_object(value) for value in column]
+            array = pa.array(values, pa.string()).dictionary_encode().cast(pa.dictionary(pa.int32(), pa.string()))
+        else:
+            array = pa.Array.from_pandas(column)
+        arrays.append(array)
+        fields.append(pa.field(str(name), array.type))
+
+    with HashingParquetWriter(parquet_path, [f.name for f in fields], [f.type for f in fields], compression) as parquet:
+        parquet.write_table(pa.Table.from_arrays(arrays, schema=pa.schema(fields)))
+    return parquet.size, parquet.sha256
+
+def convert_xlsx_to_csv(
+    xlsx_path: XlsxSource,
+    csv_path: str,
+    parquet_path: str | None = None,
+    parquet_compression: str = "zstd",
+    reader: str = "auto",
+) -> ConversionResult:
+    """
+    Конвертирует .xlsx в CSV потоково, при неоднозначных данных - через pandas.
+
+    `xlsx_path` может быть открытым файлом с произвольным доступом (BytesIO):
+    тогда книга разбирается без чтения с диска. Если задан `parquet_path`,
+    рядом с CSV в том же проходе пишется Parquet (нужен pyarrow).
+    `reader` - бэкенд чтения для потоковой конвертации (см. xlsx_readers).
+
+    Returns:
+        ConversionResult: Размер таблицы, использованный движок, размер и SHA256 CSV (и Parquet)
+    """
+    try:
+        return stream_xlsx_to_csv(xlsx_path, csv_path, parquet_path, parquet_compression, reader)
+    except UnsupportedLayoutError as e:
+        name = os.path.basename(xlsx_path) if isinstance(xlsx_path, str) else "in-memory workbook"
+        logger.info(f"Streaming conversion not applicable for {name} ({e}), using pandas")
+        if not isinstance(xlsx_path, str):
+            xlsx_path.seek(0)
+        return pandas_xlsx_to_csv(xlsx_path, csv_path, parquet_path, parquet_compression)
@@ -0,0 +1,364 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import contextlib
+import io
+import os
+import re
+import zipfile
+from collections.abc import Callable, Iterator, Sequence
+from typing import Any, BinaryIO, NamedTuple
+
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_BOOL, TYPE_ERROR, TYPE_NUMERIC, TYPE_STRING
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.styles.stylesheet import Stylesheet, apply_stylesheet
+from openpyxl.utils.cell import coordinate_to_tuple
+from openpyxl.utils.datetime import from_excel, from_ISO8601
+from openpyxl.xml.constants import ARC_STYLE, SHARED_STRINGS, SHEET_MAIN_NS
+from openpyxl.xml.functions import fromstring, iterparse
+
+from src.infrastructure.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    # Внутренняя функция openpyxl (проверено на 3.1): без нее xml-бэкенд отключается
+    from openpyxl.worksheet._reader import _cast_number
+except ImportError:
+    _cast_number = None
+
+# Путь к .xlsx или уже открытый файл (например, BytesIO с содержимым вложения)
+XlsxSource = str | BinaryIO
+
+# Порядок автоматического выбора; openpyxl - эталон, он всегда последний
+READER_ORDER = ("calamine", "xml", "openpyxl")
+
+# calamine держит весь лист в памяти (~25x размера .xlsx); книги больше читаются потоково
+CALAMINE_MAX_BYTES = 16 * 1024 * 1024
+
+_ROW_TAG = f"{{{SHEET_MAIN_NS}}}row"
+_VALUE_TAG = f"{{{SHEET_MAIN_NS}}}v"
+_INLINE_STRING_TAG = f"{{{SHEET_MAIN_NS}}}is"
+_SHARED_STRING_TAG = f"{{{SHEET_MAIN_NS}}}si"
+
+# Целые числа до 2**53 float хранит точно; openpyxl разбирает большие целые из текста без потерь
+_FLOAT_EXACT_LIMIT = 2 ** 53
+
+# Текст, который calamine читает иначе, чем openpyxl: экранированные символы (_x000D_)
+# и пробелы по краям текста (calamine их обрезает, если нет xml:space="preserve").
+# Поиск подстрок в разы быстрее одного регулярного выражения на весь XML листа.
+_ESCAPED_CHAR = re.compile(rb"_x[0-9A-Fa-f]{4}_")
+_EDGE_WHITESPACE = tuple(
+    marker for space in (b" ", b"\t", b"\n", b"\r") for marker in (b"<t>" + space, space + b"</t>")
+)
+_PREFIXED_EDGE_WHITESPACE = re.compile(rb"<\w+:t>\s|\s</\w+:t>")
+
+class SheetCell(NamedTuple):
+    """Значение ячейки и ее тип в обозначениях openpyxl ('n', 's', 'b', 'd', 'e')."""
+    value: Any
+    data_type: str
+
+EMPTY_CELL = SheetCell(None, TYPE_NUMERIC)
+
+class ReaderUnsupportedError(ValueError):
+    """Бэкенд не прочитает книгу так же, как openpyxl; нужен следующий бэкенд."""
+
+# =====================================
+# 2. Бэкенды чтения
+# =====================================
+# Каждый бэкенд - контекстный менеджер, который отдает строки первого листа
+# кортежами ячеек с атрибутами value и data_type, как строки openpyxl
+# в режиме read_only после reset_dimensions(): с первой строки и первой колонки,
+# пропущенные строки - пустые кортежи, ширина строки - до ее последней ячейки.
+
+def _rewind(source: XlsxSource) -> XlsxSource:
+    if not isinstance(source, str):
+        source.seek(0)
+    return source
+
+@contextlib.contextmanager
+def openpyxl_rows(source: XlsxSource) -> Iterator[Iterator[Sequence[Any]]]:
+    """Эталон: openpyxl read_only, по ячейке-объекту на значение."""
+    workbook = load_workbook(_rewind(source), read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        # Как и pandas: размеры листа из файла ненадежны, строки читаются как есть
+        sheet.reset_dimensions()
+        yield iter(sheet.rows)
+    finally:
+        workbook.close()
+
+@contextlib.contextmanager
+def xml_rows(source: XlsxSource) -> Iterator[Iterator[Sequence[Any]]]:
+    """
+    Разбор XML листа через iterparse без объектов ячеек openpyxl.
+
+    Структура книги (первый лист, форматы дат, эпоха) читается openpyxl, а общие
+    строки и строки листа разбираются напрямую по тем же правилам: числа и даты
+    приводятся функциями openpyxl (_cast_number, from_excel), текст собирается
+    как Text.content. Результат совпадает с openpyxl_rows.
+    """
+    excel_reader = ExcelReader(_rewind(source), read_only=True, data_only=True, keep_links=False)
+    try:
+        excel_reader.read_manifest()
+        excel_reader.read_workbook()
+        workbook = excel_reader.wb
+        apply_stylesheet(excel_reader.archive, workbook)
+
+        # Листы не создаются: ReadOnlyWorksheet ищет размеры листа, а без <dimension> это полный разбор XML
+        sheet_path = next((
+            rel.target for _, rel in excel_reader.parser.find_sheets()
+            if rel.target in excel_reader.valid_files and "chartsheet" not in rel.Type
+        ), None)
+        if sheet_path is None:
+            raise ReaderUnsupportedError("Workbook has no worksheets")
+
+        shared_strings: list[str] = []
+        strings_part = excel_reader.package.find(SHARED_STRINGS)
+        if strings_part is not None:
+            with excel_reader.archive.open(strings_part.PartName[1:]) as strings_xml:
+                shared_strings = _read_shared_strings(strings_xml)
+
+        # Форматы дат - внутренние атрибуты Workbook; в другой версии openpyxl книгу читает следующий бэкенд
+        date_formats = getattr(workbook, "_date_formats", None)
+        timedelta_formats = getattr(workbook, "_timedelta_formats", None)
+        if date_formats is None or timedelta_formats is None:
+            raise ReaderUnsupportedError("openpyxl Workbook has no _date_formats/_timedelta_formats")
+
+        with excel_reader.archive.open(sheet_path) as sheet_xml:
+            yield _parse_sheet_xml(sheet_xml, shared_strings, workbook.epoch, date_formats, timedelta_formats)
+    finally:
+        excel_reader.archive.close()
+
+def _read_shared_strings(strings_xml: BinaryIO) -> list[str]:
+    """То же, что openpyxl.reader.strings.read_string_table."""
+    strings = []
+    for _, node in iterparse(strings_xml):
+        if node.tag == _SHARED_STRING_TAG:
+            strings.append(_text_content(node).replace("x005F_", ""))
+            node.clear()
+    return strings
+
+def _text_content(node: Any) -> str:
+    """Текст элемента строки (si, is) без форматирования, как Text.from_tree(node).content."""
+    plain, runs = None, []
+    for child in node:
+        tag = child.tag.rpartition("}")[2]
+        if tag == "t":
+            plain = child.text
+        elif tag == "r":
+            run = None
+            for part in child:
+                if part.tag.rpartition("}")[2] == "t":
+                    run = part.text
+            if run is not None:
+                runs.append(run)
+    return "".join(runs) if plain is None else plain + "".join(runs)
+
+def _parse_sheet_xml(
+    sheet_xml: BinaryIO, shared_strings: list[str], epoch: Any, date_formats: set, timedelta_formats: set,
+) -> Iterator[Sequence[Any]]:
+    """Строки листа; повторяет WorkSheetParser.parse_row/parse_cell и ReadOnlyWorksheet._get_row."""
+    columns: dict[str, int] = {}
+    row_counter = 0
+    expected_row = 1
+
+    for _, element in iterparse(sheet_xml):
+        if element.tag != _ROW_TAG:
+            continue
+
+        number = element.get("r")
+        if number is None:
+            row_counter += 1
+        else:
+            try:
+                row_counter = int(number)
+            except ValueError:
+                as_float = float(number)
+                if not as_float.is_integer():
+                    raise ValueError(f"{number} is not a valid row number") from None
+                row_counter = int(as_float)
+
+        cells = []
+        column = 0
+        for cell in element:
+            data_type = cell.get("t", TYPE_NUMERIC)
+            coordinate = cell.get("r")
+            if coordinate:
+                letters = coordinate.rstrip("0123456789")
+                column = columns.get(letters) or columns.setdefault(letters, coordinate_to_tuple(coordinate)[1])
+            else:
+                column += 1
+
+            value = None if data_type == "inlineStr" else (cell.findtext(_VALUE_TAG) or None)
+            if value is not None:
+                if data_type == TYPE_NUMERIC:
+                    value = _cast_number(value)
+                    style_id = cell.get("s")
+                    if date_formats and style_id and int(style_id) in date_formats:
+                        data_type = "d"
+                        try:
+                            value = from_excel(value, epoch, timedelta=int(style_id) in timedelta_formats)
+                        except (OverflowError, ValueError):
+                            data_type, value = TYPE_ERROR, "#VALUE!"
+                elif data_type == TYPE_STRING:
+                    value = shared_strings[int(value)]
+                elif data_type == TYPE_BOOL:
+                    value = bool(int(value))
+                elif data_type == "str":
+                    data_type = TYPE_STRING
+                elif data_type == "d":
+                    value = from_ISO8601(value)
+            elif data_type == "inlineStr":
+                child = cell.find(_INLINE_STRING_TAG)
+                if child is not None:
+                    data_type, value = TYPE_STRING, _text_content(child)
+            cells.append((column, SheetCell(value, data_type)))
+        element.clear()
+
+        # Пропущенные в файле строки - пустые; повторные и идущие не по порядку отбрасываются
+        while expected_row < row_counter:
+            expected_row += 1
+            yield ()
+        if expected_row > row_counter:
+            continue
+        expected_row += 1
+
+        if not cells:
+            yield ()
+            continue
+        width = cells[-1][0]
+        row = [EMPTY_CELL] * width
+        for column, sheet_cell in cells:
+            if 1 <= column <= width:
+                row[column - 1] = sheet_cell
+        yield tuple(row)
+
+@contextlib.contextmanager
+def calamine_rows(source: XlsxSource) -> Iterator[Iterator[Sequence[Any]]]:
+    """
+    Чтение через python-calamine (Rust): лист разбирается целиком вне интерпретатора.
+
+    calamine приводит значения по правилам Excel, а не openpyxl, поэтому книги,
+    где правила расходятся, отклоняются (ReaderUnsupportedError): с форматами
+    дат и времени, с экранированными символами и пробелами без xml:space
+    в тексте, с целыми числами за пределами точности float.
+    """
+    from python_calamine import SheetTypeEnum
+    from python_calamine import load_workbook as load_calamine_workbook
+
+    _check_calamine_compatible(_rewind(source))
+
+    workbook = load_calamine_workbook(_rewind(source))
+    try:
+        metadata = next((sheet for sheet in workbook.sheets_metadata if sheet.typ == SheetTypeEnum.WorkSheet), None)
+        if metadata is None:
+            raise ReaderUnsupportedError("Workbook has no worksheets")
+        sheet = workbook.get_sheet_by_name(metadata.name)
+        yield _calamine_sheet_rows(sheet)
+    finally:
+        workbook.close()
+
+def _check_calamine_compatible(source: XlsxSource) -> None:
+    with zipfile.ZipFile(source) as archive:
+        names = archive.namelist()
+        if ARC_STYLE in names:
+            stylesheet = Stylesheet.from_tree(fromstring(archive.read(ARC_STYLE)))
+            if stylesheet.date_formats or stylesheet.timedelta_formats:
+                raise ReaderUnsupportedError("Workbook has date or time number formats")
+
+        for name in names:
+            lowered = name.lower()
+            if not lowered.endswith(".xml") or not ("/worksheets/" in lowered or lowered.endswith("sharedstrings.xml")):
+                continue
+            with archive.open(name) as part:
+                # Куски перекрываются, чтобы не пропустить совпадение на границе
+                tail = b""
+                for chunk in iter(lambda: part.read(4 * 1024 * 1024), b""):
+                    if not _calamine_reads_text_as_is(tail + chunk):
+                        raise ReaderUnsupportedError(f"Text in {name} is decoded differently by calamine")
+                    tail = chunk[-32:]
+
+def _calamine_reads_text_as_is(xml: bytes) -> bool:
+    if any(marker in xml for marker in _EDGE_WHITESPACE) or _ESCAPED_CHAR.search(xml):
+        return False
+    return b":t>" not in xml or not _PREFIXED_EDGE_WHITESPACE.search(xml)
+
+def _calamine_sheet_rows(sheet: Any) -> Iterator[Sequence[Any]]:
+    first_row, first_column = sheet.start if sheet.start is not None else (0, 0)
+    for _ in range(first_row):
+        yield ()
+    padding = [EMPTY_CELL] * first_column
+
+    for values in sheet.iter_rows():
+        row = list(padding)
+        for value in values:
+            if isinstance(value, str):
+                # Пустые ячейки и ошибки (#DIV/0!) calamine отдает пустой строкой
+                row.append(SheetCell(value, TYPE_STRING) if value else EMPTY_CELL)
+            elif isinstance(value, bool):
+                row.append(SheetCell(value, TYPE_BOOL))
+            elif isinstance(value, (int, float)):
+                if isinstance(value, float) and abs(value) >= _FLOAT_EXACT_LIMIT and value.is_integer():
+                    raise ReaderUnsupportedError(f"Integer {value!r} exceeds float precision")
+                row.append(SheetCell(value, TYPE_NUMERIC))
+            else:
+                raise ReaderUnsupportedError(f"Unsupported calamine value type {type(value).__name__}")
+        yield tuple(row)
+
+READERS: dict[str, Callable[[XlsxSource], contextlib.AbstractContextManager[Iterator[Sequence[Any]]]]] = {
+    "openpyxl": openpyxl_rows,
+    "xml": xml_rows,
+    "calamine": calamine_rows,
+}
+
+# =====================================
+# 3. Выбор бэкенда
+# =====================================
+
+def calamine_available() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def xml_available() -> bool:
+    """xml-бэкенд приводит числа внутренней функцией openpyxl; есть ли она в установленной версии."""
+    return _cast_number is not None
+
+def _source_size(source: XlsxSource) -> int:
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer().nbytes
+    position = source.seek(0, io.SEEK_END)
+    source.seek(0)
+    return position
+
+def reader_candidates(source: XlsxSource, reader: str = "auto") -> list[str]:
+    """
+    Бэкенды в порядке попыток для книги `source`.
+
+    "auto": calamine, если установлен и книга не больше CALAMINE_MAX_BYTES,
+    затем xml, если его поддерживает установленный openpyxl (xml_available).
+    Явно заданный бэкенд идет первым. openpyxl всегда в конце: если бэкенд
+    отклонил книгу (ReaderUnsupportedError), она читается следующим.
+    """
+    if reader == "auto":
+        preferred = ["xml"] if xml_available() else []
+        if calamine_available() and _source_size(source) <= CALAMINE_MAX_BYTES:
+            preferred.insert(0, "calamine")
+    elif reader not in READERS:
+        raise ValueError(f"Unknown xlsx reader {reader!r}, expected one of {sorted(READERS)} or 'auto'")
+    elif reader == "calamine" and not calamine_available():
+        logger.warning("python-calamine is not installed, falling back to openpyxl reader")
+        preferred = []
+    elif reader == "xml" and not xml_available():
+        logger.warning("Installed openpyxl has no _cast_number, falling back to openpyxl reader")
+        preferred = []
+    else:
+        preferred = [reader]
+
+    return [name for name in READER_ORDER if name in preferred] + ([] if "openpyxl" in preferred else ["openpyxl"])
@@ -2,6 +2,7 @@
 # 1. Импорт библиотек
 # =====================================
 import os
+import hashlib
 import pytest
 import asyncssh
 import pandas as pd
@@ -53,16 +54,20 @@ class TestFullFlow:
 
         # Создаем фейковый email и вложение
         fake_xlsx_content = pd.DataFrame({'col1': [10, 20], 'col2': ['C', 'D']})
-        excel_bytes_io = pd.io.common.BytesIO()
-        with pd.ExcelWriter(excel_bytes_io, engine='openpyxl') as writer:
-            fake_xlsx_content.to_excel(writer, index=False, sheet_name='Sheet1')
-        excel_bytes = excel_bytes_io.getvalue()
+        xlsx_path = tmp_path / "integration_report.xlsx"
+        fake_xlsx_content.to_excel(xlsx_path, index=False, sheet_name='Sheet1', engine='openpyxl')
+        excel_bytes = xlsx_path.read_bytes()
 
         fake_email = RawEmail(
             message_id="integration-test-123",
             sender="integration@test.com",
             date=datetime.now(),
-            attachments=[EmailAttachment(filename="integration_report.xlsx", content=excel_bytes)]
+            attachments=[EmailAttachment(
+                filename="integration_report.xlsx",
+                path=str(xlsx_path),
+                size=len(excel_bytes),
+                sha256=hashlib.sha256(excel_bytes).hexdigest(),
+            )]
         )
 
         # --- 2. Действие: Обработка и загрузка ---
@@ -0,0 +1,62 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import pytest
+
+from src.infrastructure.email.bodystructure import (
+    BodyStructureError,
+    find_xlsx_parts,
+    iter_leaf_parts,
+    parse_fetch_response,
+)
+
+# =====================================
+# 2. Тесты
+# =====================================
+
+# multipart/mixed: (multipart/alternative: text + html), pdf, xlsx с именем по RFC 2231
+NESTED_RESPONSE = [
+    (
+        b'1 (UID 42 BODYSTRUCTURE ((("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 10 1 NIL NIL NIL NIL)'
+        b'("text" "html" ("charset" "utf-8") NIL NIL "7bit" 20 1 NIL NIL NIL NIL) "alternative" ("boundary" "a") NIL NIL NIL)'
+        b'("application" "pdf" ("name" "scan.pdf") NIL NIL "base64" 90000 NIL ("attachment" ("filename" "scan.pdf")) NIL NIL)'
+        b'("application" "vnd.openxmlformats-officedocument.spreadsheetml.sheet" NIL NIL NIL "base64" 1200 NIL'
+        b' ("attachment" ("filename*" {29}',
+        b"utf-8''lista%2029%2007%202025.xlsx",
+    ),
+    b')) NIL NIL) "mixed" ("boundary" "m") NIL NIL NIL))',
+]
+
+class TestBodyStructure:
+
+    def test_parses_nested_multipart_part_numbers(self):
+        """Проверяет нумерацию частей во вложенном multipart."""
+        item = parse_fetch_response(NESTED_RESPONSE)["42"]
+        parts = iter_leaf_parts(item["BODYSTRUCTURE"])
+
+        assert [part.part_id for part in parts] == ["1.1", "1.2", "2", "3"]
+        assert parts[1].content_type == "text/html"
+        assert parts[2].filename == "scan.pdf"
+        assert parts[2].size == 90000
+
+    def test_finds_only_xlsx_parts_with_rfc2231_filename(self):
+        """Проверяет, что выбирается только .xlsx часть, а имя из литерала декодируется."""
+        item = parse_fetch_response(NESTED_RESPONSE)["42"]
+        xlsx_parts = find_xlsx_parts(item["BODYSTRUCTURE"])
+
+        assert len(xlsx_parts) == 1
+        assert xlsx_parts[0].part_id == "3"
+        assert xlsx_parts[0].filename == "lista 29 07 2025.xlsx"
+        assert xlsx_parts[0].encoding == "base64"
+
+    def test_single_part_message_is_part_one(self):
+        """Проверяет, что у письма без multipart единственная часть имеет номер 1."""
+        data = [b'7 (UID 3 BODYSTRUCTURE ("application" "octet-stream" ("name" "=?utf-8?B?0YHQv9C40YHQvtC6Lnhsc3g=?=") NIL NIL "base64" 16 NIL NIL NIL NIL))']
+        parts = find_xlsx_parts(parse_fetch_response(data)["3"]["BODYSTRUCTURE"])
+
+        assert [(part.part_id, part.filename) for part in parts] == [("1", "список.xlsx")]
+
+    def test_rejects_malformed_bodystructure(self):
+        """Проверяет, что некорректная структура приводит к BodyStructureError."""
+        with pytest.raises(BodyStructureError):
+            iter_leaf_parts(parse_fetch_response([b'1 (UID 1 BODYSTRUCTURE NIL)'])["1"]["BODYSTRUCTURE"])
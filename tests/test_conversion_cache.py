@@ -0,0 +1,148 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import builtins
+import hashlib
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.domain.models import ConversionCacheEntry
+from src.domain.repositories import IConversionCacheRepository
+from src.domain.services import EmailAttachment, RawEmail
+from src.infrastructure.storage import file_processor
+from src.infrastructure.storage.conversion_cache import ConversionCache
+from src.infrastructure.storage.file_processor import FileProcessingService
+from src.infrastructure.storage.xlsx_converter import ConversionResult
+
+# =====================================
+# 2. Фейковый репозиторий
+# =====================================
+
+class InMemoryConversionCacheRepository(IConversionCacheRepository):
+    """Репозиторий кеша в памяти с той же семантикой, что и SQL-реализация."""
+
+    def __init__(self):
+        self.entries: dict[str, ConversionCacheEntry] = {}
+
+    async def add(self, data: ConversionCacheEntry) -> ConversionCacheEntry:
+        return await self.save(data)
+
+    async def get(self, id) -> ConversionCacheEntry | None:
+        return next((entry for entry in self.entries.values() if entry.id == id), None)
+
+    async def list(self) -> list[ConversionCacheEntry]:
+        return list(self.entries.values())
+
+    async def find_by_xlsx_hash(self, xlsx_hash: str) -> ConversionCacheEntry | None:
+        return self.entries.get(xlsx_hash)
+
+    async def save(self, entry: ConversionCacheEntry) -> ConversionCacheEntry:
+        self.entries[entry.xlsx_hash] = entry
+        return entry
+
+    async def touch(self, xlsx_hash: str, used_at: datetime) -> None:
+        entry = self.entries[xlsx_hash]
+        self.entries[xlsx_hash] = entry.model_copy(update={"last_used_at": used_at, "hits": entry.hits + 1})
+
+    async def total_size(self) -> int:
+        return sum(entry.csv_size for entry in self.entries.values())
+
+    async def least_recently_used(self, limit: int) -> builtins.list[ConversionCacheEntry]:
+        return sorted(self.entries.values(), key=lambda entry: entry.last_used_at)[:limit]
+
+    async def delete_by_xlsx_hashes(self, xlsx_hashes: Iterable[str]) -> None:
+        for xlsx_hash in list(xlsx_hashes):
+            self.entries.pop(xlsx_hash, None)
+
+# =====================================
+# 3. Вспомогательные функции
+# =====================================
+
+def _write_csv(path: Path, content: bytes) -> ConversionResult:
+    path.write_bytes(content)
+    return ConversionResult(
+        rows=1, columns=1, engine="streaming", size=len(content), sha256=hashlib.sha256(content).hexdigest(),
+    )
+
+# =====================================
+# 4. Тесты
+# =====================================
+
+@pytest.mark.asyncio
+class TestConversionCache:
+
+    async def test_store_then_fetch(self, tmp_path: Path):
+        """Проверяет, что сохраненный CSV выдается по SHA256 .xlsx без конвертации."""
+        repo = InMemoryConversionCacheRepository()
+        cache = ConversionCache(repo, directory=str(tmp_path / "cas"))
+        result = _write_csv(tmp_path / "first.csv", b"col1\r\n1\r\n")
+
+        await cache.store("ab" * 32, str(tmp_path / "first.csv"), result)
+        cached = await cache.fetch("ab" * 32, str(tmp_path / "second.csv"))
+
+        assert cached == result._replace(engine="cache")
+        assert (tmp_path / "second.csv").read_bytes() == b"col1\r\n1\r\n"
+        assert Path(cache.artifact_path("ab" * 32)).exists()
+        assert repo.entries["ab" * 32].hits == 1
+        assert await cache.fetch("cd" * 32, str(tmp_path / "third.csv")) is None
+
+    async def test_missing_artifact_drops_entry(self, tmp_path: Path):
+        """Проверяет, что запись без файла в директории кеша считается промахом и удаляется."""
+        repo = InMemoryConversionCacheRepository()
+        cache = ConversionCache(repo, directory=str(tmp_path / "cas"))
+        await cache.store("ab" * 32, str(tmp_path / "first.csv"), _write_csv(tmp_path / "first.csv", b"x"))
+        Path(cache.artifact_path("ab" * 32)).unlink()
+
+        assert await cache.fetch("ab" * 32, str(tmp_path / "second.csv")) is None
+        assert repo.entries == {}
+
+    async def test_evicts_least_recently_used(self, tmp_path: Path):
+        """Проверяет LRU-вытеснение при превышении размера кеша."""
+        repo = InMemoryConversionCacheRepository()
+        cache = ConversionCache(repo, directory=str(tmp_path / "cas"), max_bytes=25)
+
+        for index, xlsx_hash in enumerate(["aa" * 32, "bb" * 32]):
+            csv_path = tmp_path / f"{index}.csv"
+            await cache.store(xlsx_hash, str(csv_path), _write_csv(csv_path, b"x" * 10))
+        # Первая запись использована позже второй
+        await repo.touch("aa" * 32, datetime.now() + timedelta(minutes=1))
+
+        await cache.store("cc" * 32, str(tmp_path / "2.csv"), _write_csv(tmp_path / "2.csv", b"x" * 10))
+
+        assert set(repo.entries) == {"aa" * 32, "cc" * 32}
+        assert not Path(cache.artifact_path("bb" * 32)).exists()
+
+    async def test_resent_workbook_is_not_converted_again(self, tmp_path: Path, monkeypatch):
+        """Проверяет, что повторно присланная книга берется из кеша."""
+        cache = ConversionCache(InMemoryConversionCacheRepository(), directory=str(tmp_path / "cas"))
+        service = FileProcessingService(base_storage_path=str(tmp_path), conversion_cache=cache)
+        source = tmp_path / "source.xlsx"
+        pd.DataFrame({'col1': [1, 2]}).to_excel(source, index=False, engine='openpyxl')
+        content = source.read_bytes()
+
+        def email(message_id: str) -> RawEmail:
+            # Резерв имени, который оставляет сервис чтения почты для вложения в памяти
+            (tmp_path / f".{message_id}.xlsx.part").touch()
+            return RawEmail(
+                message_id=message_id, sender="test@sender.com", date=datetime(2023, 1, 15),
+                attachments=[EmailAttachment(
+                    filename=f"{message_id}.xlsx", path=str(tmp_path / f"{message_id}.xlsx"), size=len(content),
+                    sha256=hashlib.sha256(content).hexdigest(), content=content,
+                )],
+            )
+
+        first = await service.save_and_convert(email("uid-1"))
+
+        def fail_convert(*args):
+            raise AssertionError("cached workbook must not be converted")
+        monkeypatch.setattr(file_processor, "convert_file", fail_convert)
+        second = await service.save_and_convert(email("uid-2"))
+
+        assert len(second) == 1
+        assert second[0]['file_hash'] == first[0]['file_hash']
+        assert Path(second[0]['csv_path']).read_bytes() == Path(first[0]['csv_path']).read_bytes()
+        assert Path(second[0]['file_path']).read_bytes() == content
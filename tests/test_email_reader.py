@@ -1,6 +1,12 @@
 # =====================================
 # 1. Импорт библиотек
 # =====================================
+import asyncio
+import base64
+import hashlib
+import os
+import re
+import time
 import pytest
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -8,7 +14,8 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from src.config import EmailConfig # Импортируем только модель
 from src.domain.services import RawEmail, EmailAttachment
 from src.infrastructure.email.email_reader import EmailReaderService
-from src.domain.repositories import IProcessedFileRepository
+from src.domain.models import MailboxSyncState
+from src.domain.repositories import IProcessedFileRepository, IMailboxSyncStateRepository
 
 # =====================================
 # 3. Фейковые классы для имитации
@@ -27,18 +34,91 @@ class FakeMailMessage:
             att.payload = payload
             self.attachments.append(att)
 
+    def bodystructure(self) -> bytes:
+        """BODYSTRUCTURE multipart/mixed: текст письма + вложения в base64."""
+        parts = [b'("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 4 1 NIL NIL NIL NIL)']
+        for att in self.attachments:
+            name = att.filename.encode()
+            size = len(base64.encodebytes(att.payload))
+            parts.append(
+                b'("application" "octet-stream" ("name" "%s") NIL NIL "base64" %d NIL ("attachment" ("filename" "%s")) NIL NIL)'
+                % (name, size, name)
+            )
+        return b'(' + b''.join(parts) + b' "mixed" ("boundary" "b1") NIL NIL NIL)'
+
+    def headers(self) -> bytes:
+        return (
+            f"From: {self.from_}\r\nSubject: {self.subject}\r\n"
+            f"Date: {self.date.strftime('%a, %d %b %Y %H:%M:%S +0000')}\r\n\r\n"
+        ).encode()
+
+class FakeImapClient:
+    """Имитирует ответы imaplib на `UID FETCH` для BODYSTRUCTURE и BODY.PEEK[<part>]."""
+
+    def __init__(self, mailbox):
+        self.mailbox = mailbox
+        self.fetched_uids = []      # UID, по которым скачивались части писем
+        self.downloaded_parts = []  # (uid, part_id)
+
+    def uid(self, command, uid_set, items):
+        by_uid = {msg.uid: msg for msg in self.mailbox.messages}
+        data = []
+        for seq, uid in enumerate(uid_set.split(','), start=1):
+            msg = by_uid[uid]
+            if 'BODYSTRUCTURE' in items:
+                headers = msg.headers()
+                data.append((
+                    b'%d (UID %s BODYSTRUCTURE %s BODY[HEADER.FIELDS (FROM DATE SUBJECT)] {%d}'
+                    % (seq, uid.encode(), msg.bodystructure(), len(headers)),
+                    headers,
+                ))
+            else:
+                self.fetched_uids.append(uid)
+                prefix = b'%d (UID %s' % (seq, uid.encode())
+                for part_id, offset, size in re.findall(r'BODY\.PEEK\[(\d+)\]<(\d+)\.(\d+)>', items):
+                    self.mailbox.on_part_download()
+                    self.downloaded_parts.append((uid, part_id))
+                    encoded = base64.encodebytes(msg.attachments[int(part_id) - 2].payload)
+                    chunk = encoded[int(offset):int(offset) + int(size)]
+                    data.append((prefix + b' BODY[%s]<%s> {%d}' % (part_id.encode(), offset.encode(), len(chunk)), chunk))
+                    prefix = b''
+            data.append(b')')
+        return 'OK', data
+
+class FakeFolderManager:
+    def __init__(self, uid_validity=1, uid_next=1):
+        self.uid_validity = uid_validity
+        self.uid_next = uid_next
+
+    def status(self, folder=None, options=None):
+        return {'UIDVALIDITY': self.uid_validity, 'UIDNEXT': self.uid_next}
+
 class FakeMailBox:
     def __init__(self, server):
         self._server = server
         self.messages = []
+        self.folder = FakeFolderManager()
+        self.client = FakeImapClient(self)
+        self.criteria = None
+        self.seen_flagged = []
 
     def login(self, username, password, initial_folder='INBOX'):
         # Имитируем успешный вход
         return self
 
-    def fetch(self, criteria, seen, from_, mark_seen):
-        # В нашем фейковом классе мы просто возвращаем все сообщения
-        return self.messages
+    def uids(self, criteria='ALL', charset='US-ASCII', sort=None):
+        # В нашем фейковом классе поиск возвращает все сообщения
+        self.criteria = str(criteria)
+        return [msg.uid for msg in self.messages]
+
+    def fetch(self, criteria='ALL', mark_seen=True, uid_list=None, **kwargs):
+        return [msg for msg in self.messages if uid_list is None or msg.uid in uid_list]
+
+    def flag(self, uid_list, flag_set, value, chunks=None):
+        self.seen_flagged.extend(uid_list)
+
+    def on_part_download(self):
+        pass
 
     def __enter__(self):
         return self
@@ -46,6 +126,16 @@ class FakeMailBox:
     def __exit__(self, exc_type, exc_val, exc_tb):
         pass
 
+class SlowFakeMailBox(FakeMailBox):
+    """Почтовый ящик, который блокирует поток на каждом письме (как медленный IMAP)."""
+
+    def __init__(self, server, delay):
+        super().__init__(server)
+        self.delay = delay
+
+    def on_part_download(self):
+        time.sleep(self.delay)
+
 # =====================================
 # 2. Тестовый класс (пересмотренный)
 # =====================================
@@ -58,6 +148,15 @@ class TestEmailReaderService:
         """Фикстура для имитации репозитория ProcessedFileRepository."""
         repo = MagicMock(spec=IProcessedFileRepository)
         repo.find_by_message_id = AsyncMock()
+        repo.find_existing_message_ids = AsyncMock(return_value=set())
+        return repo
+
+    @pytest.fixture
+    def mock_sync_repo(self) -> MagicMock:
+        """Фикстура для имитации репозитория состояния синхронизации."""
+        repo = MagicMock(spec=IMailboxSyncStateRepository)
+        repo.get_by_folder = AsyncMock(return_value=None)
+        repo.save = AsyncMock()
         return repo
 
     @pytest.fixture
@@ -92,12 +191,12 @@ class TestEmailReaderService:
         msg.attachments = attachments
         return msg
 
-    async def test_fetch_new_emails_success(self, mock_repo, email_config):
+    async def test_fetch_new_emails_success(self, mock_repo, email_config, tmp_path):
         """
         Проверяет успешное получение нового письма с .xlsx вложением.
         """
         # --- Подготовка ---
-        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo)
+        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo, storage_path=str(tmp_path))
         mock_repo.find_by_message_id.return_value = None
 
         fake_message_data = {
@@ -123,10 +222,10 @@ class TestEmailReaderService:
             assert len(results[0].attachments) == 1
             assert results[0].attachments[0].filename == "report.xlsx"
 
-    async def test_fetch_skips_already_processed_email(self, mock_repo, email_config):
+    async def test_fetch_skips_already_processed_email(self, mock_repo, email_config, tmp_path):
         """Проверяет, что сервис пропускает уже обработанное письмо."""
-        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo)
-        mock_repo.find_by_message_id.return_value = "some_processed_file" # Имитируем, что письмо есть в БД
+        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo, storage_path=str(tmp_path))
+        mock_repo.find_existing_message_ids.return_value = {"processed-uid-1"} # Имитируем, что письмо есть в БД
 
         fake_mailbox_instance = FakeMailBox(server=email_config.server)
         fake_mailbox_instance.messages = [FakeMailMessage(
@@ -136,11 +235,12 @@ class TestEmailReaderService:
         with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
             results = [email async for email in service.fetch_new_emails()]
             assert len(results) == 0
-            mock_repo.find_by_message_id.assert_called_once_with("processed-uid-1")
+            mock_repo.find_existing_message_ids.assert_called_once_with(["processed-uid-1"])
+            mock_repo.find_by_message_id.assert_not_called()
 
-    async def test_fetch_skips_email_without_xlsx_attachment(self, mock_repo, email_config):
+    async def test_fetch_skips_email_without_xlsx_attachment(self, mock_repo, email_config, tmp_path):
         """Проверяет, что сервис пропускает письма без .xlsx вложений."""
-        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo)
+        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo, storage_path=str(tmp_path))
         mock_repo.find_by_message_id.return_value = None
 
         fake_mailbox_instance = FakeMailBox(server=email_config.server)
@@ -152,3 +252,257 @@ class TestEmailReaderService:
         with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
             results = [email async for email in service.fetch_new_emails()]
             assert len(results) == 0
+
+    async def test_fetch_does_not_block_event_loop(self, mock_repo, email_config, tmp_path):
+        """
+        Проверяет, что чтение большого ящика не блокирует event loop:
+        задержка тикера не должна приближаться к общему времени чтения.
+        """
+        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo, storage_path=str(tmp_path))
+        mock_repo.find_by_message_id.return_value = None
+
+        fake_mailbox_instance = SlowFakeMailBox(server=email_config.server, delay=0.05)
+        fake_mailbox_instance.messages = [
+            FakeMailMessage(
+                uid=f"uid-{i}", from_="sender@domain.com", subject="S", date=datetime.now(),
+                attachments_data=[("report.xlsx", b"xlsx_content")]
+            )
+            for i in range(20)
+        ]
+
+        max_lag = 0.0
+        stop = asyncio.Event()
+
+        async def measure_lag():
+            nonlocal max_lag
+            interval = 0.01
+            while not stop.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(interval)
+                max_lag = max(max_lag, time.perf_counter() - started - interval)
+
+        ticker = asyncio.create_task(measure_lag())
+        await asyncio.sleep(0.05)  # Даем тикеру запуститься до начала чтения
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            fetch_started = time.perf_counter()
+            results = [email async for email in service.fetch_new_emails()]
+            fetch_duration = time.perf_counter() - fetch_started
+        stop.set()
+        await ticker
+
+        assert len(results) == 20
+        # Чтение занимает ~1с, а event loop не должен простаивать дольше одного "письма"
+        assert fetch_duration >= 1.0
+        assert max_lag < 0.2
+
+    async def test_fetch_propagates_mailbox_errors(self, mock_repo, email_config, tmp_path):
+        """Проверяет, что ошибка IMAP из потока чтения пробрасывается потребителю."""
+        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo, storage_path=str(tmp_path))
+
+        with patch('src.infrastructure.email.email_reader.MailBox', side_effect=ConnectionError("IMAP down")):
+            with pytest.raises(ConnectionError):
+                [email async for email in service.fetch_new_emails()]
+
+    def _numbered_messages(self, uids):
+        return [
+            FakeMailMessage(
+                uid=str(uid), from_="sender@domain.com", subject="S", date=datetime.now(),
+                attachments_data=[("report.xlsx", b"xlsx_content")]
+            )
+            for uid in uids
+        ]
+
+    async def test_incremental_sync_searches_from_high_water_mark(self, mock_repo, mock_sync_repo, email_config, tmp_path):
+        """Проверяет поиск `UID last+1:*` и сдвиг high-water mark после пакета."""
+        service = EmailReaderService(email_config, mock_repo, sync_state_repo=mock_sync_repo, storage_path=str(tmp_path))
+        mock_repo.find_by_message_id.return_value = None
+        mock_sync_repo.get_by_folder.return_value = MailboxSyncState(folder="INBOX", uid_validity=7, last_uid=10)
+
+        fake_mailbox_instance = FakeMailBox(server=email_config.server)
+        fake_mailbox_instance.folder = FakeFolderManager(uid_validity=7, uid_next=13)
+        # Сервер возвращает UID 10 для диапазона `11:*`, если новых писем меньше
+        fake_mailbox_instance.messages = self._numbered_messages([10, 11, 12])
+
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            results = [email async for email in service.fetch_new_emails()]
+
+        assert "UID 11:*" in fake_mailbox_instance.criteria
+        assert "UNSEEN" not in fake_mailbox_instance.criteria
+        assert [email.message_id for email in results] == ["11", "12"]
+
+        saved_state = mock_sync_repo.save.call_args.args[0]
+        assert saved_state.uid_validity == 7
+        assert saved_state.last_uid == 12
+
+    async def test_full_resync_when_uid_validity_changes(self, mock_repo, mock_sync_repo, email_config, tmp_path):
+        """Проверяет полный поиск непрочитанных писем при смене UIDVALIDITY."""
+        service = EmailReaderService(email_config, mock_repo, sync_state_repo=mock_sync_repo, storage_path=str(tmp_path))
+        mock_repo.find_by_message_id.return_value = None
+        mock_sync_repo.get_by_folder.return_value = MailboxSyncState(folder="INBOX", uid_validity=5, last_uid=900)
+
+        fake_mailbox_instance = FakeMailBox(server=email_config.server)
+        fake_mailbox_instance.folder = FakeFolderManager(uid_validity=8, uid_next=4)
+        fake_mailbox_instance.messages = self._numbered_messages([2, 3])
+
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            results = [email async for email in service.fetch_new_emails()]
+
+        assert "UNSEEN" in fake_mailbox_instance.criteria
+        assert "UID" not in fake_mailbox_instance.criteria
+        assert len(results) == 2
+
+        saved_state = mock_sync_repo.save.call_args.args[0]
+        assert saved_state.uid_validity == 8
+        assert saved_state.last_uid == 3
+
+    async def test_first_sync_records_uid_next(self, mock_repo, mock_sync_repo, email_config, tmp_path):
+        """Проверяет, что при пустом результате high-water mark выставляется по UIDNEXT."""
+        service = EmailReaderService(email_config, mock_repo, sync_state_repo=mock_sync_repo, storage_path=str(tmp_path))
+
+        fake_mailbox_instance = FakeMailBox(server=email_config.server)
+        fake_mailbox_instance.folder = FakeFolderManager(uid_validity=3, uid_next=10001)
+
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            results = [email async for email in service.fetch_new_emails()]
+
+        assert results == []
+        assert mock_sync_repo.save.call_args.args[0].last_uid == 10000
+
+    async def test_interrupted_fetch_keeps_high_water_mark(self, mock_repo, mock_sync_repo, email_config, tmp_path):
+        """Проверяет, что прерванный цикл не сдвигает high-water mark."""
+        service = EmailReaderService(email_config, mock_repo, sync_state_repo=mock_sync_repo, storage_path=str(tmp_path))
+        mock_repo.find_by_message_id.return_value = None
+
+        fake_mailbox_instance = FakeMailBox(server=email_config.server)
+        fake_mailbox_instance.folder = FakeFolderManager(uid_validity=3, uid_next=4)
+        fake_mailbox_instance.messages = self._numbered_messages([1, 2, 3])
+
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            emails = service.fetch_new_emails()
+            async for _ in emails:
+                break
+            await emails.aclose()
+
+        mock_sync_repo.save.assert_not_called()
+
+    async def test_dedupe_resolves_batch_in_single_lookup(self, mock_repo, email_config, tmp_path):
+        """Проверяет, что дубликаты в пакете определяются одним запросом и не скачиваются."""
+        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo, storage_path=str(tmp_path))
+        mock_repo.find_existing_message_ids.return_value = {"1", "3"}
+
+        fake_mailbox_instance = FakeMailBox(server=email_config.server)
+        fake_mailbox_instance.messages = self._numbered_messages([1, 2, 3, 4])
+
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            results = [email async for email in service.fetch_new_emails()]
+
+        assert [email.message_id for email in results] == ["2", "4"]
+        mock_repo.find_existing_message_ids.assert_awaited_once_with(["1", "2", "3", "4"])
+        assert fake_mailbox_instance.client.fetched_uids == ["2", "4"]
+
+    async def test_downloads_only_xlsx_parts(self, mock_repo, email_config, tmp_path):
+        """Проверяет, что PDF и изображения не скачиваются, а письмо помечается прочитанным."""
+        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo, storage_path=str(tmp_path))
+
+        fake_mailbox_instance = FakeMailBox(server=email_config.server)
+        fake_mailbox_instance.messages = [FakeMailMessage(
+            uid="5", from_="sender@domain.com", subject="Stoplist", date=datetime(2025, 7, 29, 8, 0),
+            attachments_data=[
+                ("scan.pdf", b"%PDF" * 1000),
+                ("lista 29 07 2025.xlsx", b"xlsx_content"),
+                ("logo.png", b"\x89PNG" * 1000),
+            ],
+        )]
+
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            results = [email async for email in service.fetch_new_emails()]
+
+        assert fake_mailbox_instance.client.downloaded_parts == [("5", "3")]
+        assert fake_mailbox_instance.seen_flagged == ["5"]
+        assert len(results) == 1
+        assert results[0].sender == "sender@domain.com"
+        assert results[0].date.year == 2025
+        attachment = results[0].attachments[0]
+        assert attachment.filename == "lista 29 07 2025.xlsx"
+        assert attachment.path == str(tmp_path / "ps" / "2025" / "07" / "29" / "lista 29 07 2025.xlsx")
+        assert attachment.content == b"xlsx_content"
+        # Имя занято скрытым резервом, готовый .xlsx появится только при архивировании
+        assert not os.path.exists(attachment.path)
+        assert os.path.exists(str(tmp_path / "ps" / "2025" / "07" / "29" / ".lista 29 07 2025.xlsx.part"))
+
+    async def test_falls_back_to_full_fetch_on_bad_bodystructure(self, mock_repo, email_config, tmp_path):
+        """Проверяет, что неразборчивая BODYSTRUCTURE не теряет письмо."""
+        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo, storage_path=str(tmp_path))
+
+        fake_mailbox_instance = FakeMailBox(server=email_config.server)
+        fake_mailbox_instance.messages = self._numbered_messages([1])
+        fake_mailbox_instance.client.uid = MagicMock(return_value=('OK', [b'1 (UID 1 BODYSTRUCTURE NIL)']))
+
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            results = [email async for email in service.fetch_new_emails()]
+
+        assert [email.message_id for email in results] == ["1"]
+        assert results[0].attachments[0].content == b"xlsx_content"
+
+    async def test_streams_large_attachment_in_chunks(self, mock_repo, email_config, tmp_path):
+        """Проверяет потоковую загрузку вложения кусками с хешем и размером."""
+        email_config.spool_chunk_size = 1000
+        email_config.in_memory_attachment_limit = 10_000  # Вложение больше лимита пишется на диск
+        service = EmailReaderService(config=email_config, processed_file_repo=mock_repo, storage_path=str(tmp_path))
+        payload = bytes(range(256)) * 100
+
+        fake_mailbox_instance = FakeMailBox(server=email_config.server)
+        fake_mailbox_instance.messages = [FakeMailMessage(
+            uid="9", from_="sender@domain.com", subject="S", date=datetime(2025, 7, 29),
+            attachments_data=[("big.xlsx", payload)],
+        )]
+
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            results = [email async for email in service.fetch_new_emails()]
+
+        attachment = results[0].attachments[0]
+        assert len(fake_mailbox_instance.client.downloaded_parts) == len(base64.encodebytes(payload)) // 1000 + 1
+        assert attachment.size == len(payload)
+        assert attachment.sha256 == hashlib.sha256(payload).hexdigest()
+        assert attachment.content is None
+        assert open(attachment.path, "rb").read() == payload
+        assert sorted(p.name for p in (tmp_path / "ps" / "2025" / "07" / "29").iterdir()) == ["big.xlsx"]
+
+    async def _fetch_with_broken_part(self, mock_repo, mock_sync_repo, email_config, tmp_path, break_response):
+        """Читает письмо, ответ на скачивание части которого искажает break_response."""
+        service = EmailReaderService(email_config, mock_repo, sync_state_repo=mock_sync_repo, storage_path=str(tmp_path))
+
+        fake_mailbox_instance = FakeMailBox(server=email_config.server)
+        fake_mailbox_instance.folder = FakeFolderManager(uid_validity=3, uid_next=2)
+        fake_mailbox_instance.messages = self._numbered_messages([1])
+        fake_uid = fake_mailbox_instance.client.uid
+
+        def uid(command, uid_set, items):
+            typ, data = fake_uid(command, uid_set, items)
+            return typ, data if 'BODYSTRUCTURE' in items else break_response(data)
+
+        fake_mailbox_instance.client.uid = uid
+
+        with patch('src.infrastructure.email.email_reader.MailBox', return_value=fake_mailbox_instance):
+            with pytest.raises(RuntimeError) as exc_info:
+                [email async for email in service.fetch_new_emails()]
+
+        assert fake_mailbox_instance.seen_flagged == []
+        mock_sync_repo.save.assert_not_called()
+        return str(exc_info.value)
+
+    async def test_missing_part_in_fetch_response_fails_email(self, mock_repo, mock_sync_repo, email_config, tmp_path):
+        """Проверяет, что ответ без BODY[part]<offset> не выдается за пустое вложение."""
+        message = await self._fetch_with_broken_part(
+            mock_repo, mock_sync_repo, email_config, tmp_path, lambda data: [b'1 (UID 1)'],
+        )
+        assert "BODY[2]<0>" in message
+
+    async def test_truncated_part_fails_email(self, mock_repo, mock_sync_repo, email_config, tmp_path):
+        """Проверяет, что часть короче размера из BODYSTRUCTURE не помечает письмо прочитанным."""
+        def truncate(data):
+            (prefix, chunk), *rest = data
+            return [(prefix.replace(b'{%d}' % len(chunk), b'{%d}' % (len(chunk) - 1)), chunk[:-1]), *rest]
+
+        message = await self._fetch_with_broken_part(mock_repo, mock_sync_repo, email_config, tmp_path, truncate)
+        assert "truncated" in message
@@ -1,16 +1,53 @@
 # =====================================
 # 1. Импорт библиотек
 # =====================================
+import asyncio
+import hashlib
+import threading
+import time
 import pytest
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
 from src.domain.services import RawEmail, EmailAttachment
+from src.config import ConversionConfig
+from src.infrastructure.monitoring.metrics import metrics
+from src.infrastructure.storage import file_processor, storage_io
 from src.infrastructure.storage.file_processor import FileProcessingService
 
 # =====================================
-# 2. Тестовый класс
+# 2. Вспомогательные функции
+# =====================================
+
+def _email_with_attachments(tmp_path: Path, message_id: str, count: int) -> RawEmail:
+    """Письмо с `count` .xlsx вложениями; в вложении i колонка col1 = [i]."""
+    attachments = []
+    for index in range(count):
+        xlsx_path = tmp_path / f"{message_id}_{index}.xlsx"
+        pd.DataFrame({'col1': [index]}).to_excel(xlsx_path, index=False, engine='openpyxl')
+        content = xlsx_path.read_bytes()
+        attachments.append(EmailAttachment(
+            filename=f"report_{index}.xlsx", path=str(xlsx_path), size=len(content),
+            sha256=hashlib.sha256(content).hexdigest(),
+        ))
+    return RawEmail(message_id=message_id, sender="test@sender.com", date=datetime(2023, 1, 15), attachments=attachments)
+
+def _in_memory_email(tmp_path: Path, content: bytes) -> RawEmail:
+    """Письмо с вложением в памяти; как и сервис чтения почты, резервирует имя скрытым .part."""
+    storage_dir = tmp_path / "ps" / "2023" / "01" / "15"
+    storage_dir.mkdir(parents=True)
+    (storage_dir / ".report.xlsx.part").touch()
+    return RawEmail(
+        message_id="uid-9", sender="test@sender.com", date=datetime(2023, 1, 15),
+        attachments=[EmailAttachment(
+            filename="report.xlsx", path=str(storage_dir / "report.xlsx"), size=len(content),
+            sha256=hashlib.sha256(content).hexdigest(), content=content,
+        )],
+    )
+
+# =====================================
+# 3. Тестовый класс
 # =====================================
 
 class TestFileProcessingService:
@@ -28,19 +65,24 @@ class TestFileProcessingService:
         # --- Подготовка ---
         service = FileProcessingService(base_storage_path=str(tmp_path))
 
-        # Создаем фейковый xlsx файл в памяти
+        # Создаем фейковый xlsx файл (как его сохранил бы сервис чтения почты)
         fake_xlsx_content = pd.DataFrame({'col1': [1, 2], 'col2': ['A', 'B']})
-        excel_bytes_io = pd.io.common.BytesIO()
-        with pd.ExcelWriter(excel_bytes_io, engine='openpyxl') as writer:
-            fake_xlsx_content.to_excel(writer, index=False, sheet_name='Sheet1')
-        excel_bytes = excel_bytes_io.getvalue()
+        spooled_path = tmp_path / "spool" / "report.xlsx"
+        spooled_path.parent.mkdir()
+        fake_xlsx_content.to_excel(spooled_path, index=False, sheet_name='Sheet1', engine='openpyxl')
+        excel_bytes = spooled_path.read_bytes()
 
         fake_email = RawEmail(
             message_id="test-msg-123",
             sender="test@sender.com",
             date=datetime(2023, 1, 15),
             attachments=[
-                EmailAttachment(filename="report.xlsx", content=excel_bytes)
+                EmailAttachment(
+                    filename="report.xlsx",
+                    path=str(spooled_path),
+                    size=len(excel_bytes),
+                    sha256=hashlib.sha256(excel_bytes).hexdigest(),
+                )
             ]
         )
 
@@ -58,7 +100,205 @@ class TestFileProcessingService:
         csv_path = Path(meta['csv_path'])
         assert csv_path.exists()
         assert csv_path.name == "RS_stoplist_20230115.csv"
+        assert Path(meta['file_path']) == tmp_path / "ps" / "2023" / "01" / "15" / "report.xlsx"
+        assert not spooled_path.exists()
 
         # 3. Проверяем содержимое CSV
         df = pd.read_csv(csv_path)
         pd.testing.assert_frame_equal(df, fake_xlsx_content)
+
+    @pytest.mark.asyncio
+    async def test_same_day_emails_get_separate_csv(self, tmp_path: Path):
+        """Проверяет, что CSV второго письма за ту же дату не перезаписывает еще не загруженный первый."""
+        service = FileProcessingService(base_storage_path=str(tmp_path))
+        csv_paths = []
+
+        for message_id, value in (("uid-1", 1), ("uid-2", 2)):
+            xlsx_path = tmp_path / f"{message_id}.xlsx"
+            pd.DataFrame({'col1': [value]}).to_excel(xlsx_path, index=False, engine='openpyxl')
+            content = xlsx_path.read_bytes()
+            email = RawEmail(
+                message_id=message_id,
+                sender="test@sender.com",
+                date=datetime(2023, 1, 15),
+                attachments=[EmailAttachment(
+                    filename="report.xlsx", path=str(xlsx_path), size=len(content),
+                    sha256=hashlib.sha256(content).hexdigest(),
+                )]
+            )
+            csv_paths.append((await service.save_and_convert(email))[0]['csv_path'])
+
+        assert Path(csv_paths[0]).name == "RS_stoplist_20230115.csv"
+        assert Path(csv_paths[1]).name == "RS_stoplist_20230115_uid-2.csv"
+        assert pd.read_csv(csv_paths[0])['col1'].tolist() == [1]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_same_day_emails_reserve_distinct_csv(self, tmp_path: Path):
+        """Письма за одну дату, конвертируемые одновременно (несколько воркеров), получают разные CSV."""
+        service = FileProcessingService(base_storage_path=str(tmp_path))
+        emails = [_email_with_attachments(tmp_path, f"uid-{i}", 2) for i in range(3)]
+
+        results = await asyncio.gather(*(service.save_and_convert(email) for email in emails))
+
+        files = [metadata for result in results for metadata in result]
+        assert len({metadata['csv_path'] for metadata in files}) == 6
+        for metadata in files:
+            assert hashlib.sha256(Path(metadata['csv_path']).read_bytes()).hexdigest() == metadata['file_hash']
+
+    @pytest.mark.asyncio
+    async def test_failed_conversion_releases_reserved_name(self, tmp_path: Path):
+        """Имя CSV, зарезервированное под непрочитанную книгу, освобождается."""
+        service = FileProcessingService(base_storage_path=str(tmp_path))
+        broken = tmp_path / "broken.xlsx"
+        broken.write_bytes(b"not a workbook")
+        email = RawEmail(
+            message_id="uid-1", sender="test@sender.com", date=datetime(2023, 1, 15),
+            attachments=[EmailAttachment(filename="broken.xlsx", path=str(broken), size=14, sha256="0" * 64)],
+        )
+
+        assert await service.save_and_convert(email) == []
+        assert not list((tmp_path / "ps").rglob("*.csv"))
+
+    @pytest.mark.asyncio
+    async def test_process_mode_converts_attachments(self, tmp_path: Path):
+        """Проверяет конвертацию нескольких вложений письма в пуле процессов."""
+        service = FileProcessingService(
+            base_storage_path=str(tmp_path),
+            conversion_config=ConversionConfig(mode="process", max_workers=2),
+        )
+        try:
+            result_meta = await service.save_and_convert(_email_with_attachments(tmp_path, "uid-7", 2))
+        finally:
+            file_processor.shutdown_conversion_pool()
+
+        assert [Path(meta['csv_path']).name for meta in result_meta] == [
+            "RS_stoplist_20230115.csv", "RS_stoplist_20230115_uid-7.csv",
+        ]
+        for index, meta in enumerate(result_meta):
+            assert pd.read_csv(meta['csv_path'])['col1'].tolist() == [index]
+            assert meta['file_hash'] == hashlib.sha256(Path(meta['csv_path']).read_bytes()).hexdigest()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_conversions_limited_by_max_workers(self, tmp_path: Path, monkeypatch):
+        """Проверяет, что одновременно выполняется не больше max_workers конвертаций."""
+        convert_file = file_processor.convert_file
+        lock = threading.Lock()
+        active, peak = 0, 0
+
+        def slow_convert(xlsx_path: str, csv_path: str):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return convert_file(xlsx_path, csv_path)
+
+        monkeypatch.setattr(file_processor, "convert_file", slow_convert)
+        service = FileProcessingService(
+            base_storage_path=str(tmp_path),
+            conversion_config=ConversionConfig(mode="thread", max_workers=2),
+        )
+
+        result_meta = await service.save_and_convert(_email_with_attachments(tmp_path, "uid-8", 5))
+
+        assert len(result_meta) == 5
+        assert len({meta['csv_path'] for meta in result_meta}) == 5
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_in_memory_attachment_converted_and_archived(self, tmp_path: Path):
+        """Проверяет конвертацию вложения из памяти и запись исходного .xlsx в хранилище."""
+        service = FileProcessingService(base_storage_path=str(tmp_path))
+        source = tmp_path / "source.xlsx"
+        pd.DataFrame({'col1': [1, 2], 'col2': ['A', 'B']}).to_excel(source, index=False, engine='openpyxl')
+        content = source.read_bytes()
+
+        email = _in_memory_email(tmp_path, content)
+        result_meta = await service.save_and_convert(email)
+
+        assert len(result_meta) == 1
+        assert Path(result_meta[0]['file_path']).read_bytes() == content
+        assert pd.read_csv(result_meta[0]['csv_path'])['col2'].tolist() == ['A', 'B']
+        storage_dir = Path(email.attachments[0].path).parent
+        assert sorted(p.name for p in storage_dir.iterdir()) == ["RS_stoplist_20230115.csv", "report.xlsx"]
+
+    @pytest.mark.asyncio
+    async def test_failed_in_memory_attachment_leaves_no_files(self, tmp_path: Path):
+        """Проверяет, что после ошибки конвертации не остается ни резерва имени, ни пустого .xlsx."""
+        service = FileProcessingService(base_storage_path=str(tmp_path))
+        email = _in_memory_email(tmp_path, b"not a workbook")
+
+        result_meta = await service.save_and_convert(email)
+
+        assert result_meta == []
+        storage_dir = Path(email.attachments[0].path).parent
+        assert [p.name for p in storage_dir.iterdir()] == ["report.xlsx"]
+        assert Path(email.attachments[0].path).read_bytes() == b"not a workbook"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_conversion_is_propagated(self, tmp_path: Path, monkeypatch):
+        """Проверяет, что отмена конвертации не глотается как ошибка файла, а резерв CSV освобождается."""
+        service = FileProcessingService(base_storage_path=str(tmp_path))
+
+        def cancelled_convert(xlsx_source, csv_path, **options):
+            if "uid-7_1" in str(xlsx_source):
+                raise asyncio.CancelledError()
+            return convert_file(xlsx_source, csv_path, **options)
+
+        convert_file = file_processor.convert_file
+        monkeypatch.setattr(file_processor, "convert_file", cancelled_convert)
+
+        with pytest.raises(asyncio.CancelledError):
+            await service.save_and_convert(_email_with_attachments(tmp_path, "uid-7", 2))
+
+        storage_dir = tmp_path / "ps" / "2023" / "01" / "15"
+        assert sorted(p.name for p in storage_dir.glob("*.csv")) == ["RS_stoplist_20230115.csv"]
+
+    @pytest.mark.asyncio
+    async def test_parquet_written_next_to_csv(self, tmp_path: Path):
+        """Проверяет, что с parquet_enabled путь и хеш Parquet попадают в метаданные файла."""
+        pytest.importorskip("pyarrow")
+        service = FileProcessingService(
+            base_storage_path=str(tmp_path),
+            conversion_config=ConversionConfig(parquet_enabled=True),
+        )
+
+        result_meta = await service.save_and_convert(_email_with_attachments(tmp_path, "uid-3", 1))
+
+        parquet_path = Path(result_meta[0]['parquet_path'])
+        assert parquet_path == Path(result_meta[0]['csv_path']).with_suffix(".parquet")
+        assert result_meta[0]['parquet_hash'] == hashlib.sha256(parquet_path.read_bytes()).hexdigest()
+        assert pd.read_parquet(parquet_path)['col1'].tolist() == [0]
+
+    @pytest.mark.asyncio
+    async def test_storage_operations_run_in_storage_pool(self, tmp_path: Path, monkeypatch):
+        """Проверяет, что директории создаются и CSV сбрасывается на диск в пуле storage-io, с метриками."""
+        calls = []
+        dated_storage_dir, sync_file = file_processor.dated_storage_dir, storage_io.sync_file
+
+        def recording(name, function):
+            def wrapper(*args):
+                calls.append((name, threading.current_thread().name))
+                return function(*args)
+            return wrapper
+
+        monkeypatch.setattr(file_processor, "dated_storage_dir", recording("makedirs", dated_storage_dir))
+        monkeypatch.setattr(storage_io, "sync_file", recording("fsync", sync_file))
+
+        def sample(operation: str) -> float:
+            value = metrics.registry.get_sample_value("storage_io_duration_seconds_count", {"operation": operation})
+            return value or 0.0
+
+        synced_before = sample("fsync")
+        service = FileProcessingService(base_storage_path=str(tmp_path / "ps"))
+
+        result_meta = await service.save_and_convert(_email_with_attachments(tmp_path, "uid-12", 2))
+
+        assert len(result_meta) == 2
+        # Одна директория на письмо, fsync каждого CSV
+        assert [name for name, _ in calls].count("makedirs") == 1
+        assert [name for name, _ in calls].count("fsync") == 2
+        assert all(thread.startswith("storage-io") for _, thread in calls)
+        assert sample("fsync") == synced_before + 2
@@ -19,11 +19,9 @@ class TestHealthCheckService:
         config.database.host = "localhost"
         config.database.name = "testdb"
 
-        config.sftp = MagicMock(spec=SftpConfig)
-        config.sftp.host = "sftp.test.com"
-        config.sftp.username = "testuser"
-        config.sftp.key_path = "/path/to/key"
-        config.sftp.remote_path = "/upload"
+        config.sftp = SftpConfig(
+            host="sftp.test.com", username="testuser", key_path="/path/to/key", remote_path="/upload",
+        )
 
         return config
 
@@ -83,7 +81,7 @@ class TestHealthCheckService:
         mock_conn.close = MagicMock()
         mock_conn.wait_closed = AsyncMock()
 
-        with patch('src.application.api.health_checks.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+        with patch('src.infrastructure.sftp.sftp_pool.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
             result = await health_service.check_sftp()
 
         assert result["status"] == "healthy"
@@ -95,7 +93,7 @@ class TestHealthCheckService:
     async def test_check_sftp_unhealthy(self, health_service: HealthCheckService):
         """Тест сбоя проверки SFTP."""
         # Мокаем ошибку подключения к SFTP
-        with patch('src.application.api.health_checks.asyncssh.connect', side_effect=Exception("SFTP connection failed")):
+        with patch('src.infrastructure.sftp.sftp_pool.asyncssh.connect', side_effect=Exception("SFTP connection failed")):
             result = await health_service.check_sftp()
 
         assert result["status"] == "unhealthy"
@@ -0,0 +1,167 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import asyncio
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.application.schedulers import main_scheduler
+from src.config import EmailConfig
+from src.infrastructure.email.idle_watcher import ImapIdleWatcher
+
+# =====================================
+# 2. Фейковые классы для имитации
+# =====================================
+
+class FakeIdleManager:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.started = 0
+        self.stopped = 0
+
+    def start(self):
+        self.started += 1
+
+    def poll(self, timeout):
+        if self.responses:
+            return self.responses.pop(0)
+        threading.Event().wait(timeout)
+        return []
+
+    def stop(self):
+        self.stopped += 1
+
+class FakeIdleMailBox:
+    def __init__(self, responses, capabilities=("IMAP4REV1", "IDLE")):
+        self.idle = FakeIdleManager(responses)
+        self.client = type("Client", (), {"capabilities": capabilities})()
+
+    def login(self, username, password, initial_folder='INBOX'):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+# =====================================
+# 3. Тесты
+# =====================================
+
+class TestImapIdleWatcher:
+
+    @pytest.fixture
+    def email_config(self) -> EmailConfig:
+        return EmailConfig(
+            server="imap.test.com",
+            port=993,
+            username="test@user.com",
+            password="password",
+            allowed_senders=["sender@domain.com"],
+            idle_enabled=True,
+            idle_timeout_seconds=1,
+            idle_reconnect_max_delay=1,
+        )
+
+    def test_notifies_on_exists_response(self, email_config):
+        """Проверяет, что ответ EXISTS во время IDLE вызывает callback."""
+        notified = threading.Event()
+        mailbox = FakeIdleMailBox(responses=[[], [b"* 7 EXISTS"]])
+
+        with patch('src.infrastructure.email.idle_watcher.MailBox', return_value=mailbox):
+            watcher = ImapIdleWatcher(email_config, on_new_mail=notified.set, poll_interval=0.01)
+            watcher.start()
+            try:
+                assert notified.wait(2.0)
+            finally:
+                watcher.stop()
+
+        assert mailbox.idle.started >= 1
+        assert mailbox.idle.started == mailbox.idle.stopped
+
+    def test_ignores_non_mail_responses(self, email_config):
+        """Проверяет, что служебные ответы (например, EXPUNGE) не запускают обработку."""
+        notified = threading.Event()
+        mailbox = FakeIdleMailBox(responses=[[b"* 3 EXPUNGE"]])
+
+        with patch('src.infrastructure.email.idle_watcher.MailBox', return_value=mailbox):
+            watcher = ImapIdleWatcher(email_config, on_new_mail=notified.set, poll_interval=0.01)
+            watcher.start()
+            try:
+                assert not notified.wait(0.3)
+            finally:
+                watcher.stop()
+
+    def test_reconnects_after_connection_drop(self, email_config):
+        """Проверяет переподключение и внеочередную проверку ящика после обрыва."""
+        notified = threading.Event()
+        mailbox = FakeIdleMailBox(responses=[])
+        attempts = []
+
+        def mailbox_factory(server):
+            attempts.append(server)
+            if len(attempts) == 1:
+                raise ConnectionResetError("connection dropped")
+            return mailbox
+
+        with patch('src.infrastructure.email.idle_watcher.MailBox', side_effect=mailbox_factory):
+            watcher = ImapIdleWatcher(email_config, on_new_mail=notified.set, poll_interval=0.01)
+            watcher.start()
+            try:
+                assert notified.wait(3.0)
+            finally:
+                watcher.stop()
+
+        assert len(attempts) >= 2
+
+    def test_stops_when_idle_not_supported(self, email_config):
+        """Проверяет, что без поддержки IDLE наблюдатель завершается и не вызывает callback."""
+        notified = threading.Event()
+        mailbox = FakeIdleMailBox(responses=[[b"* 1 EXISTS"]], capabilities=("IMAP4REV1",))
+
+        with patch('src.infrastructure.email.idle_watcher.MailBox', return_value=mailbox):
+            watcher = ImapIdleWatcher(email_config, on_new_mail=notified.set, poll_interval=0.01)
+            watcher.start()
+            watcher._thread.join(2.0)
+
+        assert not watcher.is_running
+        assert not notified.is_set()
+
+@pytest.mark.asyncio
+async def test_push_during_running_cycle_triggers_rerun():
+    """Push, пришедший во время push-цикла, не теряется: после цикла обработка запускается еще раз."""
+    started = asyncio.Queue()
+    release = asyncio.Event()
+    cycles = 0
+
+    async def process_emails():
+        nonlocal cycles
+        cycles += 1
+        await started.put(cycles)
+        await release.wait()
+
+    async def main_handler():
+        return MagicMock(process_emails=process_emails)
+
+    container = MagicMock(main_handler=main_handler)
+    with patch.object(main_scheduler, "Container", return_value=container):
+        main_scheduler.scheduler.start()
+        try:
+            main_scheduler.request_immediate_processing()
+            assert await asyncio.wait_for(started.get(), 5) == 1
+
+            # Два push подряд во время цикла: объединяются в один повтор
+            main_scheduler.request_immediate_processing()
+            await asyncio.sleep(0.2)
+            main_scheduler.request_immediate_processing()
+            await asyncio.sleep(0.2)
+            release.set()
+
+            assert await asyncio.wait_for(started.get(), 5) == 2
+            await asyncio.sleep(0.2)
+            assert cycles == 2
+        finally:
+            main_scheduler.scheduler.shutdown(wait=False)
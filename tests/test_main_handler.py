@@ -1,11 +1,15 @@
+import asyncio
+import time
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime
 
 from src.application.handlers.main_handler import MainHandler
-from src.domain.services import RawEmail, EmailAttachment
+from src.config import PipelineConfig
+from src.domain.services import RawEmail, EmailAttachment, UploadRequest
 from src.domain.models import ProcessedFile, OperationLog
 from src.domain.services.notifications import AlertMessage
+from src.infrastructure.storage.stoplist_delta import DeltaFile
 
 
 @pytest.mark.asyncio
@@ -37,7 +41,7 @@ class TestMainHandler:
             sender="test@example.com",
             date=datetime(2024, 7, 30, 12, 0, 0),
             attachments=[
-                EmailAttachment(filename="report.xlsx", content=b"fake_excel_content")
+                EmailAttachment(filename="report.xlsx", path="/tmp/report.xlsx", size=18, sha256="abc123")
             ]
         )
 
@@ -223,3 +227,195 @@ class TestMainHandler:
         assert handler.log_repo == mock_services['log_repo']
         assert handler.notification_service == mock_services['notification_service']
         assert handler.logger is not None
+
+    # --- Конвейер стадий ---
+
+    def _emails(self, count):
+        return [
+            RawEmail(
+                message_id=f"msg-{i}",
+                sender="test@example.com",
+                date=datetime(2024, 7, 30, 12, 0, 0),
+                attachments=[EmailAttachment(filename=f"report{i}.xlsx", path=f"/tmp/report{i}.xlsx", size=1, sha256="h")],
+            )
+            for i in range(count)
+        ]
+
+    def _pipeline_services(self, mock_services, emails, convert_delay=0.0, upload_delay=0.0):
+        fetched = []
+
+        async def fetch_emails():
+            for email in emails:
+                fetched.append(email.message_id)
+                yield email
+
+        async def save_and_convert(email):
+            await asyncio.sleep(convert_delay)
+            return [{
+                "message_id": email.message_id,
+                "sender_email": email.sender,
+                "file_name": email.attachments[0].filename,
+                "file_path": email.attachments[0].path,
+                "csv_path": f"/storage/{email.message_id}.csv",
+                "file_hash": "abc",
+                "email_date": email.date,
+            }]
+
+        async def add(file_entry):
+            return file_entry.model_copy(update={"id": 1})
+
+        async def upload(local_path, remote_path, expected_hash):
+            await asyncio.sleep(upload_delay)
+            return True
+
+        mock_services['email_service'] = MagicMock()
+        mock_services['email_service'].fetch_new_emails = fetch_emails
+        mock_services['file_service'].save_and_convert.side_effect = save_and_convert
+        mock_services['file_repo'].add.side_effect = add
+        mock_services['sftp_service'].upload_file_with_validation.side_effect = upload
+        return fetched
+
+    async def test_pipeline_overlaps_upload_with_conversion(self, mock_services):
+        """Проверяет, что загрузка файла N идет параллельно с конвертацией файла N+1."""
+        emails = self._emails(6)
+        self._pipeline_services(mock_services, emails, convert_delay=0.1, upload_delay=0.1)
+        handler = MainHandler(**mock_services, pipeline_config=PipelineConfig(
+            queue_size=2, convert_workers=1, persist_workers=1, upload_workers=1,
+        ))
+
+        started = time.perf_counter()
+        await handler.process_emails()
+        duration = time.perf_counter() - started
+
+        # Последовательно: 6 * (0.1 + 0.1) = 1.2с; конвейер: ~6 * 0.1 + 0.1 = 0.7с
+        assert duration < 1.0
+        assert mock_services['sftp_service'].upload_file_with_validation.call_count == 6
+        assert handler.processed_count == 6
+        assert handler.error_count == 0
+
+    async def test_processed_count_waits_for_successful_upload(self, mock_services):
+        """Проверяет, что письмо засчитывается обработанным только после загрузки его файлов на SFTP."""
+        emails = self._emails(3)
+        self._pipeline_services(mock_services, emails)
+
+        async def upload(local_path, remote_path, expected_hash):
+            return local_path != "/storage/msg-1.csv"
+
+        mock_services['sftp_service'].upload_file_with_validation.side_effect = upload
+        handler = MainHandler(**mock_services)
+
+        await handler.process_emails()
+
+        assert mock_services['sftp_service'].upload_file_with_validation.call_count == 3
+        assert handler.processed_count == 2
+
+    async def test_pipeline_backpressure_limits_fetch_ahead(self, mock_services):
+        """Проверяет, что при медленной загрузке чтение почты не уходит вперед больше емкости очередей."""
+        emails = self._emails(20)
+        fetched = self._pipeline_services(mock_services, emails, upload_delay=0.05)
+        uploaded = []
+        max_ahead = 0
+        upload = mock_services['sftp_service'].upload_file_with_validation.side_effect
+
+        async def tracking_upload(local_path, remote_path, expected_hash):
+            nonlocal max_ahead
+            max_ahead = max(max_ahead, len(fetched) - len(uploaded))
+            result = await upload(local_path, remote_path, expected_hash)
+            uploaded.append(local_path)
+            return result
+
+        mock_services['sftp_service'].upload_file_with_validation.side_effect = tracking_upload
+        config = PipelineConfig(queue_size=1, convert_workers=1, persist_workers=1, upload_workers=1)
+        handler = MainHandler(**mock_services, pipeline_config=config)
+
+        await handler.process_emails()
+
+        assert len(uploaded) == 20
+        # 3 очереди по 1 элементу + по одному элементу в работе у каждой стадии + одно ожидающее put
+        assert max_ahead <= 3 * config.queue_size + 3 + 1
+
+    async def test_pipeline_file_error_does_not_stop_other_files(self, mock_services):
+        """Проверяет, что ошибка записи одного файла в БД не останавливает конвейер."""
+        emails = self._emails(3)
+        self._pipeline_services(mock_services, emails)
+        add = mock_services['file_repo'].add.side_effect
+
+        async def failing_add(file_entry):
+            if file_entry.message_id == "msg-1":
+                raise RuntimeError("DB unavailable")
+            return await add(file_entry)
+
+        mock_services['file_repo'].add.side_effect = failing_add
+        handler = MainHandler(**mock_services)
+
+        await handler.process_emails()
+
+        assert mock_services['sftp_service'].upload_file_with_validation.call_count == 2
+        assert handler.error_count == 1
+        logged = [call.args[0] for call in mock_services['log_repo'].add.call_args_list]
+        assert any(log.operation_type == "FILE_PROCESSING" and log.status == "ERROR" for log in logged)
+
+    async def test_delta_only_upload_and_summary_log(self, mock_services):
+        """Проверяет, что в режиме upload_delta_only загружается дельта, а ее сводка пишется в журнал."""
+        self._pipeline_services(mock_services, self._emails(1))
+        delta_service = MagicMock()
+        delta_service.upload_delta_only = True
+        delta_service.build_delta = AsyncMock(return_value=DeltaFile(
+            path="/storage/msg-0_delta.csv", sha256="delta-hash",
+            summary={"added": 2, "removed": 1, "changed": 3, "unchanged": 100, "duplicate_keys": 0},
+        ))
+        handler = MainHandler(**mock_services, delta_service=delta_service)
+
+        await handler.process_emails()
+
+        mock_services['sftp_service'].upload_file_with_validation.assert_awaited_once_with(
+            local_path="/storage/msg-0_delta.csv",
+            remote_path="/upload/report0_delta.csv",
+            expected_hash="delta-hash",
+        )
+        logged = [call.args[0] for call in mock_services['log_repo'].add.call_args_list]
+        delta_log = next(log for log in logged if log.operation_type == "STOPLIST_DELTA")
+        assert delta_log.context["added"] == 2 and delta_log.context["changed"] == 3
+
+    async def test_parquet_uploaded_with_csv(self, mock_services):
+        """Проверяет, что с upload_parquet Parquet загружается одним пакетом с CSV со своим хешем."""
+        self._pipeline_services(mock_services, self._emails(1))
+        convert = mock_services['file_service'].save_and_convert.side_effect
+
+        async def save_and_convert(email):
+            files = await convert(email)
+            files[0].update(parquet_path=f"/storage/{email.message_id}.parquet", parquet_hash="parquet-hash")
+            return files
+
+        mock_services['file_service'].save_and_convert.side_effect = save_and_convert
+        mock_services['sftp_service'].upload_files_with_validation.return_value = [True, True]
+        handler = MainHandler(**mock_services, upload_parquet=True)
+
+        await handler.process_emails()
+
+        mock_services['sftp_service'].upload_file_with_validation.assert_not_awaited()
+        mock_services['sftp_service'].upload_files_with_validation.assert_awaited_once_with([
+            UploadRequest("/storage/msg-0.csv", "/upload/report0.csv", "abc"),
+            UploadRequest("/storage/msg-0.parquet", "/upload/report0.parquet", "parquet-hash"),
+        ])
+
+    async def test_parquet_without_hash_is_not_uploaded(self, mock_services):
+        """Проверяет, что Parquet без хеша не загружается непроверенным, а CSV уходит как обычно."""
+        self._pipeline_services(mock_services, self._emails(1))
+        convert = mock_services['file_service'].save_and_convert.side_effect
+
+        async def save_and_convert(email):
+            files = await convert(email)
+            files[0].update(parquet_path=f"/storage/{email.message_id}.parquet", parquet_hash=None)
+            return files
+
+        mock_services['file_service'].save_and_convert.side_effect = save_and_convert
+        handler = MainHandler(**mock_services, upload_parquet=True)
+
+        await handler.process_emails()
+
+        mock_services['sftp_service'].upload_files_with_validation.assert_not_awaited()
+        mock_services['sftp_service'].upload_file_with_validation.assert_awaited_once_with(
+            local_path="/storage/msg-0.csv", remote_path="/upload/report0.csv", expected_hash="abc",
+        )
+        assert handler.processed_count == 1
@@ -0,0 +1,124 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.config import SftpConfig
+from src.infrastructure.sftp.sftp_pool import SftpSessionPool, close_sftp_pools, get_sftp_pool
+
+
+def make_config(**overrides) -> SftpConfig:
+    return SftpConfig(host="test.sftp.com", username="testuser", key_path="/path/to/key", remote_path="/upload", **overrides)
+
+
+class FakeServer:
+    """Подменяет asyncssh.connect: каждое подключение - новое соединение со своим SFTP клиентом."""
+
+    def __init__(self):
+        self.connections = []
+        self.clients = []
+
+    async def connect(self, **options):
+        self.clients.append(options["client_factory"]())
+        conn = MagicMock()
+        conn.start_sftp_client = AsyncMock(return_value=AsyncMock(exit=MagicMock()))
+        conn.wait_closed = AsyncMock()
+        self.connections.append(conn)
+        return conn
+
+
+@pytest.mark.asyncio
+class TestSftpSessionPool:
+    """Тесты пула постоянных SFTP сессий."""
+
+    @pytest.fixture
+    def server(self):
+        server = FakeServer()
+        with patch('src.infrastructure.sftp.sftp_pool.asyncssh.connect', side_effect=server.connect):
+            yield server
+
+    async def test_session_reused_between_checkouts(self, server: FakeServer):
+        """Вторая загрузка получает ту же сессию без нового SSH подключения."""
+        pool = SftpSessionPool(make_config())
+
+        async with pool.session() as first:
+            await first.sftp.put("a.csv", "/upload/a.csv")
+        async with pool.session() as second:
+            await second.sftp.put("b.csv", "/upload/b.csv")
+
+        assert second is first
+        assert len(server.connections) == 1
+        server.connections[0].close.assert_not_called()
+
+    async def test_failed_session_is_replaced(self, server: FakeServer):
+        """Сессия, в которой произошла ошибка, закрывается; следующая попытка подключается заново."""
+        pool = SftpSessionPool(make_config())
+
+        with pytest.raises(OSError):
+            async with pool.session():
+                raise OSError("connection reset")
+        async with pool.session():
+            pass
+
+        assert len(server.connections) == 2
+        server.connections[0].close.assert_called_once()
+
+    async def test_lost_connection_reconnects(self, server: FakeServer):
+        """Разорванное (например, по keepalive) соединение не выдается из пула."""
+        pool = SftpSessionPool(make_config())
+
+        async with pool.session():
+            pass
+        server.clients[0].connection_lost(None)
+        async with pool.session():
+            pass
+
+        assert len(server.connections) == 2
+
+    async def test_idle_session_checked_before_checkout(self, server: FakeServer):
+        """Сессия, простоявшая дольше keepalive_interval, проверяется запросом; сломанная заменяется."""
+        pool = SftpSessionPool(make_config(keepalive_interval=0))
+
+        async with pool.session() as session:
+            session.sftp.realpath.side_effect = OSError("broken pipe")
+        async with pool.session() as session:
+            pass
+
+        assert len(server.connections) == 2
+        assert session.conn is server.connections[1]
+
+    async def test_expired_session_closed(self, server: FakeServer):
+        """Сессия, простоявшая дольше pool_max_idle, закрывается."""
+        pool = SftpSessionPool(make_config(pool_max_idle=0.05))
+
+        async with pool.session():
+            pass
+        await asyncio.sleep(0.3)
+
+        server.connections[0].close.assert_called_once()
+        async with pool.session():
+            pass
+        assert len(server.connections) == 2
+        await pool.close()
+
+    async def test_pool_size_limits_sessions(self, server: FakeServer):
+        """Больше pool_size сессий не открывается; ожидание ограничено pool_checkout_timeout."""
+        pool = SftpSessionPool(make_config(pool_size=1, pool_checkout_timeout=0.05))
+
+        async with pool.session():
+            with pytest.raises(asyncio.TimeoutError):
+                async with pool.session():
+                    pass
+
+        assert len(server.connections) == 1
+
+
+@pytest.mark.asyncio
+async def test_shared_pool_per_endpoint():
+    """Пул общий для одинаковых настроек сервера; другой порт того же хоста - другой пул."""
+    try:
+        pool = get_sftp_pool(make_config())
+        assert get_sftp_pool(make_config()) is pool
+        assert get_sftp_pool(make_config(port=2222)) is not pool
+    finally:
+        await close_sftp_pools()
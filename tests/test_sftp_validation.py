@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import hashlib
 import tempfile
@@ -6,6 +7,7 @@ from unittest.mock import AsyncMock, MagicMock, patch, ANY
 from pathlib import Path
 
 from src.config import SftpConfig
+from src.domain.services import UploadRequest
 from src.infrastructure.sftp.sftp_uploader import SftpUploadService
 
 
@@ -75,6 +77,7 @@ class TestSftpValidation:
         mock_conn.start_sftp_client = AsyncMock(return_value=mock_sftp)
         mock_conn.close = MagicMock()
         mock_conn.wait_closed = AsyncMock()
+        mock_conn.run = AsyncMock(return_value=MagicMock(exit_status=127, stdout="", stderr="command not found"))
 
         # Настраиваем мок для валидации - файл будет "скачан" корректно
         def mock_get_side_effect(remote_file, local_file):
@@ -94,7 +97,9 @@ class TestSftpValidation:
 
             # Проверяем результат
             assert result is True
-            mock_sftp.put.assert_called_once_with(local_path, remote_path)
+            # Загрузка под временным именем и переименование после проверки
+            mock_sftp.put.assert_called_once_with(local_path, "/upload/.test_file.csv.part")
+            mock_sftp.posix_rename.assert_called_once_with("/upload/.test_file.csv.part", remote_path)
             mock_sftp.get.assert_called_once()
 
         finally:
@@ -203,3 +208,332 @@ class TestSftpValidation:
 
         finally:
             os.unlink(local_path)
+
+    def _remote_storage(self):
+        """Мок SFTP, который хранит загруженные файлы в памяти."""
+        remote = {}
+        mock_sftp = AsyncMock()
+        mock_sftp.exit = MagicMock()
+
+        async def put(local_file, remote_file, **options):
+            with open(local_file, 'rb') as src:
+                remote[remote_file] = src.read()
+
+        async def get(remote_file, local_file):
+            with open(local_file, 'wb') as dst:
+                dst.write(remote[remote_file])
+
+        async def posix_rename(old_path, new_path):
+            remote[new_path] = remote.pop(old_path)
+
+        async def remove(remote_file):
+            del remote[remote_file]
+
+        def open_file(remote_file, mode, **options):
+            content = remote[remote_file] = bytearray()
+
+            async def write(data, offset):
+                content.extend(b"\0" * (offset + len(data) - len(content)))
+                content[offset:offset + len(data)] = data
+
+            handle = MagicMock()
+            handle.write = AsyncMock(side_effect=write)
+            handle.__aenter__ = AsyncMock(return_value=handle)
+            handle.__aexit__ = AsyncMock(return_value=False)
+            return handle
+
+        mock_sftp.put.side_effect = put
+        mock_sftp.get.side_effect = get
+        mock_sftp.open = MagicMock(side_effect=open_file)
+        mock_sftp.posix_rename.side_effect = posix_rename
+        mock_sftp.remove.side_effect = remove
+        mock_conn = AsyncMock()
+        mock_conn.start_sftp_client = AsyncMock(return_value=mock_sftp)
+        mock_conn.close = MagicMock()
+        # На сервере нет команд подсчета SHA256: проверка скачиванием
+        mock_conn.run = AsyncMock(return_value=MagicMock(exit_status=127, stdout="", stderr="command not found"))
+        return remote, mock_conn
+
+    @pytest.mark.parametrize("compression", ["gzip", "zstd"])
+    async def test_compressed_upload(self, sftp_config: SftpConfig, tmp_path: Path, compression: str):
+        """Проверяет загрузку сжатого файла с расширением и проверкой хеша сжатой копии."""
+        if compression == "zstd":
+            pytest.importorskip("zstandard")
+        content = "SERIJSKI BROJ,KUPAC\n" + "".join(f"{i},21187798 - JugoExsim d.o.o.\n" for i in range(5000))
+        local_path = tmp_path / "list.csv"
+        local_path.write_text(content)
+        service = SftpUploadService(config=sftp_config.model_copy(update={"compression": compression}))
+        remote, mock_conn = self._remote_storage()
+
+        with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+            result = await service.upload_file_with_validation(
+                local_path=str(local_path),
+                remote_path="/upload/list.csv",
+                expected_hash=hashlib.sha256(content.encode()).hexdigest(),
+            )
+
+        assert result is True
+        remote_path = service.remote_path_for("/upload/list.csv")
+        assert list(remote) == [remote_path]
+        assert remote_path == "/upload/list.csv" + (".gz" if compression == "gzip" else ".zst")
+        if compression == "gzip":
+            import gzip
+            assert gzip.decompress(remote[remote_path]).decode() == content
+        else:
+            import zstandard
+            assert zstandard.ZstdDecompressor().decompressobj().decompress(remote[remote_path]).decode() == content
+        assert len(remote[remote_path]) * 10 < len(content)
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["list.csv"]
+
+    async def test_compressed_upload_rejects_changed_local_file(self, sftp_config: SftpConfig, tmp_path: Path):
+        """Файл, не совпадающий с ожидаемым хешем, не загружается на SFTP."""
+        local_path = tmp_path / "list.csv"
+        local_path.write_text("changed after conversion")
+        service = SftpUploadService(config=sftp_config.model_copy(update={"compression": "gzip"}))
+        remote, mock_conn = self._remote_storage()
+
+        with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+            result = await service.upload_file_with_validation(
+                local_path=str(local_path), remote_path="/upload/list.csv", expected_hash="0" * 64,
+            )
+
+        assert result is False
+        assert remote == {}
+
+    def _exec_server(self, stdout: str, exit_status: int = 0, stderr: str = ""):
+        """Мок соединения, на котором удаленная команда возвращает `stdout`."""
+        remote, mock_conn = self._remote_storage()
+        mock_conn.run = AsyncMock(return_value=MagicMock(exit_status=exit_status, stdout=stdout, stderr=stderr))
+        return remote, mock_conn
+
+    async def test_sha256sum_verification_without_download(self, service: SftpUploadService):
+        """Хеш считается командой на сервере; файл обратно не скачивается."""
+        local_path, expected_hash = self.create_test_file("verified on the server")
+        remote, mock_conn = self._exec_server(f"{expected_hash}  /upload/test_file.csv\n")
+
+        try:
+            with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+                result = await service.upload_file_with_validation(local_path, "/upload/test_file.csv", expected_hash)
+
+            assert result is True
+            mock_conn.run.assert_called_once_with("sha256sum -- /upload/.test_file.csv.part", check=False, timeout=ANY)
+            mock_conn.start_sftp_client.return_value.get.assert_not_called()
+        finally:
+            os.unlink(local_path)
+
+    async def test_sha256sum_mismatch_removes_file(self, service: SftpUploadService):
+        """Несовпадение хеша, посчитанного на сервере, - неуспешная загрузка с удалением файла."""
+        local_path, expected_hash = self.create_test_file("corrupted on the way")
+        remote, mock_conn = self._exec_server(f"{'0' * 64}  /upload/test_file.csv\n")
+
+        try:
+            with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+                result = await service.upload_file_with_validation(local_path, "/upload/test_file.csv", expected_hash)
+
+            assert result is False
+            assert mock_conn.start_sftp_client.return_value.remove.call_count == 3
+        finally:
+            os.unlink(local_path)
+
+    async def test_falls_back_to_download_without_shell(self, service: SftpUploadService):
+        """Сервер только с SFTP: проверка скачиванием, команда больше не пробуется."""
+        local_path, expected_hash = self.create_test_file("sftp only server")
+        remote, mock_conn = self._exec_server("", exit_status=1, stderr="This service allows sftp connections only.\n")
+
+        try:
+            with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+                assert await service.upload_file_with_validation(local_path, "/upload/a.csv", expected_hash) is True
+                assert await service.upload_file_with_validation(local_path, "/upload/b.csv", expected_hash) is True
+
+            assert mock_conn.run.call_count == 1  # Только для первого файла
+            assert mock_conn.start_sftp_client.return_value.get.call_count == 2
+        finally:
+            os.unlink(local_path)
+
+    async def test_missing_sha256sum_tries_shasum(self, service: SftpUploadService):
+        """sha256sum не найден (код 127): хеш считается следующей командой, без скачивания."""
+        local_path, expected_hash = self.create_test_file("bsd server")
+        remote, mock_conn = self._exec_server("")
+        mock_conn.run.side_effect = [
+            MagicMock(exit_status=127, stdout="", stderr="sh: sha256sum: command not found"),
+            MagicMock(exit_status=0, stdout=f"{expected_hash}  /upload/test_file.csv\n", stderr=""),
+        ]
+
+        try:
+            with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+                assert await service.upload_file_with_validation(local_path, "/upload/test_file.csv", expected_hash) is True
+
+            assert mock_conn.run.call_args.args[0].startswith("shasum -a 256 --")
+            mock_conn.start_sftp_client.return_value.get.assert_not_called()
+        finally:
+            os.unlink(local_path)
+
+    async def test_failed_sha256sum_is_not_marked_unsupported(self, service: SftpUploadService):
+        """Ошибка команды (не 'не найдена') - неуспешная проверка, способ не отключается."""
+        local_path, expected_hash = self.create_test_file("transient failure")
+        remote, mock_conn = self._exec_server("", exit_status=1, stderr="sha256sum: Input/output error\n")
+
+        try:
+            with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+                result = await service.upload_file_with_validation(local_path, "/upload/test_file.csv", expected_hash)
+
+            assert result is False
+            assert remote == {}
+            assert mock_conn.run.call_count == 3  # По одной команде на каждую попытку, shasum не пробуется
+            assert "sha256sum" in service._verification_candidates()
+            mock_conn.start_sftp_client.return_value.get.assert_not_called()
+        finally:
+            os.unlink(local_path)
+
+    async def test_stat_verification(self, sftp_config: SftpConfig):
+        """Режим stat: файл загружается с mtime исходного и сверяется по размеру и mtime."""
+        service = SftpUploadService(config=sftp_config.model_copy(update={"verification": "stat"}))
+        local_path, expected_hash = self.create_test_file("cheap check")
+        local = os.stat(local_path)
+        remote, mock_conn = self._remote_storage()
+        mock_sftp = mock_conn.start_sftp_client.return_value
+        mock_sftp.stat = AsyncMock(return_value=MagicMock(size=local.st_size, mtime=int(local.st_mtime)))
+
+        try:
+            with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+                result = await service.upload_file_with_validation(local_path, "/upload/test_file.csv", expected_hash)
+
+            assert result is True
+            mock_sftp.put.assert_called_once_with(local_path, "/upload/.test_file.csv.part", preserve=True)
+            mock_sftp.get.assert_not_called()
+        finally:
+            os.unlink(local_path)
+
+    async def test_failed_validation_never_exposes_file(self, service: SftpUploadService):
+        """Файл, не прошедший проверку, не появляется под настоящим именем и удаляется."""
+        local_path, _ = self.create_test_file("will not validate")
+        remote, mock_conn = self._exec_server(f"{'0' * 64}  -\n")
+
+        try:
+            with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+                result = await service.upload_file_with_validation(local_path, "/upload/test_file.csv", "f" * 64)
+
+            assert result is False
+            assert remote == {}
+            mock_conn.start_sftp_client.return_value.posix_rename.assert_not_called()
+        finally:
+            os.unlink(local_path)
+
+    async def test_cleanup_stale_uploads(self, service: SftpUploadService):
+        """При запуске удаляются только временные файлы загрузок."""
+        remote, mock_conn = self._remote_storage()
+        remote.update({"/upload/.list.csv.part": b"partial", "/upload/list.csv": b"done", "/upload/.keep": b""})
+        mock_sftp = mock_conn.start_sftp_client.return_value
+        mock_sftp.listdir.side_effect = lambda path: [name.rsplit("/", 1)[1] for name in remote]
+
+        with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+            removed = await service.cleanup_stale_uploads()
+
+        assert removed == 1
+        assert sorted(remote) == ["/upload/.keep", "/upload/list.csv"]
+
+    async def test_batch_upload_shares_one_session(self, sftp_config: SftpConfig, tmp_path: Path):
+        """Пакет файлов идет по одному SSH соединению, не больше upload_concurrency одновременно."""
+        config = sftp_config.model_copy(update={"upload_concurrency": 2, "block_size": 65536, "max_requests": 128})
+        service = SftpUploadService(config=config)
+        remote, mock_conn = self._remote_storage()
+        mock_sftp = mock_conn.start_sftp_client.return_value
+        store = mock_sftp.put.side_effect
+        active, peak = 0, 0
+
+        async def put(local_file, remote_file, **options):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            await store(local_file, remote_file)
+            active -= 1
+
+        mock_sftp.put.side_effect = put
+        files = []
+        for index in range(4):
+            local_path = tmp_path / f"list{index}.csv"
+            local_path.write_text(f"file {index}")
+            files.append(UploadRequest(str(local_path), f"/upload/list{index}.csv", hashlib.sha256(f"file {index}".encode()).hexdigest()))
+
+        with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn) as connect:
+            results = await service.upload_files_with_validation(files)
+
+        assert results == [True] * 4
+        assert sorted(remote) == [f"/upload/list{index}.csv" for index in range(4)]
+        assert connect.await_count == 1
+        assert peak == 2
+        mock_sftp.put.assert_any_call(files[0].local_path, "/upload/.list0.csv.part", block_size=65536, max_requests=128)
+
+    async def test_batch_upload_results_per_file(self, service: SftpUploadService, tmp_path: Path):
+        """Несовпадение хеша одного файла не мешает остальным; повторяется только он."""
+        good, bad = tmp_path / "good.csv", tmp_path / "bad.csv"
+        good.write_text("good")
+        bad.write_text("bad")
+        remote, mock_conn = self._remote_storage()
+
+        with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+            results = await service.upload_files_with_validation([
+                UploadRequest(str(bad), "/upload/bad.csv", "0" * 64),
+                UploadRequest(str(good), "/upload/good.csv", hashlib.sha256(b"good").hexdigest()),
+            ])
+
+        assert results == [False, True]
+        assert list(remote) == ["/upload/good.csv"]
+        puts = [call.args[1] for call in mock_conn.start_sftp_client.return_value.put.await_args_list]
+        assert puts.count("/upload/.bad.csv.part") == 3
+        assert puts.count("/upload/.good.csv.part") == 1
+
+    @staticmethod
+    async def _chunks(content: bytes, size: int = 300 * 1024, error: Exception = None):
+        for offset in range(0, len(content), size):
+            await asyncio.sleep(0)
+            yield content[offset:offset + size]
+        if error is not None:
+            raise error
+
+    async def test_upload_stream(self, service: SftpUploadService, tmp_path: Path):
+        """Поток пишется в файл на SFTP блоками по мере получения; хеш считается по ходу."""
+        content = os.urandom(3 * 1024 * 1024 + 123)
+        remote, mock_conn = self._remote_storage()
+        local_copy = tmp_path / "list.csv"
+
+        with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+            result = await service.upload_stream(self._chunks(content), "/upload/list.csv", local_copy=str(local_copy))
+
+        assert result == ("/upload/list.csv", hashlib.sha256(content).hexdigest(), len(content))
+        assert list(remote) == ["/upload/list.csv"] and bytes(remote["/upload/list.csv"]) == content
+        assert local_copy.read_bytes() == content
+        mock_sftp = mock_conn.start_sftp_client.return_value
+        mock_sftp.open.assert_called_once_with("/upload/.list.csv.part", "wb")
+        mock_sftp.put.assert_not_called()
+
+    async def test_upload_stream_retries_from_local_copy(self, service: SftpUploadService, tmp_path: Path):
+        """Сбой передачи потока: остаток дописывается в локальную копию, и она загружается с повторами."""
+        content = os.urandom(2 * 1024 * 1024)
+        remote, mock_conn = self._remote_storage()
+        mock_sftp = mock_conn.start_sftp_client.return_value
+        mock_sftp.open.side_effect = OSError("connection reset")
+        local_copy = tmp_path / "list.csv"
+
+        with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+            result = await service.upload_stream(self._chunks(content), "/upload/list.csv", local_copy=str(local_copy))
+
+        assert result is not None and result.sha256 == hashlib.sha256(content).hexdigest()
+        assert bytes(remote["/upload/list.csv"]) == content
+        mock_sftp.put.assert_called_once_with(str(local_copy), "/upload/.list.csv.part")
+
+    async def test_upload_stream_source_error(self, service: SftpUploadService, tmp_path: Path):
+        """Ошибка источника пробрасывается; временный файл и неполная локальная копия удаляются."""
+        remote, mock_conn = self._remote_storage()
+        local_copy = tmp_path / "list.csv"
+
+        with patch('src.infrastructure.sftp.sftp_uploader.asyncssh.connect', new_callable=AsyncMock, return_value=mock_conn):
+            with pytest.raises(ValueError, match="broken workbook"):
+                await service.upload_stream(
+                    self._chunks(b"x" * 2048, size=512, error=ValueError("broken workbook")),
+                    "/upload/list.csv", local_copy=str(local_copy),
+                )
+
+        assert remote == {}
+        assert not local_copy.exists()
@@ -0,0 +1,102 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import base64
+import hashlib
+import quopri
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from src.infrastructure.storage.spool import AttachmentSpool, TransferDecoder, dated_storage_dir
+
+# =====================================
+# 2. Тесты
+# =====================================
+
+def _feed_in_chunks(decoder: TransferDecoder, data: bytes, chunk_size: int) -> bytes:
+    result = b''.join(decoder.feed(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size))
+    return result + decoder.flush()
+
+class TestTransferDecoder:
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 76, 1000])
+    def test_base64_any_chunk_boundary(self, chunk_size):
+        """Проверяет, что разрез base64 в любом месте не портит данные."""
+        payload = bytes(range(256)) * 10
+        encoded = base64.encodebytes(payload)
+
+        assert _feed_in_chunks(TransferDecoder('base64'), encoded, chunk_size) == payload
+
+    @pytest.mark.parametrize("chunk_size", [1, 5, 64])
+    def test_quoted_printable_soft_line_breaks(self, chunk_size):
+        """Проверяет quoted-printable с мягкими переносами, разрезанными между кусками."""
+        payload = ("Стоп-лист " * 30).encode("utf-8")
+        encoded = quopri.encodestring(payload)
+
+        assert _feed_in_chunks(TransferDecoder('quoted-printable'), encoded, chunk_size) == payload
+
+class TestAttachmentSpool:
+
+    def test_commit_writes_file_with_hash(self, tmp_path: Path):
+        """Проверяет запись, размер, хеш и отсутствие временного файла после commit."""
+        payload = b"xlsx" * 1000
+        encoded = base64.encodebytes(payload)
+
+        with AttachmentSpool(str(tmp_path), "report.xlsx", "base64") as spool:
+            for i in range(0, len(encoded), 100):
+                spool.write(encoded[i:i + 100])
+            attachment = spool.commit()
+
+        assert attachment.size == len(payload)
+        assert attachment.sha256 == hashlib.sha256(payload).hexdigest()
+        assert Path(attachment.path).read_bytes() == payload
+        assert [p.name for p in tmp_path.iterdir()] == ["report.xlsx"]
+
+    def test_failed_download_leaves_no_file(self, tmp_path: Path):
+        """Проверяет, что оборванная загрузка не оставляет файлов."""
+        with pytest.raises(ConnectionError):
+            with AttachmentSpool(str(tmp_path), "report.xlsx") as spool:
+                spool.write(b"partial")
+                raise ConnectionError("IMAP connection lost")
+
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.parametrize("memory_limit, in_memory", [(10_000, True), (1_000, False)])
+    def test_memory_limit(self, tmp_path: Path, memory_limit: int, in_memory: bool):
+        """Проверяет, что небольшое вложение остается в памяти, а большое переносится на диск."""
+        payload = bytes(range(256)) * 16
+        encoded = base64.encodebytes(payload)
+
+        with AttachmentSpool(str(tmp_path), "report.xlsx", "base64", memory_limit=memory_limit) as spool:
+            for i in range(0, len(encoded), 100):
+                spool.write(encoded[i:i + 100])
+            attachment = spool.commit()
+
+        assert attachment.size == len(payload)
+        assert attachment.sha256 == hashlib.sha256(payload).hexdigest()
+        assert attachment.content == (payload if in_memory else None)
+        # Для вложения в памяти на диске остается только пустой скрытый резерв имени
+        if in_memory:
+            assert not Path(attachment.path).exists()
+            assert [p.name for p in tmp_path.iterdir()] == [".report.xlsx.part"]
+            assert (tmp_path / ".report.xlsx.part").read_bytes() == b""
+        else:
+            assert Path(attachment.path).read_bytes() == payload
+            assert [p.name for p in tmp_path.iterdir()] == ["report.xlsx"]
+
+    def test_reserved_name_gets_unique_suffix(self, tmp_path: Path):
+        """Проверяет, что скрытый резерв имени вложения в памяти занимает имя для следующего вложения."""
+        names = []
+        for payload in (b"first", b"second"):
+            with AttachmentSpool(str(tmp_path), "report.xlsx", unique_suffix="42", memory_limit=1_000) as spool:
+                spool.write(payload)
+                names.append(Path(spool.commit().path).name)
+
+        assert names == ["report.xlsx", "report_42.xlsx"]
+
+    def test_dated_storage_dir(self, tmp_path: Path):
+        path = dated_storage_dir(str(tmp_path), datetime(2025, 7, 29))
+        assert Path(path) == tmp_path / "ps" / "2025" / "07" / "29"
+        assert Path(path).is_dir()
@@ -0,0 +1,125 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import csv
+import hashlib
+import time
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.config import DeltaConfig
+from src.domain.models import ProcessedFile
+from src.infrastructure.storage.stoplist_delta import (
+    DeltaError,
+    StoplistDeltaService,
+    compute_delta,
+    write_delta_csv,
+)
+
+HEADER = ["", "Row Number", "SERIJSKI BROJ", "ID", "KUPAC", "", "KATEGORIJA VOZILA", "REGISTARSKI BROJ VOZILA", "STATUS"]
+
+# =====================================
+# 2. Вспомогательные функции
+# =====================================
+
+def _vehicle(serial: int, plate: str = "VA083PD", status: str = "Bela lista") -> list:
+    return [str(serial), str(serial + 1000), "21187798 - JugoExsim d.o.o.", "", "3", plate, status]
+
+def _write_stoplist(path: Path, vehicles) -> Path:
+    """CSV в том виде, в каком его дает конвертер: заголовок отчета, пустая строка, таблица."""
+    with open(path, "w", encoding="utf-8-sig", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Unnamed: 0", "PREGLED ENP UREĐAJA UGOVORA O SARADNJI"] + [f"Unnamed: {i}" for i in range(2, 9)])
+        writer.writerow([""] * 9)
+        writer.writerow(HEADER)
+        for number, vehicle in enumerate(vehicles, start=1):
+            writer.writerow(["", str(number), *vehicle])
+    return path
+
+# =====================================
+# 3. Тесты
+# =====================================
+
+class TestComputeDelta:
+
+    def test_added_removed_changed(self, tmp_path: Path):
+        """Проверяет классификацию строк; сдвиг Row Number не считается изменением."""
+        previous = _write_stoplist(tmp_path / "prev.csv", [_vehicle(1), _vehicle(2), _vehicle(3)])
+        current = _write_stoplist(tmp_path / "curr.csv", [_vehicle(2), _vehicle(3, status="Crna lista"), _vehicle(4)])
+
+        delta = compute_delta(str(previous), str(current), ["SERIJSKI BROJ"], ["Row Number"])
+
+        assert [row[2] for row in delta.added] == ["4"]
+        assert [row[2] for row in delta.removed] == ["1"]
+        assert [(row[2], row[8]) for row in delta.changed] == [("3", "Crna lista")]
+        assert delta.summary() == {"added": 1, "removed": 1, "changed": 1, "unchanged": 1, "duplicate_keys": 0}
+
+    def test_write_delta_csv(self, tmp_path: Path):
+        """Проверяет формат CSV дельты и хеш, посчитанный при записи."""
+        previous = _write_stoplist(tmp_path / "prev.csv", [_vehicle(1)])
+        current = _write_stoplist(tmp_path / "curr.csv", [_vehicle(2)])
+        delta_path = tmp_path / "delta.csv"
+
+        sha256 = write_delta_csv(compute_delta(str(previous), str(current), ["SERIJSKI BROJ"]), str(delta_path))
+
+        assert sha256 == hashlib.sha256(delta_path.read_bytes()).hexdigest()
+        with open(delta_path, encoding="utf-8-sig", newline="") as csv_file:
+            rows = list(csv.reader(csv_file))
+        assert rows[0] == ["CHANGE", *HEADER]
+        assert [(row[0], row[3]) for row in rows[1:]] == [("added", "2"), ("removed", "1")]
+
+    def test_missing_key_column(self, tmp_path: Path):
+        stoplist = _write_stoplist(tmp_path / "list.csv", [_vehicle(1)])
+        with pytest.raises(DeltaError):
+            compute_delta(str(stoplist), str(stoplist), ["VIN"])
+
+    def test_100k_rows_under_a_second(self, tmp_path: Path):
+        """Проверяет, что сравнение списков по 100 тыс. строк занимает меньше секунды."""
+        vehicles = [_vehicle(serial) for serial in range(100_000)]
+        previous = _write_stoplist(tmp_path / "prev.csv", vehicles)
+        vehicles[500] = _vehicle(500, plate="BG1420SU")
+        current = _write_stoplist(tmp_path / "curr.csv", vehicles[300:] + [_vehicle(200_000)])
+
+        started = time.perf_counter()
+        delta = compute_delta(str(previous), str(current), ["SERIJSKI BROJ"], ["Row Number"])
+        duration = time.perf_counter() - started
+
+        assert delta.summary()["added"] == 1
+        assert delta.summary()["removed"] == 300
+        assert delta.summary()["changed"] == 1
+        assert duration < 1.0
+
+@pytest.mark.asyncio
+class TestStoplistDeltaService:
+
+    def _file(self, csv_path: Path, day: int) -> ProcessedFile:
+        return ProcessedFile(
+            id=day, message_id=f"uid-{day}", sender_email="lists@jugoexsim.rs", file_name="lista.xlsx",
+            file_path=str(csv_path.with_suffix(".xlsx")), csv_path=str(csv_path), file_hash="h",
+            email_date=datetime(2025, 7, day),
+        )
+
+    async def test_build_delta_against_previous_list(self, tmp_path: Path):
+        previous = _write_stoplist(tmp_path / "RS_stoplist_20250728.csv", [_vehicle(1), _vehicle(2)])
+        current = _write_stoplist(tmp_path / "RS_stoplist_20250729.csv", [_vehicle(2), _vehicle(3)])
+        repo = AsyncMock()
+        repo.find_previous_by_sender.return_value = self._file(previous, 28)
+        service = StoplistDeltaService(repo, DeltaConfig())
+
+        delta = await service.build_delta(self._file(current, 29))
+
+        repo.find_previous_by_sender.assert_awaited_once_with("lists@jugoexsim.rs", datetime(2025, 7, 29))
+        assert Path(delta.path) == tmp_path / "RS_stoplist_20250729_delta.csv"
+        assert delta.sha256 == hashlib.sha256(Path(delta.path).read_bytes()).hexdigest()
+        assert delta.summary["added"] == 1 and delta.summary["removed"] == 1
+        assert delta.summary["previous_csv"] == str(previous)
+
+    async def test_first_list_has_no_delta(self, tmp_path: Path):
+        current = _write_stoplist(tmp_path / "RS_stoplist_20250729.csv", [_vehicle(1)])
+        repo = AsyncMock()
+        repo.find_previous_by_sender.return_value = None
+
+        assert await StoplistDeltaService(repo).build_delta(self._file(current, 29)) is None
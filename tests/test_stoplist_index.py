@@ -0,0 +1,184 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import csv
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.application.handlers.main_handler import MainHandler
+from src.config import LookupConfig, get_config
+from src.domain.models import ProcessedFile
+from src.domain.services import EmailAttachment, RawEmail
+from src.infrastructure.patterns.process_shared import ProcessShared
+from src.infrastructure.storage import stoplist_index
+from src.infrastructure.storage.stoplist_index import (
+    StoplistIndex,
+    StoplistIndexHolder,
+    get_stoplist_index,
+    normalize_code,
+    normalize_plate,
+)
+
+HEADER = ["", "Row Number", "SERIJSKI BROJ", "ID", "KUPAC", "", "KATEGORIJA VOZILA", "REGISTARSKI BROJ VOZILA", "STATUS"]
+
+# =====================================
+# 2. Вспомогательные функции
+# =====================================
+
+def _vehicle(serial: int, plate: str = "VA083PD", status: str = "Bela lista") -> list:
+    return [str(serial), str(serial + 1000), "21187798 - JugoExsim d.o.o.", "", "3", plate, status]
+
+def _write_stoplist(path: Path, vehicles) -> Path:
+    """CSV в том виде, в каком его дает конвертер: заголовок отчета, пустая строка, таблица."""
+    with open(path, "w", encoding="utf-8-sig", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Unnamed: 0", "PREGLED ENP UREĐAJA UGOVORA O SARADNJI"] + [f"Unnamed: {i}" for i in range(2, 9)])
+        writer.writerow([""] * 9)
+        writer.writerow(HEADER)
+        for number, vehicle in enumerate(vehicles, start=1):
+            writer.writerow(["", str(number), *vehicle])
+    return path
+
+# =====================================
+# 3. Тесты
+# =====================================
+
+class TestNormalization:
+
+    def test_normalize_plate(self):
+        assert normalize_plate(" bg 142-0su ") == "BG1420SU"
+        assert normalize_plate("NS.123/AB") == "NS123AB"
+
+    def test_normalize_code(self):
+        assert normalize_code(" 364128967.0 ") == "364128967"
+        assert normalize_code("A1.0") == "A1.0"
+
+class TestStoplistIndex:
+
+    def test_lookup_by_each_key(self, tmp_path: Path):
+        """Проверяет поиск по номеру, серийному номеру и ID с нормализацией запроса."""
+        path = _write_stoplist(tmp_path / "list.csv", [_vehicle(1, "BG1420SU"), _vehicle(2, "NS123AB", "Crna lista")])
+
+        index = StoplistIndex.from_csv(str(path))
+
+        assert index.rows == 2
+        assert index.lookup(plate="bg 142-0su")[0]["SERIJSKI BROJ"] == "1"
+        assert index.lookup(serial="2.0")[0]["STATUS"] == "Crna lista"
+        assert index.lookup(id="1001")[0]["REGISTARSKI BROJ VOZILA"] == "BG1420SU"
+        assert index.lookup(plate="XX000XX") == []
+
+    def test_duplicate_plate_and_union_of_keys(self, tmp_path: Path):
+        """Несколько строк с одним номером возвращаются все, совпадения по разным ключам - без повторов."""
+        path = _write_stoplist(tmp_path / "list.csv", [_vehicle(1, "VA083PD"), _vehicle(2, "VA083PD"), _vehicle(3, "NS123AB")])
+
+        index = StoplistIndex.from_csv(str(path))
+
+        assert [row["SERIJSKI BROJ"] for row in index.lookup(plate="VA083PD")] == ["1", "2"]
+        assert [row["SERIJSKI BROJ"] for row in index.lookup(plate="VA083PD", serial="2", id="1003")] == ["1", "2", "3"]
+
+    def test_only_configured_columns_returned(self, tmp_path: Path):
+        path = _write_stoplist(tmp_path / "list.csv", [_vehicle(1)])
+
+        index = StoplistIndex.from_csv(str(path), LookupConfig(result_columns=["SERIJSKI BROJ", "STATUS"]))
+
+        assert index.lookup(serial="1") == [{"SERIJSKI BROJ": "1", "STATUS": "Bela lista"}]
+
+    def test_missing_columns(self, tmp_path: Path):
+        path = tmp_path / "other.csv"
+        path.write_text("a,b,c\n1,2,3\n", encoding="utf-8")
+
+        with pytest.raises(ValueError):
+            StoplistIndex.from_csv(str(path))
+
+@pytest.mark.asyncio
+class TestStoplistIndexHolder:
+
+    async def test_load_replaces_index(self, tmp_path: Path):
+        first = _write_stoplist(tmp_path / "first.csv", [_vehicle(1)])
+        second = _write_stoplist(tmp_path / "second.csv", [_vehicle(2), _vehicle(3)])
+        holder = StoplistIndexHolder()
+
+        assert await holder.load(str(first), datetime(2025, 7, 28))
+        previous = holder.current
+        assert await holder.load(str(second), datetime(2025, 7, 29))
+
+        assert holder.current is not previous
+        assert holder.current.rows == 2
+        assert previous.rows == 1  # Старый индекс не изменяется, пока его читают запросы
+
+    async def test_older_list_is_ignored(self, tmp_path: Path):
+        """Файл, обработанный позже, но с более ранней датой письма, не заменяет индекс."""
+        newer = _write_stoplist(tmp_path / "newer.csv", [_vehicle(1)])
+        older = _write_stoplist(tmp_path / "older.csv", [_vehicle(2), _vehicle(3)])
+        holder = StoplistIndexHolder()
+
+        await holder.load(str(newer), datetime(2025, 7, 29))
+        assert not await holder.load(str(older), datetime(2025, 7, 28))
+
+        assert holder.current.source == str(newer)
+
+    async def test_main_handler_refreshes_index(self):
+        """Проверяет, что MainHandler загружает новый CSV в индекс, а ошибка индекса не прерывает обработку."""
+        holder = MagicMock()
+        holder.load = AsyncMock(side_effect=ValueError("broken csv"))
+        handler = MainHandler(
+            email_service=AsyncMock(), file_service=AsyncMock(), sftp_service=AsyncMock(),
+            file_repo=AsyncMock(), log_repo=AsyncMock(), notification_service=[],
+            stoplist_index=holder,
+        )
+        created = ProcessedFile(
+            message_id="msg-1", sender_email="lists@jugoexsim.rs", file_name="list.xlsx",
+            file_path="/storage/list.xlsx", csv_path="/storage/list.csv", file_hash="abc",
+            email_date=datetime(2025, 7, 29),
+        )
+
+        await handler._refresh_index(created)
+
+        holder.load.assert_awaited_once_with("/storage/list.csv", datetime(2025, 7, 29))
+
+    async def test_scheduler_cycle_updates_api_index(self, tmp_path: Path, monkeypatch):
+        """Индекс, обновленный обработчиком цикла (свой контейнер на цикл), виден API."""
+        monkeypatch.setenv("CONFIG_PATH", "config/config.test.yaml")
+        monkeypatch.setattr(stoplist_index, "_holders", ProcessShared())
+        get_config.cache_clear()
+        from src.application.api import main as api
+        from src.application.container import Container
+
+        path = _write_stoplist(tmp_path / "list.csv", [_vehicle(7, "BG1420SU")])
+        email = RawEmail(
+            message_id="msg-1", sender="lists@jugoexsim.rs", date=datetime(2025, 7, 29),
+            attachments=[EmailAttachment(filename="list.xlsx", path="/tmp/list.xlsx", size=1, sha256="h")],
+        )
+
+        async def fetch_new_emails():
+            yield email
+
+        async def add(file_entry):
+            return file_entry.model_copy(update={"id": 1})
+
+        file_service = AsyncMock()
+        file_service.save_and_convert.return_value = [{
+            "message_id": email.message_id, "sender_email": email.sender, "file_name": "list.xlsx",
+            "file_path": "/tmp/list.xlsx", "csv_path": str(path), "file_hash": "abc", "email_date": email.date,
+        }]
+        file_repo = AsyncMock()
+        file_repo.add.side_effect = add
+        # Как в trigger_email_processing: новый контейнер на цикл
+        cycle = Container()
+        handler = MainHandler(
+            email_service=MagicMock(fetch_new_emails=fetch_new_emails), file_service=file_service,
+            sftp_service=AsyncMock(), file_repo=file_repo, log_repo=AsyncMock(), notification_service=[],
+            stoplist_index=cycle.stoplist_index(),
+        )
+
+        try:
+            await handler.process_emails()
+            result = await api.stoplist_lookup(plate="BG1420SU")
+        finally:
+            get_config.cache_clear()
+
+        assert cycle.stoplist_index() is api.container.stoplist_index() is get_stoplist_index()
+        assert result["found"] and result["matches"][0]["SERIJSKI BROJ"] == "7"
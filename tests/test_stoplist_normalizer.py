@@ -0,0 +1,173 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from openpyxl import Workbook
+
+from src.config import NormalizationConfig, NormalizationRules
+from src.domain.services import EmailAttachment, RawEmail
+from src.infrastructure.storage.file_processor import FileProcessingService
+from src.infrastructure.storage.stoplist_normalizer import (
+    NormalizationError,
+    normalize_csv,
+    normalize_stoplist,
+    normalize_xlsx,
+)
+from src.infrastructure.storage.xlsx_converter import convert_xlsx_to_csv
+
+SAMPLE_XLSX = Path(__file__).resolve().parent.parent / "lista 29 07 2025.xlsx"
+
+# Лист в том виде, в каком его дает конвертер: позиционный заголовок, название отчета, таблица
+RAW_ROWS = [
+    ["Unnamed: 0", "PREGLED ENP UREĐAJA UGOVORA O SARADNJI", "Unnamed: 2", "Unnamed: 3", "Unnamed: 4", "Unnamed: 5"],
+    ["", "", "", "", "", ""],
+    ["", "Row Number", "SERIJSKI BROJ", "ID", "", "REGISTARSKI BROJ VOZILA"],
+    ["", "1", "15450109515", "364128967.0", "", " va083pd "],
+    ["", "", "", "", "", ""],
+    ["", "2", "15450109804", "364128996", "", "BG1420SU"],
+]
+
+# Та же таблица в книге: коды числами и текстом, категория числом
+SHEET_ROWS = [
+    [None, "PREGLED ENP UREĐAJA UGOVORA O SARADNJI"],
+    [],
+    [None, "Row Number", "SERIJSKI BROJ", "ID", None, "REGISTARSKI BROJ VOZILA", "KATEGORIJA VOZILA"],
+    [None, 1, 15450109515, "364128967.0", None, " va083pd ", 3],
+    [],
+    [None, 2, 15450109804, 364128996, None, "BG1420SU", 1],
+]
+
+NORMALIZED_SCHEMA = {
+    "SERIJSKI BROJ": pa.int64(),
+    "ID": pa.int64(),
+    "REGISTARSKI BROJ VOZILA": pa.dictionary(pa.int32(), pa.string()),
+    "KATEGORIJA VOZILA": pa.int64(),
+}
+
+def write_workbook(path: Path, rows: list) -> Path:
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    workbook.save(path)
+    return path
+
+# =====================================
+# 2. Тесты
+# =====================================
+
+class TestNormalizeStoplist:
+
+    def test_layout_normalized(self):
+        """Проверяет поиск заголовка, удаление пустых колонок и строк, номера и коды."""
+        table = normalize_stoplist(pd.DataFrame(RAW_ROWS, dtype=str), NormalizationRules())
+
+        assert list(table.columns) == ["SERIJSKI BROJ", "ID", "REGISTARSKI BROJ VOZILA"]
+        assert table.values.tolist() == [
+            ["15450109515", "364128967", "VA083PD"],
+            ["15450109804", "364128996", "BG1420SU"],
+        ]
+
+    def test_missing_header(self):
+        rules = NormalizationRules(header_columns=["SERIJSKI BROJ", "STATUS"])
+
+        with pytest.raises(NormalizationError):
+            normalize_stoplist(pd.DataFrame(RAW_ROWS, dtype=str), rules)
+
+    def test_scientific_notation_rejected(self):
+        rows = RAW_ROWS[:3] + [["", "1", "1.5450109515E10", "364128967", "", "VA083PD"]]
+
+        with pytest.raises(NormalizationError):
+            normalize_stoplist(pd.DataFrame(rows, dtype=str), NormalizationRules())
+
+    def test_rules_by_sender(self):
+        config = NormalizationConfig(senders={"Lists@JugoExsim.rs": NormalizationRules()})
+
+        assert config.rules_for("lists@jugoexsim.rs") is not None
+        assert config.rules_for("other@example.com") is None
+
+class TestNormalizeXlsx:
+
+    def test_matches_normalized_converter_csv(self, tmp_path: Path):
+        """Нормализация из spool пишет тот же CSV, что нормализация CSV конвертера."""
+        xlsx_path = write_workbook(tmp_path / "lista.xlsx", SHEET_ROWS)
+        rules = NormalizationRules()
+        convert_xlsx_to_csv(str(xlsx_path), str(tmp_path / "raw.csv"))
+        expected = normalize_csv(str(tmp_path / "raw.csv"), str(tmp_path / "expected.csv"), rules)
+
+        result = normalize_xlsx(str(xlsx_path), str(tmp_path / "lista.csv"), rules, str(tmp_path / "lista.parquet"))
+
+        assert (tmp_path / "lista.csv").read_bytes() == (tmp_path / "expected.csv").read_bytes()
+        assert (result.rows, result.columns, result.sha256) == (expected.rows, expected.columns, expected.sha256)
+        assert result.engine == "normalized"
+
+    def test_parquet_keeps_column_types(self, tmp_path: Path):
+        """Коды и категория в Parquet - int64, а не текст; номера остаются строками."""
+        xlsx_path = write_workbook(tmp_path / "lista.xlsx", SHEET_ROWS)
+        parquet_path = tmp_path / "lista.parquet"
+
+        normalize_xlsx(str(xlsx_path), str(tmp_path / "lista.csv"), NormalizationRules(), str(parquet_path))
+
+        schema = pq.read_schema(parquet_path)
+        assert {name: schema.field(name).type for name in NORMALIZED_SCHEMA} == NORMALIZED_SCHEMA
+        assert pq.read_table(parquet_path).column("ID").to_pylist() == [364128967, 364128996]
+
+    def test_pandas_fallback_keeps_column_types(self, tmp_path: Path):
+        """Лист, который нельзя прочитать потоково, нормализуется через pandas с теми же типами."""
+        # Одинаковые имена в первой строке потоковая конвертация не поддерживает
+        rows = [["LISTA", "LISTA"]] + SHEET_ROWS[1:]
+        xlsx_path = write_workbook(tmp_path / "lista.xlsx", rows)
+        parquet_path = tmp_path / "lista.parquet"
+
+        result = normalize_xlsx(str(xlsx_path), str(tmp_path / "lista.csv"), NormalizationRules(), str(parquet_path))
+
+        schema = pq.read_schema(parquet_path)
+        assert result.reader is None
+        assert {name: schema.field(name).type for name in NORMALIZED_SCHEMA} == NORMALIZED_SCHEMA
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["lista.csv", "lista.parquet", "lista.xlsx"]
+
+    @pytest.mark.skipif(not SAMPLE_XLSX.exists(), reason="Sample workbook is not available")
+    def test_sample_workbook_schema(self, tmp_path: Path):
+        parquet_path = tmp_path / "lista.parquet"
+
+        normalize_xlsx(str(SAMPLE_XLSX), str(tmp_path / "lista.csv"), NormalizationRules(), str(parquet_path))
+
+        schema = pq.read_schema(parquet_path)
+        assert {name: schema.field(name).type for name in NORMALIZED_SCHEMA} == NORMALIZED_SCHEMA
+        assert pa.types.is_dictionary(schema.field("STATUS").type)
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not SAMPLE_XLSX.exists(), reason="Sample workbook is not available")
+async def test_sample_workbook_normalized_for_configured_sender(tmp_path: Path):
+    """Проверяет, что нормализация применяется только к отправителю из конфигурации."""
+    content = SAMPLE_XLSX.read_bytes()
+    service = FileProcessingService(
+        base_storage_path=str(tmp_path),
+        normalization_config=NormalizationConfig(senders={"lists@jugoexsim.rs": NormalizationRules()}),
+    )
+
+    def email(message_id: str, sender: str) -> RawEmail:
+        xlsx_path = tmp_path / f"{message_id}.xlsx"
+        xlsx_path.write_bytes(content)
+        return RawEmail(
+            message_id=message_id, sender=sender, date=datetime(2025, 7, 29),
+            attachments=[EmailAttachment(
+                filename="lista.xlsx", path=str(xlsx_path), size=len(content),
+                sha256=hashlib.sha256(content).hexdigest(),
+            )],
+        )
+
+    normalized = await service.save_and_convert(email("uid-1", "lists@jugoexsim.rs"))
+    verbatim = await service.save_and_convert(email("uid-2", "other@example.com"))
+
+    table = pd.read_csv(normalized[0]['csv_path'], dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    assert list(table.columns) == ["SERIJSKI BROJ", "ID", "KUPAC", "KATEGORIJA VOZILA", "REGISTARSKI BROJ VOZILA", "STATUS"]
+    assert not table["ID"].str.endswith(".0").any()
+    assert normalized[0]['file_hash'] == hashlib.sha256(Path(normalized[0]['csv_path']).read_bytes()).hexdigest()
+    assert pd.read_csv(verbatim[0]['csv_path']).columns[1] == "PREGLED ENP UREĐAJA UGOVORA O SARADNJI"
@@ -0,0 +1,317 @@
+# =====================================
+# 1. Импорт библиотек
+# =====================================
+import hashlib
+import io
+import re
+import zipfile
+from datetime import datetime, time
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook
+
+from src.infrastructure.storage.xlsx_converter import (
+    NA_STRINGS,
+    UnsupportedLayoutError,
+    convert_xlsx_to_csv,
+    pandas_xlsx_to_csv,
+    stream_xlsx_to_csv,
+)
+from src.infrastructure.storage.xlsx_readers import READERS, calamine_available, reader_candidates
+
+SAMPLE_XLSX = Path(__file__).resolve().parent.parent / "lista 29 07 2025.xlsx"
+
+# =====================================
+# 2. Вспомогательные функции
+# =====================================
+
+def _write_workbook(path: Path, rows) -> Path:
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+def _assert_same_as_pandas(tmp_path: Path, xlsx_path: Path, reader: str = "auto") -> None:
+    expected, actual = tmp_path / "pandas.csv", tmp_path / "streaming.csv"
+    pandas_xlsx_to_csv(str(xlsx_path), str(expected))
+    result = stream_xlsx_to_csv(str(xlsx_path), str(actual), reader=reader)
+
+    assert result.engine == "streaming"
+    assert actual.read_bytes() == expected.read_bytes()
+
+_SHARED_STRINGS_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"
+_SHARED_STRINGS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"
+
+def _write_raw_workbook(path: Path, sheet_data: str, shared_strings: str) -> Path:
+    """Книга с заданным вручную XML листа и таблицей общих строк (как их пишет Excel)."""
+    template = io.BytesIO()
+    Workbook().save(template)
+    with zipfile.ZipFile(template) as source, zipfile.ZipFile(path, "w") as target:
+        for item in source.infolist():
+            content = source.read(item.filename).decode("utf-8")
+            if item.filename == "xl/worksheets/sheet1.xml":
+                content = re.sub(
+                    r"<sheetData\s*/>|<sheetData>.*</sheetData>", lambda _: f"<sheetData>{sheet_data}</sheetData>", content,
+                )
+            elif item.filename == "[Content_Types].xml":
+                content = content.replace("</Types>", (
+                    f'<Override PartName="/xl/sharedStrings.xml" ContentType="{_SHARED_STRINGS_TYPE}"/></Types>'
+                ))
+            elif item.filename == "xl/_rels/workbook.xml.rels":
+                content = content.replace("</Relationships>", (
+                    f'<Relationship Id="rIdStrings" Type="{_SHARED_STRINGS_REL}" Target="sharedStrings.xml"/>'
+                    "</Relationships>"
+                ))
+            target.writestr(item, content)
+        target.writestr("xl/sharedStrings.xml", (
+            '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f"{shared_strings}</sst>"
+        ))
+    return path
+
+def _reader_params():
+    return [
+        pytest.param(name, marks=pytest.mark.skipif(
+            name == "calamine" and not calamine_available(), reason="python-calamine is not installed",
+        ))
+        for name in READERS
+    ]
+
+# =====================================
+# 3. Тесты
+# =====================================
+
+# Наборы строк листа, для которых потоковый результат должен совпадать с pandas побайтно
+GOLDEN_CASES = {
+    "title_row_as_header": [
+        ["PREGLED ENP UREĐAJA UGOVORA O SARADNJI"],
+        [],
+        [None, "Row Number", "SERIJSKI BROJ", "ID", "KUPAC", None, "STATUS"],
+        [None, 1, "ENP-000123", 456, "Kupac, d.o.o.", None, "AKTIVAN"],
+    ],
+    "int_column_with_gap_becomes_float": [
+        ["a", "b"], [1, "x"], [None, "y"], [3, "z"],
+    ],
+    "bool_column_with_gap_becomes_float": [
+        ["flag", "name"], [True, "x"], [None, "y"], [False, "z"],
+    ],
+    "na_strings_and_quoting": [
+        ["text", "num"], ["NA", 1.5], ['say "hi"', 0.1], ["a,b", 1e-05], ["line\nbreak", 2.0],
+    ],
+    "dates_and_times": [
+        ["date", "datetime", "time"],
+        [datetime(2025, 7, 29), datetime(2025, 7, 29, 8, 30), time(8, 30)],
+        [datetime(2025, 7, 30), None, time(17, 0)],
+    ],
+    "numeric_text_next_to_real_text": [
+        ["serial"], ["0123"], [" 7 "], ["ENP-1"],
+    ],
+    "interior_blank_rows_kept_trailing_dropped": [
+        ["a", "b"], [1, 2], [], [3, 4], [], [],
+    ],
+    "header_verbatim_and_unnamed": [
+        ["NA", None, 2025, "0123"], [1, 2, 3, 4],
+    ],
+}
+
+# Лист в том виде, как его пишет Excel: общие строки с форматированием и фонетикой,
+# ячейки без координат, пропущенная строка, ошибки, булевы значения и текст формул
+RAW_SHEET = (
+    '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="C1" t="s"><v>1</v></c><c r="D1" t="s"><v>2</v></c></row>'
+    '<row><c t="s"><v>3</v></c><c><v>5</v></c><c t="b"><v>1</v></c><c t="s"><v>4</v></c></row>'
+    '<row r="4"><c r="A4" t="str"><v>formula text</v></c><c r="B4" t="e"><v>#DIV/0!</v></c>'
+    '<c r="C4" t="b"><v>0</v></c><c r="D4" t="s"><v>4</v></c></row>'
+    '<row r="5"><c r="A5" t="inlineStr"><is><r><t>in</t></r><r><t>line</t></r></is></c><c r="B5"><v>2.5</v></c>'
+    '<c r="D5" t="s"><v>4</v></c><c r="E5" s="0"/></row>'
+)
+RAW_SHARED_STRINGS = (
+    "<si><t>name</t></si><si><t>flag</t></si><si><t>comment</t></si>"
+    '<si><r><t>ri</t></r><r><rPr><b/></rPr><t>ch</t></r><rPh sb="0" eb="1"><t>ph</t></rPh></si>'
+    '<si><t xml:space="preserve">with  spaces</t></si>'
+)
+
+class TestXlsxConverter:
+
+    @pytest.mark.parametrize("case", sorted(GOLDEN_CASES))
+    def test_matches_pandas_output(self, tmp_path: Path, case: str):
+        """Проверяет побайтное совпадение CSV с результатом pandas."""
+        xlsx_path = _write_workbook(tmp_path / f"{case}.xlsx", GOLDEN_CASES[case])
+        _assert_same_as_pandas(tmp_path, xlsx_path)
+
+    @pytest.mark.parametrize("rows", [
+        [["serial"], ["0123"], ["0456"]],    # pandas превращает колонку в числа
+        [["a", "a"], [1, 2]],                # pandas переименовывает дубликаты
+        [["mixed"], [1], [True]],            # bool и числа без текста
+    ])
+    def test_ambiguous_sheets_fall_back_to_pandas(self, tmp_path: Path, rows):
+        """Проверяет, что неоднозначные листы конвертируются через pandas с тем же результатом."""
+        xlsx_path = _write_workbook(tmp_path / "ambiguous.xlsx", rows)
+
+        with pytest.raises(UnsupportedLayoutError):
+            stream_xlsx_to_csv(str(xlsx_path), str(tmp_path / "streaming.csv"))
+
+        result = convert_xlsx_to_csv(str(xlsx_path), str(tmp_path / "out.csv"))
+        pandas_xlsx_to_csv(str(xlsx_path), str(tmp_path / "pandas.csv"))
+
+        assert result.engine == "pandas"
+        assert (tmp_path / "out.csv").read_bytes() == (tmp_path / "pandas.csv").read_bytes()
+
+    @pytest.mark.parametrize("convert", [stream_xlsx_to_csv, pandas_xlsx_to_csv])
+    def test_result_carries_hash_of_written_csv(self, tmp_path: Path, convert):
+        """Проверяет, что размер и SHA256, посчитанные при записи, совпадают с файлом на диске."""
+        xlsx_path = _write_workbook(tmp_path / "hash.xlsx", GOLDEN_CASES["na_strings_and_quoting"])
+        csv_path = tmp_path / "out.csv"
+
+        result = convert(str(xlsx_path), str(csv_path))
+
+        content = csv_path.read_bytes()
+        assert content.startswith(b"\xef\xbb\xbf")
+        assert result.size == len(content)
+        assert result.sha256 == hashlib.sha256(content).hexdigest()
+        assert result.rows == 4
+
+    @pytest.mark.parametrize("case", ["title_row_as_header", "ambiguous"])
+    def test_converts_from_in_memory_workbook(self, tmp_path: Path, case: str):
+        """Проверяет конвертацию из BytesIO, включая повторное чтение при переходе на pandas."""
+        rows = GOLDEN_CASES.get(case, [["serial"], ["0123"], ["0456"]])
+        xlsx_path = _write_workbook(tmp_path / "book.xlsx", rows)
+
+        result = convert_xlsx_to_csv(io.BytesIO(xlsx_path.read_bytes()), str(tmp_path / "memory.csv"))
+        pandas_xlsx_to_csv(str(xlsx_path), str(tmp_path / "pandas.csv"))
+
+        assert result.engine == ("pandas" if case == "ambiguous" else "streaming")
+        assert (tmp_path / "memory.csv").read_bytes() == (tmp_path / "pandas.csv").read_bytes()
+
+    def test_na_strings_match_pandas(self):
+        """Проверяет, что список пропусков совпадает с установленной версией pandas."""
+        from pandas._libs.parsers import STR_NA_VALUES
+
+        assert NA_STRINGS == frozenset(STR_NA_VALUES)
+
+    @pytest.mark.skipif(not SAMPLE_XLSX.exists(), reason="Sample workbook is not available")
+    def test_sample_workbook(self, tmp_path: Path):
+        """Проверяет совпадение на реальном файле стоп-листа."""
+        _assert_same_as_pandas(tmp_path, SAMPLE_XLSX)
+
+    @pytest.mark.parametrize("convert", [stream_xlsx_to_csv, pandas_xlsx_to_csv])
+    def test_parquet_written_in_same_pass(self, tmp_path: Path, convert):
+        """Проверяет типы колонок Parquet и хеш, посчитанный при записи."""
+        pq = pytest.importorskip("pyarrow.parquet")
+        xlsx_path = _write_workbook(tmp_path / "typed.xlsx", [
+            ["serial", "amount", "KATEGORIJA VOZILA", "STATUS"],
+            [1, 1.5, "B", "Bela lista"],
+            [2, 2.5, "C", "Crna lista"],
+            [3, None, "B", "Bela lista"],
+        ])
+        parquet_path = tmp_path / "out.parquet"
+
+        result = convert(str(xlsx_path), str(tmp_path / "out.csv"), str(parquet_path))
+
+        content = parquet_path.read_bytes()
+        assert result.parquet_size == len(content)
+        assert result.parquet_sha256 == hashlib.sha256(content).hexdigest()
+        table = pq.read_table(parquet_path)
+        assert str(table.schema.field("serial").type) == "int64"
+        assert str(table.schema.field("amount").type) == "double"
+        assert str(table.schema.field("STATUS").type) == "dictionary<values=string, indices=int32, ordered=0>"
+        assert table.column("STATUS").to_pylist() == ["Bela lista", "Crna lista", "Bela lista"]
+        assert table.column("amount").to_pylist() == [1.5, 2.5, None]
+
+    @pytest.mark.parametrize("reader", _reader_params())
+    @pytest.mark.parametrize("case", sorted(GOLDEN_CASES))
+    def test_every_reader_matches_pandas_output(self, tmp_path: Path, case: str, reader: str):
+        """Проверяет, что CSV не зависит от бэкенда чтения книги."""
+        xlsx_path = _write_workbook(tmp_path / f"{case}.xlsx", GOLDEN_CASES[case])
+        _assert_same_as_pandas(tmp_path, xlsx_path, reader)
+
+    @pytest.mark.parametrize("reader", _reader_params())
+    def test_every_reader_matches_pandas_on_excel_sheet_xml(self, tmp_path: Path, reader: str):
+        """Проверяет бэкенды на листе с общими строками, ячейками без координат и ошибками."""
+        xlsx_path = _write_raw_workbook(tmp_path / "raw.xlsx", RAW_SHEET, RAW_SHARED_STRINGS)
+        _assert_same_as_pandas(tmp_path, xlsx_path, reader)
+
+    @pytest.mark.skipif(not SAMPLE_XLSX.exists(), reason="Sample workbook is not available")
+    @pytest.mark.parametrize("reader", _reader_params())
+    def test_every_reader_on_sample_workbook(self, tmp_path: Path, reader: str):
+        """Проверяет совпадение на реальном файле стоп-листа для каждого бэкенда."""
+        result = stream_xlsx_to_csv(str(SAMPLE_XLSX), str(tmp_path / "reader.csv"), reader=reader)
+        pandas_xlsx_to_csv(str(SAMPLE_XLSX), str(tmp_path / "pandas.csv"))
+
+        assert result.reader == reader
+        assert (tmp_path / "reader.csv").read_bytes() == (tmp_path / "pandas.csv").read_bytes()
+
+    def test_xml_reader_yields_same_cells_as_openpyxl(self, tmp_path: Path):
+        """Проверяет ячейку за ячейкой, включая строки не по порядку (openpyxl их отбрасывает)."""
+        sheet = RAW_SHEET + '<row r="3"><c r="A3"><v>9</v></c></row><row r="7"><c r="B7"><v>1E3</v></c></row>'
+        xlsx_path = _write_raw_workbook(tmp_path / "raw.xlsx", sheet, RAW_SHARED_STRINGS)
+
+        def cells(reader: str):
+            with READERS[reader](str(xlsx_path)) as rows:
+                return [[(cell.value, cell.data_type) for cell in row] for row in rows]
+
+        assert cells("xml") == cells("openpyxl")
+
+    @pytest.mark.skipif(not calamine_available(), reason="python-calamine is not installed")
+    @pytest.mark.parametrize("rows", [
+        GOLDEN_CASES["dates_and_times"],            # форматы дат calamine определяет по-своему
+        [["text"], [" "], ["x_x0041_y"]],           # пробелы без xml:space и экранированные символы
+        [["big"], [2 ** 60], [1]],                  # целое за пределами точности float
+    ])
+    def test_calamine_declines_workbooks_it_reads_differently(self, tmp_path: Path, rows):
+        """Проверяет, что такие книги читает следующий бэкенд и CSV совпадает с pandas."""
+        xlsx_path = _write_workbook(tmp_path / "book.xlsx", rows)
+        expected, actual = tmp_path / "pandas.csv", tmp_path / "calamine.csv"
+
+        result = convert_xlsx_to_csv(str(xlsx_path), str(actual), reader="calamine")
+        pandas_xlsx_to_csv(str(xlsx_path), str(expected))
+
+        assert result.reader != "calamine"
+        assert actual.read_bytes() == expected.read_bytes()
+
+    def test_auto_reader_selection(self, tmp_path: Path, monkeypatch):
+        """Проверяет порядок бэкендов: calamine только для небольших книг, openpyxl всегда последний."""
+        from src.infrastructure.storage import xlsx_readers
+
+        xlsx_path = str(_write_workbook(tmp_path / "book.xlsx", GOLDEN_CASES["title_row_as_header"]))
+        small = ["calamine", "xml", "openpyxl"] if calamine_available() else ["xml", "openpyxl"]
+
+        assert reader_candidates(xlsx_path) == small
+        assert reader_candidates(io.BytesIO(Path(xlsx_path).read_bytes())) == small
+        assert reader_candidates(xlsx_path, "xml") == ["xml", "openpyxl"]
+        assert reader_candidates(xlsx_path, "openpyxl") == ["openpyxl"]
+
+        monkeypatch.setattr(xlsx_readers, "CALAMINE_MAX_BYTES", 0)
+        assert reader_candidates(xlsx_path) == ["xml", "openpyxl"]
+        monkeypatch.setattr(xlsx_readers, "calamine_available", lambda: False)
+        assert reader_candidates(xlsx_path, "calamine") == ["openpyxl"]
+
+    def test_xml_reader_needs_openpyxl_internals(self, tmp_path: Path, monkeypatch):
+        """Без внутренних функций openpyxl xml-бэкенд не выбирается, а книга читается openpyxl."""
+        from src.infrastructure.storage import xlsx_readers
+
+        apply_stylesheet = xlsx_readers.apply_stylesheet
+
+        def apply_without_date_formats(archive, workbook):
+            apply_stylesheet(archive, workbook)
+            del workbook._date_formats
+
+        xlsx_path = str(_write_workbook(tmp_path / "book.xlsx", GOLDEN_CASES["title_row_as_header"]))
+        expected = tmp_path / "expected.csv"
+        convert_xlsx_to_csv(xlsx_path, str(expected), reader="openpyxl")
+
+        monkeypatch.setattr(xlsx_readers, "calamine_available", lambda: False)
+        monkeypatch.setattr(xlsx_readers, "_cast_number", None)
+        assert reader_candidates(xlsx_path) == ["openpyxl"]
+        assert reader_candidates(xlsx_path, "xml") == ["openpyxl"]
+
+        # Версия openpyxl без атрибутов форматов дат: xml отклоняет книгу
+        monkeypatch.undo()
+        monkeypatch.setattr(xlsx_readers, "apply_stylesheet", apply_without_date_formats)
+        actual = tmp_path / "actual.csv"
+        result = convert_xlsx_to_csv(xlsx_path, str(actual), reader="xml")
+
+        assert result.reader == "openpyxl"
+        assert actual.read_bytes() == expected.read_bytes()